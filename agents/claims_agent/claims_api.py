@@ -1,10 +1,23 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from agents.claims_agent.claims_graph import claims_app
-from core.db import get_connection
+import asyncio
+import json
+import tempfile
+import time
+import uuid
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from agents.claims_agent.claims_graph import claims_runner, DOCUMENT_PROMPT
+from agents.claims_agent.claims_batch import run_claims_batch, CLAIMS_BATCH_CONCURRENCY, CLAIMS_BATCH_GROUP_SIZE
+from agents.claims_agent.claims_store import claim_history, CLAIMS_HISTORY_PAGE
+from core.db import run_db
+from core.pdf_service import receive_pdf_upload, extract_pdf_text, PdfTooLarge, InvalidPdf
+from core.session_store import get_session_store, SessionTooLarge
 
 router = APIRouter(prefix="/claims", tags=["Claims"])
 
+# Claims desk conversations: registry here, graph state in the checkpointer
+claim_sessions = get_session_store("claims")
+
 # ----------------------------
 # Request / Response Models
 # ----------------------------
@@ -15,39 +28,219 @@ class ClaimRequest(BaseModel):
     claim_amount: float
 
 
-class ClaimResponse(BaseModel):
-    claim_id: int
-    status: str
-    reimbursement: float
+class ClaimReply(BaseModel):
+    session_id: str
     message: str
 
+
+class BatchClaimItem(BaseModel):
+    insurance_type: str   # "health" or "vehicle"
+    insurance_ref_id: int
+    claim_amount: float
+    document_text: str
+    claim_reason: str | None = None
+
+
+def _parse_batch_item(raw) -> dict | str:
+    """Claim fields as a dict, or a str saying why the entry was rejected."""
+    try:
+        item = BatchClaimItem(**raw) if isinstance(raw, dict) else None
+    except ValidationError as e:
+        return f"❌ Invalid claim: {e.errors()[0]['loc'][0]} - {e.errors()[0]['msg']}"
+    if item is None:
+        return "❌ Invalid claim: expected a JSON object."
+    data = item.model_dump()
+    data["insurance_type"] = data["insurance_type"].lower()
+    if data["insurance_type"] not in ["health", "vehicle"]:
+        return "❌ Invalid insurance type."
+    return data
+
+
+async def _spool_body(request: Request):
+    """
+    Copy the request body into a spooled temp file (in memory up to 1 MB, then disk).
+    The body must be fully read before a StreamingResponse starts, because the
+    response listens on the same ASGI receive channel for disconnects.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+async def _ndjson_items(spool):
+    """Parse a spooled NDJSON body lazily, one line at a time."""
+    with spool:
+        for line in spool:
+            if line.strip():
+                yield _parse_ndjson_line(line)
+
+
+def _parse_ndjson_line(line: bytes) -> dict | str:
+    try:
+        return _parse_batch_item(json.loads(line))
+    except ValueError as e:
+        return f"❌ Invalid JSON: {str(e)}"
+
+
+async def _list_items(claims: list):
+    for raw in claims:
+        yield _parse_batch_item(raw)
+
+
+def _turn_response(session_id: str, turn: dict) -> dict:
+    state = turn["state"]
+    response = {"session_id": session_id, "replies": turn["messages"], "prompt": turn["prompt"], "done": turn["done"]}
+    if turn["done"]:
+        response.update(
+            error=state.get("error"),
+            claim_id=state.get("claim_id"),
+            claim_number=state.get("claim_number"),
+            reimbursement=state.get("reimbursement"),
+        )
+    return response
+
+
+async def _start_conversation(session_id: str, initial: dict) -> dict:
+    if not await run_db(claim_sessions.create, session_id, {"started_at": time.time(), "turns": 0}):
+        raise HTTPException(status_code=400, detail="Session already exists")
+    await claims_runner.delete(session_id)   # leftovers of an expired session with this id
+    return _turn_response(session_id, await claims_runner.turn(session_id, initial=initial))
+
+
 # ----------------------------
 # API Route
 # ----------------------------
-@router.post("/", response_model=ClaimResponse)
-def submit_claim(req: ClaimRequest):
-    # Initial state for LangGraph
-    state = {
+@router.post("/")
+async def submit_claim(req: ClaimRequest):
+    """
+    Open a claims desk conversation with the claim details already filled in.
+    Returns the first question (insurance id, OTP, ...); answer via POST /next.
+    """
+    return await _start_conversation(uuid.uuid4().hex, {
         "user_id": req.user_id,
-        "claim_type": req.claim_type.lower(),
+        "insurance_type": req.claim_type.lower(),
         "document_text": req.document_text,
-        "document_info": None,
         "claim_amount": req.claim_amount,
-        "reimbursement": None,
         "otp_verified": False,
-        "claim_id": None,
-        "error": None
-    }
-
-    # Run the LangGraph workflow
-    final_state = claims_app.invoke(state)
-
-    if final_state.get("error"):
-        raise HTTPException(status_code=400, detail=final_state["error"])
-
-    return ClaimResponse(
-        claim_id=final_state["claim_id"],
-        status="initiated",
-        reimbursement=final_state["reimbursement"],
-        message=f"Claim initiated successfully. Approved reimbursement: ₹{final_state['reimbursement']:,}"
-    )
+    })
+
+
+@router.get("/history")
+async def get_claim_history(insurance_type: str, insurance_ref_id: int, limit: int = CLAIMS_HISTORY_PAGE,
+                            cursor: str | None = None, columns: str = ""):
+    """
+    Claims on one insurance, oldest first, `limit` per page. Pass the returned
+    `next_cursor` as `cursor` for the next page (null on the last one).
+    `columns` is a comma-separated subset of claims_store.HISTORY_COLUMNS;
+    document_text is never returned.
+    """
+    insurance_type = insurance_type.lower()
+    if insurance_type not in ["health", "vehicle"]:
+        raise HTTPException(status_code=400, detail="Invalid insurance type")
+    try:
+        page = await run_db(claim_history, insurance_type, insurance_ref_id, limit, cursor, columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page.as_dict()
+
+
+@router.post("/start")
+async def start_claim_session(session_id: str):
+    """
+    Start a claims desk conversation; returns the greeting and first question.
+    """
+    return await _start_conversation(session_id, {"otp_verified": False})
+
+
+async def _require_session(session_id: str) -> dict:
+    session = await run_db(claim_sessions.get, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+async def _answer(session_id: str, session: dict, message: str) -> dict:
+    try:
+        turn = await claims_runner.turn(session_id, message)
+    except SessionTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    session["turns"] = session.get("turns", 0) + 1
+    if turn["done"]:
+        await run_db(claim_sessions.pop, session_id)
+        await claims_runner.delete(session_id)
+    else:
+        await run_db(claim_sessions.set, session_id, session)
+    return _turn_response(session_id, turn)
+
+
+@router.post("/next")
+async def continue_claim_session(reply: ClaimReply):
+    """
+    Answer the question the conversation is waiting on. Runs exactly one turn
+    of the claims graph and returns its messages and next question.
+    """
+    session = await _require_session(reply.session_id)
+    return await _answer(reply.session_id, session, reply.message)
+
+
+@router.post("/{session_id}/document")
+async def upload_claim_document(session_id: str, request: Request):
+    """
+    Answer the document question with a PDF (hospital bill, FIR, ...).
+    Body is multipart/form-data with one file part, or a raw application/pdf.
+    The upload streams to a temp file (capped at PDF_MAX_BYTES), its text is
+    extracted page by page (at most PDF_MAX_PAGES) and handed to the graph
+    exactly as pasted document text would be, so validate_document sees it.
+    """
+    session = await _require_session(session_id)
+    pending = await claims_runner.pending(session_id)
+    if not pending or pending["prompt"] != DOCUMENT_PROMPT:
+        raise HTTPException(status_code=409, detail="This claim is not waiting for a document")
+
+    try:
+        upload = await receive_pdf_upload(request.stream(), request.headers.get("content-type", ""))
+        try:
+            document = await asyncio.to_thread(extract_pdf_text, upload.path, upload.filename)
+        finally:
+            upload.discard()
+    except PdfTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidPdf as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not document.text:
+        raise HTTPException(status_code=422, detail="No text found in the PDF (scanned image?). Please paste the text instead.")
+
+    response = await _answer(session_id, session, document.text)
+    response["document"] = document.summary()
+    return response
+
+
+@router.post("/batch")
+async def submit_claims_batch(request: Request, concurrency: int = CLAIMS_BATCH_CONCURRENCY,
+                              group_size: int = CLAIMS_BATCH_GROUP_SIZE):
+    """
+    Bulk claim submission for partners.
+    Body is either a JSON array of claims or NDJSON (Content-Type: application/x-ndjson),
+    one claim per line. Documents are validated `concurrency` at a time and accepted
+    claims are saved `group_size` per transaction. Results stream back as NDJSON,
+    one line per claim tagged with its input `index`, in completion order.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items = _ndjson_items(await _spool_body(request))
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(body, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array of claims")
+        items = _list_items(body)
+
+    async def lines():
+        async for result in run_claims_batch(items, concurrency=concurrency, group_size=group_size):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
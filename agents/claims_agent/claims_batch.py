@@ -0,0 +1,143 @@
+import asyncio
+import os
+from typing import AsyncIterator
+from agents.claims_agent.claims_graph import lookup_insurance, document_validator
+from agents.claims_agent.claims_store import insert_claims
+from core.db import run_db
+from core.dial_client import get_dial_client
+from core.document_validation import rejection_message
+from core.usage import usage_scope
+
+# ----------------------------
+# Config
+# ----------------------------
+CLAIMS_BATCH_CONCURRENCY = int(os.getenv("CLAIMS_BATCH_CONCURRENCY", "16"))        # documents validated at once
+CLAIMS_BATCH_MAX_CONCURRENCY = int(os.getenv("CLAIMS_BATCH_MAX_CONCURRENCY", "256"))
+CLAIMS_BATCH_GROUP_SIZE = int(os.getenv("CLAIMS_BATCH_GROUP_SIZE", "100"))          # claims per transaction
+CLAIMS_BATCH_FLUSH_INTERVAL = float(os.getenv("CLAIMS_BATCH_FLUSH_INTERVAL", "0.5"))  # max wait before a partial group commits
+
+_DONE = object()
+
+
+async def validate_batch_item(index: int, item) -> dict:
+    """
+    Check one claim: insurance lookup (thread pool) then document validation (LLM).
+    `item` is a dict of claim fields, or a str describing why the input line was unusable.
+    """
+    if isinstance(item, str):
+        return {"index": index, "status": "rejected", "detail": item}
+
+    info = await run_db(lookup_insurance, item["insurance_type"], item["insurance_ref_id"])
+    if info.get("error"):
+        return {"index": index, "status": "rejected", "detail": info["error"]}
+
+    with usage_scope(agent="claims"):
+        result = await document_validator.validate(
+            item["insurance_type"], item["document_text"],
+            lambda: get_dial_client().validate_claim_document(item["insurance_type"], item["document_text"],
+                                                              call_site="claims.batch_validate"),
+        )
+    if not result.startswith("YES"):
+        detail = result if result.startswith("[") else rejection_message(result)
+        return {"index": index, "status": "rejected", "detail": detail}
+
+    return {
+        "index": index,
+        "status": "accepted",
+        "record": {
+            "user_id": info["user_id"],
+            "insurance_type": item["insurance_type"],
+            "insurance_ref_id": item["insurance_ref_id"],
+            "claim_reason": item.get("claim_reason"),
+            "document_text": item["document_text"],
+            "document_info": result.split("|", 1)[-1].strip(),
+            "claim_amount": item["claim_amount"],
+            "reimbursement": min(item["claim_amount"], info["policy_coverage"]),
+        },
+    }
+
+
+async def _commit_group(group: list[dict]) -> list[dict]:
+    try:
+        saved = await run_db(insert_claims, [g["record"] for g in group])
+    except Exception as e:
+        return [{"index": g["index"], "status": "error", "detail": f"❌ Claim failed: {str(e)}"} for g in group]
+    return [
+        {
+            "index": g["index"],
+            "status": "initiated",
+            "claim_id": claim_id,
+            "claim_number": claim_number,
+            "reimbursement": g["record"]["reimbursement"],
+        }
+        for g, (claim_id, claim_number) in zip(group, saved)
+    ]
+
+
+async def run_claims_batch(items: AsyncIterator, concurrency: int = CLAIMS_BATCH_CONCURRENCY,
+                           group_size: int = CLAIMS_BATCH_GROUP_SIZE) -> AsyncIterator[dict]:
+    """
+    Validate claims with `concurrency` workers and commit accepted ones
+    `group_size` at a time (or every CLAIMS_BATCH_FLUSH_INTERVAL seconds).
+    Yields one result per input claim, in completion order, each tagged with
+    its input index. Input is consumed lazily, so memory stays bounded by the
+    queue sizes rather than the batch size.
+    """
+    concurrency = max(1, min(concurrency, CLAIMS_BATCH_MAX_CONCURRENCY))
+    inbox: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    outbox: asyncio.Queue = asyncio.Queue()
+
+    async def feed():
+        index = 0
+        try:
+            async for item in items:
+                await inbox.put((index, item))
+                index += 1
+        except Exception as e:
+            await outbox.put({"index": index, "status": "error", "detail": f"Input aborted: {str(e)}"})
+        finally:
+            for _ in range(concurrency):
+                await inbox.put(_DONE)
+
+    async def worker():
+        while (job := await inbox.get()) is not _DONE:
+            index, item = job
+            try:
+                await outbox.put(await validate_batch_item(index, item))
+            except Exception as e:
+                await outbox.put({"index": index, "status": "error", "detail": str(e)})
+
+    async def workers():
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        await outbox.put(_DONE)
+
+    tasks = [asyncio.create_task(feed()), asyncio.create_task(workers())]
+    pending: list[dict] = []
+    try:
+        while True:
+            try:
+                result = await asyncio.wait_for(outbox.get(), timeout=CLAIMS_BATCH_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                if pending:
+                    for r in await _commit_group(pending):
+                        yield r
+                    pending = []
+                continue
+
+            if result is _DONE:
+                break
+            if result["status"] != "accepted":
+                yield result
+                continue
+            pending.append(result)
+            if len(pending) >= group_size:
+                for r in await _commit_group(pending):
+                    yield r
+                pending = []
+
+        if pending:
+            for r in await _commit_group(pending):
+                yield r
+    finally:
+        for t in tasks:
+            t.cancel()
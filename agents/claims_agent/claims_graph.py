@@ -1,11 +1,20 @@
-from langgraph.graph import StateGraph, START, END
 from typing import TypedDict
-from datetime import datetime
-from core.dial_client import DialClient
-from core.db import get_connection
-from core.otp_service import send_otp, verify_otp
-
-dial = DialClient()
+from core.dial_client import get_dial_client
+from core.db import connection
+from core.otp_service import send_otp, verify_otp, OtpRateLimited
+from core.conversation import ConversationRunner, say, ask
+from core.metrics import timed_node
+from core.document_validation import DocumentValidator, DocumentPrescreen, rejection_message
+from agents.claims_agent.document_rules import CLAIM_DOCUMENT_RULES, CLAIM_DOCUMENT_REQUIRES, CLAIM_DOCUMENT_MIN_CHARS
+from agents.claims_agent.claims_store import insert_claim, claim_history, CLAIMS_HISTORY_PAGE
+
+document_validator = DocumentValidator(
+    "claim_document",
+    DocumentPrescreen(CLAIM_DOCUMENT_RULES, CLAIM_DOCUMENT_MIN_CHARS, CLAIM_DOCUMENT_REQUIRES),
+)
+
+# the question a PDF upload answers (POST /claims/claims/{session_id}/document)
+DOCUMENT_PROMPT = "📄 Provide claim document text (or upload the PDF):"
 
 # ----------------------------
 # Claim State
@@ -20,6 +29,7 @@ class ClaimState(TypedDict):
     document_info: str | None
     reimbursement: float | None
     otp_verified: bool
+    otp_sms_id: str | None             # SMS job id (GET /sms/{id} for delivery status)
     claim_id: int | None
     claim_number: str | None
     user_name: str | None
@@ -37,65 +47,67 @@ class ClaimState(TypedDict):
 # Node Functions
 # ----------------------------
 def greet_user(state: ClaimState) -> ClaimState:
-    print("👋 Welcome to the Claims Desk!")
-    ins_type = input("👉 Is this claim for Health or Vehicle insurance? ").strip().lower()
+    say("👋 Welcome to the Claims Desk!")
+    # fields already on the state (e.g. from POST /claims/claims/) are not asked again
+    ins_type = (state.get("insurance_type") or ask("👉 Is this claim for Health or Vehicle insurance?")).lower()
     if ins_type not in ["health", "vehicle"]:
         state["error"] = "❌ Invalid insurance type."
         return state
     state["insurance_type"] = ins_type
-    ins_id = input(f"👉 Please enter your User {ins_type.capitalize()} Insurance ID: ")
-    state["insurance_ref_id"] = int(ins_id)
+    if state.get("insurance_ref_id") is None:
+        ins_id = ask(f"👉 Please enter your User {ins_type.capitalize()} Insurance ID:")
+        try:
+            state["insurance_ref_id"] = int(ins_id)
+        except ValueError:
+            state["error"] = "❌ Invalid insurance ID."
     return state
 
 
-def verify_insurance(state: ClaimState) -> ClaimState:
-    if state.get("error"):
-        return state
-
-    conn = get_connection()
-    c = conn.cursor()
-
-    if state["insurance_type"] == "health":
-        c.execute("""
-            SELECT uhi.id, uhi.user_id, uhi.status,
-                   p.name, p.coverage_limit, p.premium, p.is_active,
-                   u.name, u.email, u.phone
-            FROM user_health_insurance uhi
-            JOIN policies p ON uhi.policy_id = p.id
-            JOIN users u ON uhi.user_id = u.id
-            WHERE uhi.id=?
-        """, (state["insurance_ref_id"],))
-    else:
-        c.execute("""
-            SELECT uvi.id, uvi.user_id, uvi.status,
-                   p.name, p.coverage_limit, p.premium, p.is_active,
-                   u.name, u.email, u.phone,
-                   uvi.number_plate, uvi.vehicle_type
-            FROM user_vehicle_insurance uvi
-            JOIN policies p ON uvi.policy_id = p.id
-            JOIN users u ON uvi.user_id = u.id
-            WHERE uvi.id=?
-        """, (state["insurance_ref_id"],))
-
-    row = c.fetchone()
-    conn.close()
+def lookup_insurance(insurance_type: str, insurance_ref_id: int) -> dict:
+    """
+    Load an insurance with its policy and holder.
+    Returns the fields verify_insurance stores on the state, or {"error": ...}.
+    """
+    with connection() as conn:
+        c = conn.cursor()
+
+        if insurance_type == "health":
+            c.execute("""
+                SELECT uhi.id, uhi.user_id, uhi.status,
+                       p.name, p.coverage_limit, p.premium, p.is_active,
+                       u.name, u.email, u.phone
+                FROM user_health_insurance uhi
+                JOIN policies p ON uhi.policy_id = p.id
+                JOIN users u ON uhi.user_id = u.id
+                WHERE uhi.id=?
+            """, (insurance_ref_id,))
+        else:
+            c.execute("""
+                SELECT uvi.id, uvi.user_id, uvi.status,
+                       p.name, p.coverage_limit, p.premium, p.is_active,
+                       u.name, u.email, u.phone,
+                       uvi.number_plate, uvi.vehicle_type
+                FROM user_vehicle_insurance uvi
+                JOIN policies p ON uvi.policy_id = p.id
+                JOIN users u ON uvi.user_id = u.id
+                WHERE uvi.id=?
+            """, (insurance_ref_id,))
+
+        row = c.fetchone()
 
     if not row:
-        state["error"] = "❌ Insurance not found."
-        return state
+        return {"error": "❌ Insurance not found."}
 
-    if state["insurance_type"] == "health":
+    if insurance_type == "health":
         _, user_id, status, policy_name, coverage_limit, premium, is_active, name, email, phone = row
         vehicle_number, vehicle_type = None, None
     else:
         _, user_id, status, policy_name, coverage_limit, premium, is_active, name, email, phone, vehicle_number, vehicle_type = row
 
     if not is_active or status != "active":
-        state["error"] = f"❌ This {state['insurance_type']} insurance is inactive."
-        return state
+        return {"error": f"❌ This {insurance_type} insurance is inactive."}
 
-    # Save to state
-    state.update({
+    return {
         "user_id": user_id,
         "policy_name": policy_name,
         "policy_coverage": coverage_limit,
@@ -105,13 +117,26 @@ def verify_insurance(state: ClaimState) -> ClaimState:
         "user_phone": phone,
         "vehicle_number": vehicle_number,
         "vehicle_type": vehicle_type
-    })
+    }
+
+
+def verify_insurance(state: ClaimState) -> ClaimState:
+    if state.get("error"):
+        return state
+
+    info = lookup_insurance(state["insurance_type"], state["insurance_ref_id"])
+    if info.get("error"):
+        state["error"] = info["error"]
+        return state
+
+    # Save to state
+    state.update(info)
 
-    # Print summary
-    print(f"👤 User: {name} | 📧 {email} | 📱 {phone}")
-    print(f"📑 Policy: {policy_name} | 💰 Premium: ₹{premium}/yr | 🛡️ Coverage: ₹{coverage_limit}")
-    if vehicle_number:
-        print(f"🚘 Vehicle: {vehicle_type} | Plate: {vehicle_number}")
+    # Show summary
+    say(f"👤 User: {info['user_name']} | 📧 {info['user_email']} | 📱 {info['user_phone']}")
+    say(f"📑 Policy: {info['policy_name']} | 💰 Premium: ₹{info['policy_premium']}/yr | 🛡️ Coverage: ₹{info['policy_coverage']}")
+    if info["vehicle_number"]:
+        say(f"🚘 Vehicle: {info['vehicle_type']} | Plate: {info['vehicle_number']}")
 
     return state
 
@@ -120,25 +145,22 @@ def show_existing_claims(state: ClaimState) -> ClaimState:
     if state.get("error"):
         return state
 
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("""
-        SELECT claim_number, claim_amount, claim_reason, status 
-        FROM claims 
-        WHERE insurance_type=? AND insurance_ref_id=?
-    """, (state["insurance_type"], state["insurance_ref_id"]))
-    rows = c.fetchall()
-    conn.close()
-
-    if rows:
-        print("📑 You already have the following claims:")
-        for r in rows:
-            print(f"- {r[0]} | Amount: ₹{r[1]} | Reason: {r[2]} | Status: {r[3]}")
-        choice = input("👉 Do you want to raise another claim? (yes/no): ").strip().lower()
+    # first page only: long-standing policies can carry hundreds of claims
+    page = claim_history(state["insurance_type"], state["insurance_ref_id"], limit=CLAIMS_HISTORY_PAGE,
+                         columns=("claim_number", "claim_amount", "claim_reason", "status"))
+
+    if page.claims:
+        say("📑 You already have the following claims:\n" + "\n".join(
+            f"- {r['claim_number']} | Amount: ₹{r['claim_amount']} | Reason: {r['claim_reason']} | Status: {r['status']}"
+            for r in page.claims
+        ))
+        if page.next_cursor:
+            say(f"ℹ️ Showing your first {len(page.claims)} claims. The full history is at GET /claims/claims/history.")
+        choice = ask("👉 Do you want to raise another claim? (yes/no):").lower()
         if choice != "yes":
             state["error"] = "ℹ️ User chose not to raise another claim."
     else:
-        choice = input("👉 You have no existing claims. Do you want to raise one? (yes/no): ").strip().lower()
+        choice = ask("👉 You have no existing claims. Do you want to raise one? (yes/no):").lower()
         if choice != "yes":
             state["error"] = "ℹ️ User chose not to raise a claim."
     return state
@@ -153,9 +175,21 @@ def otp_step(state: ClaimState) -> ClaimState:
         state["error"] = "❌ User phone not found."
         return state
 
-    send_otp(phone)
-    user_input_otp = input("📱 Enter the OTP you received: ")
-    state["otp_verified"] = verify_otp(user_input_otp, phone)
+    # sending and checking are separate nodes: a resumed turn re-runs its node
+    # from the top, and that must not text the user a second code
+    try:
+        state["otp_sms_id"] = send_otp(phone)
+    except OtpRateLimited:
+        state["error"] = "❌ Too many OTP requests. Please try again later."
+    return state
+
+
+def verify_otp_step(state: ClaimState) -> ClaimState:
+    if state.get("error"):
+        return state
+
+    user_input_otp = ask("📱 Enter the OTP you received:")
+    state["otp_verified"] = verify_otp(user_input_otp, state["user_phone"])
 
     if not state["otp_verified"]:
         state["error"] = "❌ OTP verification failed."
@@ -166,28 +200,34 @@ def collect_claim_details(state: ClaimState) -> ClaimState:
     if state.get("error"):
         return state
 
-    amount = float(input("💰 Enter claim amount: "))
-    reason = input("📝 Enter claim reason: ")
-    document_text = input("📄 Provide claim document text: ")
-
-    state["claim_amount"] = amount
-    state["claim_reason"] = reason
-    state["document_text"] = document_text
+    if state.get("claim_amount") is None:
+        try:
+            state["claim_amount"] = float(ask("💰 Enter claim amount:"))
+        except ValueError:
+            state["error"] = "❌ Invalid claim amount."
+            return state
+    if not state.get("claim_reason"):
+        state["claim_reason"] = ask("📝 Enter claim reason:")
+    if not state.get("document_text"):
+        state["document_text"] = ask(DOCUMENT_PROMPT)
     return state
 
 
-def validate_document(state: ClaimState) -> ClaimState:
+async def validate_document(state: ClaimState) -> ClaimState:
     if state.get("error"):
         return state
 
     doc_text = state.get("document_text", "")
     claim_type = state.get("insurance_type")
 
-    result = dial.validate_claim_document(claim_type, doc_text)
+    # local pre-screen and memoized verdicts first; the LLM only for new, plausible documents
+    result = await document_validator.validate(
+        claim_type, doc_text, lambda: get_dial_client().validate_claim_document(claim_type, doc_text)
+    )
     if result.startswith("YES"):
         state["document_info"] = result.split("|", 1)[-1].strip()
     else:
-        state["error"] = "❌ Invalid document."
+        state["error"] = rejection_message(result)
     return state
 
 
@@ -195,84 +235,82 @@ def save_claim(state: ClaimState) -> ClaimState:
     if state.get("error"):
         return state
 
-    conn = get_connection()
-    c = conn.cursor()
     try:
         # Calculate reimbursement
         coverage_limit = state["policy_coverage"]
         reimbursement = min(state["claim_amount"], coverage_limit)
         state["reimbursement"] = reimbursement
 
-        # Insert claim
-        c.execute("""
-            INSERT INTO claims (user_id, insurance_type, insurance_ref_id, claim_reason, document_text, document_info, claim_amount, reimbursement, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'initiated')
-        """, (
-            state["user_id"],
-            state["insurance_type"],
-            state["insurance_ref_id"],
-            state["claim_reason"],
-            state["document_text"],
-            state["document_info"],
-            state["claim_amount"],
-            reimbursement
-        ))
-        conn.commit()
-        claim_id = c.lastrowid
-
-        # Generate claim number
-        year = datetime.now().year
-        claim_number = f"CLM-{year}-{claim_id:05d}"
-        c.execute("UPDATE claims SET claim_number=? WHERE id=?", (claim_number, claim_id))
-        conn.commit()
+        # Insert claim with a preallocated claim number (single statement, single commit)
+        claim_id, claim_number = insert_claim({
+            "user_id": state["user_id"],
+            "insurance_type": state["insurance_type"],
+            "insurance_ref_id": state["insurance_ref_id"],
+            "claim_reason": state["claim_reason"],
+            "document_text": state["document_text"],
+            "document_info": state["document_info"],
+            "claim_amount": state["claim_amount"],
+            "reimbursement": reimbursement
+        })
 
         state["claim_id"] = claim_id
         state["claim_number"] = claim_number
 
     except Exception as e:
         state["error"] = f"❌ Claim failed: {str(e)}"
-    finally:
-        conn.close()
 
     return state
 
 
 def confirm_claim(state: ClaimState) -> ClaimState:
     if state.get("error"):
-        print(state["error"])
+        say(state["error"])
     else:
-        print(
+        say(
             f"✅ Claim {state['claim_number']} initiated successfully for {state['user_name']}.\n"
             f"💰 Amount: ₹{state['claim_amount']} | Reason: {state['claim_reason']} | Status: Initiated\n"
             f"Approved Reimbursement: ₹{state['reimbursement']:,}"
         )
         if state["insurance_type"] == "vehicle":
-            print(f"🚘 Vehicle: {state['vehicle_type']} | Plate: {state['vehicle_number']}")
+            say(f"🚘 Vehicle: {state['vehicle_type']} | Plate: {state['vehicle_number']}")
     return state
 
 
 # ----------------------------
 # Build LangGraph
 # ----------------------------
-workflow = StateGraph(ClaimState)
-
-workflow.add_node("Greet", greet_user)
-workflow.add_node("VerifyInsurance", verify_insurance)
-workflow.add_node("ShowClaims", show_existing_claims)
-workflow.add_node("OTP", otp_step)
-workflow.add_node("CollectDetails", collect_claim_details)
-workflow.add_node("ValidateDoc", validate_document)
-workflow.add_node("SaveClaim", save_claim)
-workflow.add_node("Confirm", confirm_claim)
-
-workflow.add_edge(START, "Greet")
-workflow.add_edge("Greet", "VerifyInsurance")
-workflow.add_edge("VerifyInsurance", "ShowClaims")
-workflow.add_edge("ShowClaims", "OTP")
-workflow.add_edge("OTP", "CollectDetails")
-workflow.add_edge("CollectDetails", "ValidateDoc")
-workflow.add_edge("ValidateDoc", "SaveClaim")
-workflow.add_edge("SaveClaim", "Confirm")
-workflow.add_edge("Confirm", END)
-
-claims_app = workflow.compile()
+def build_workflow():
+    """The claims graph, uncompiled. LangGraph is only imported once a conversation needs it."""
+    from langgraph.graph import StateGraph, START, END
+
+    workflow = StateGraph(ClaimState)
+
+    # every node is timed (insurai_graph_node_seconds at /metrics)
+    for name, node in {
+        "Greet": greet_user,
+        "VerifyInsurance": verify_insurance,
+        "ShowClaims": show_existing_claims,
+        "OTP": otp_step,
+        "VerifyOTP": verify_otp_step,
+        "CollectDetails": collect_claim_details,
+        "ValidateDoc": validate_document,
+        "SaveClaim": save_claim,
+        "Confirm": confirm_claim,
+    }.items():
+        workflow.add_node(name, timed_node("claims", name, node))
+
+    workflow.add_edge(START, "Greet")
+    workflow.add_edge("Greet", "VerifyInsurance")
+    workflow.add_edge("VerifyInsurance", "ShowClaims")
+    workflow.add_edge("ShowClaims", "OTP")
+    workflow.add_edge("OTP", "VerifyOTP")
+    workflow.add_edge("VerifyOTP", "CollectDetails")
+    workflow.add_edge("CollectDetails", "ValidateDoc")
+    workflow.add_edge("ValidateDoc", "SaveClaim")
+    workflow.add_edge("SaveClaim", "Confirm")
+    workflow.add_edge("Confirm", END)
+    return workflow
+
+
+# Compiled on first use with the shared checkpointer; one HTTP call = one turn
+claims_runner = ConversationRunner(build_workflow, name="claims")
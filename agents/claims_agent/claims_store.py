@@ -0,0 +1,193 @@
+import base64
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from core.db import connection, transaction
+from core.claim_numbers import allocator
+
+# ----------------------------
+# Config
+# ----------------------------
+# Group commit: claims from concurrent requests share one transaction (one fsync)
+CLAIMS_GROUP_COMMIT = os.getenv("CLAIMS_GROUP_COMMIT", "0") == "1"
+CLAIMS_GROUP_MAX_BATCH = int(os.getenv("CLAIMS_GROUP_MAX_BATCH", "64"))
+CLAIMS_GROUP_MAX_DELAY = float(os.getenv("CLAIMS_GROUP_MAX_DELAY", "0"))   # extra wait for a batch to fill (seconds)
+
+# Claim history pages (GET /claims/claims/history and the claims desk)
+CLAIMS_HISTORY_PAGE = int(os.getenv("CLAIMS_HISTORY_PAGE", "10"))
+CLAIMS_HISTORY_MAX_PAGE = int(os.getenv("CLAIMS_HISTORY_MAX_PAGE", "100"))
+
+# Columns a history listing may ask for. document_text (the full pasted or
+# extracted document) is deliberately not one of them.
+HISTORY_COLUMNS = (
+    "id", "claim_number", "user_id", "insurance_type", "insurance_ref_id", "claim_reason",
+    "document_info", "claim_amount", "reimbursement", "status", "created_at",
+)
+HISTORY_DEFAULT_COLUMNS = ("claim_number", "claim_amount", "claim_reason", "status", "created_at")
+
+INSERT_CLAIM_SQL = """
+    INSERT INTO claims (claim_number, user_id, insurance_type, insurance_ref_id, claim_reason, document_text, document_info, claim_amount, reimbursement, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'initiated')
+"""
+
+
+def insert_claims(records: list[dict]) -> list[tuple[int, str]]:
+    """
+    Insert claims with preallocated numbers - one statement per claim, one commit for all.
+    Each record needs the claims-table fields; returns (claim_id, claim_number) per record.
+    """
+    if not records:
+        return []
+    numbers = allocator.take(len(records))
+    saved = []
+    with transaction() as conn:
+        c = conn.cursor()
+        for r, claim_number in zip(records, numbers):
+            c.execute(INSERT_CLAIM_SQL, (
+                claim_number,
+                r["user_id"],
+                r["insurance_type"],
+                r["insurance_ref_id"],
+                r.get("claim_reason"),
+                r.get("document_text"),
+                r.get("document_info"),
+                r["claim_amount"],
+                r["reimbursement"]
+            ))
+            saved.append((c.lastrowid, claim_number))
+    return saved
+
+
+class GroupCommitWriter:
+    """
+    Background writer for high-rate ingestion. Callers submit() a record and
+    get a Future; the writer thread commits whatever is queued (up to
+    `max_batch` claims) in one transaction, so claims that arrive while a
+    commit is in flight share the next one. `max_delay` > 0 additionally
+    waits that long for a batch to fill.
+    """
+
+    def __init__(self, max_batch: int = CLAIMS_GROUP_MAX_BATCH, max_delay: float = CLAIMS_GROUP_MAX_DELAY):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, record: dict) -> Future:
+        future: Future = Future()
+        self._queue.put((record, future))
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="claims-group-commit", daemon=True)
+                    self._thread.start()
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    if timeout > 0:
+                        batch.append(self._queue.get(timeout=timeout))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                saved = insert_claims([record for record, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, saved):
+                future.set_result(result)
+
+
+claim_writer = GroupCommitWriter()
+
+
+def insert_claim(record: dict) -> tuple[int, str]:
+    """Insert one claim, through the group-commit writer when CLAIMS_GROUP_COMMIT=1."""
+    if CLAIMS_GROUP_COMMIT:
+        return claim_writer.submit(record).result()
+    return insert_claims([record])[0]
+
+
+# ----------------------------
+# Claim history (keyset pagination)
+# ----------------------------
+@dataclass
+class ClaimPage:
+    """One page of an insurance's claims, oldest first."""
+    claims: list            # one dict per claim, with the requested columns
+    next_cursor: str | None # pass back as `cursor` for the next page; None on the last page
+
+    def as_dict(self) -> dict:
+        return {"claims": self.claims, "count": len(self.claims), "next_cursor": self.next_cursor}
+
+
+def _encode_cursor(created_at: str, claim_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, claim_id]).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        created_at, claim_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(claim_id, int):
+        raise ValueError("invalid cursor")
+    return created_at, claim_id
+
+
+def history_columns(names) -> tuple[str, ...]:
+    """Validate requested column names (a comma-separated string or a sequence); raises ValueError."""
+    if isinstance(names, str):
+        names = [n.strip() for n in names.split(",") if n.strip()]
+    names = tuple(dict.fromkeys(names)) or HISTORY_DEFAULT_COLUMNS
+    unknown = [n for n in names if n not in HISTORY_COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown columns {unknown}; choose from {list(HISTORY_COLUMNS)}")
+    return names
+
+
+def claim_history(insurance_type: str, insurance_ref_id: int, limit: int = CLAIMS_HISTORY_PAGE,
+                  cursor: str | None = None, columns=HISTORY_DEFAULT_COLUMNS) -> ClaimPage:
+    """
+    A page of the claims on one insurance, ordered by (created_at, id).
+    Keyset pagination: the cursor is the last row's (created_at, id), so every
+    page is an index seek on idx_claims_history plus `limit` row lookups, no
+    matter how deep into the history it is. Raises ValueError for a bad
+    cursor, limit or column.
+    """
+    columns = history_columns(columns)
+    if not 1 <= limit <= CLAIMS_HISTORY_MAX_PAGE:
+        raise ValueError(f"limit must be between 1 and {CLAIMS_HISTORY_MAX_PAGE}")
+    select = ", ".join(dict.fromkeys(("created_at", "id") + columns))   # the cursor needs both
+    sql = f"SELECT {select} FROM claims WHERE insurance_type=? AND insurance_ref_id=?"
+    params = [insurance_type, insurance_ref_id]
+    if cursor:
+        sql += " AND (created_at, id) > (?, ?)"
+        params += _decode_cursor(cursor)
+    sql += " ORDER BY created_at, id LIMIT ?"
+    params.append(limit + 1)   # one extra row says whether there is a next page
+
+    with connection() as conn:
+        c = conn.execute(sql, params)
+        names = [d[0] for d in c.description]
+        rows = c.fetchall()
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    positions = [(n, names.index(n)) for n in columns]
+    claims = [{n: row[i] for n, i in positions} for row in rows]
+    next_cursor = _encode_cursor(rows[-1][0], rows[-1][1]) if more else None
+    return ClaimPage(claims=claims, next_cursor=next_cursor)
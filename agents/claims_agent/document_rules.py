@@ -0,0 +1,24 @@
+# ----------------------------
+# Local pre-screen for claim documents
+# ----------------------------
+# The validator prompt requires hospital details for health claims and police
+# station details for vehicle claims. A document matching none of these
+# patterns cannot pass, so it is rejected without an LLM call. The lists are
+# deliberately broad: anything that might qualify still goes to the LLM.
+CLAIM_DOCUMENT_RULES = {
+    "health": [
+        r"\b(hospital\w*|clinic|nursing home|medical (cent(er|re)|college)|health ?care|dispensary|sanatorium)\b",
+        r"\b(discharge (summary|card)|admission|admitted|in-?patient|out-?patient|ipd|opd|icu|ward|casualty)\b",
+        r"\b(doctor|dr\.?|physician|surgeon|consultant|diagnos\w*|prescri\w*|pharmacy|lab(oratory)? report)\b",
+    ],
+    "vehicle": [
+        r"\b(police|thana|chowki|p\.?\s?s\.?|station house|s\.?h\.?o\.?|constable|inspector)\b",
+        r"\b(fir|f\.i\.r\.?|first information report|complaint no\.?|case no\.?|gd entry|panchnama)\b",
+    ],
+}
+
+# What each rule list looks for, for the rejection message
+CLAIM_DOCUMENT_REQUIRES = {"health": "hospital", "vehicle": "police station"}
+
+# Shorter than this (non-space characters) and there is nothing to validate
+CLAIM_DOCUMENT_MIN_CHARS = 15
@@ -0,0 +1,26 @@
+from core.fast_classifier import KeywordClassifier
+
+# ----------------------------
+# Local rules for negotiation intents
+# ----------------------------
+ONBOARDING_INTENT_RULES = {
+    "negotiate": [
+        (r"\b(too (expensive|costly|much|high)|expensive|costly|discount|cheaper|lower (the )?(price|premium)|reduce|bring it down|best (price|rate)|budget|afford)\b", 1.0),
+    ],
+    "benefits": [
+        (r"\b(benefits?|what('?s| is| does)? (it )?(cover(ed)?|include[ds]?)|coverage|covered|included|does it cover)\b", 0.8),
+    ],
+    "confirm": [
+        (r"^(yes|yeah|yep|yup|sure|ok(ay)?|deal|done|confirm(ed)?|perfect|great|go ahead|sounds good|let'?s do it)[.! ]*$", 1.0),
+        (r"\b(i'?ll take it|let'?s go with (it|this)|sign me up|buy (it|this)|i want (it|this))\b", 0.9),
+    ],
+    "reject": [
+        (r"^(no|nope|nah|no thanks|not interested)[.! ]*$", 1.0),
+        (r"\b(not interested|don'?t want|no thanks|maybe later|not now)\b", 0.9),
+    ],
+    "reconsider": [
+        (r"\b(other (plans?|options?)|different plan|change (the )?plan|switch|(basic|standard|premium) (plan|one|option))\b", 0.9),
+    ],
+}
+
+onboarding_intent_classifier = KeywordClassifier(ONBOARDING_INTENT_RULES)
@@ -1,12 +1,44 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from pydantic import BaseModel
-from agents.onboarding_agent.onboarding_graph import onboarding_app, OnboardingState
-import uvicorn
+from agents.onboarding_agent.onboarding_graph import onboarding_runner, OnboardingState, stream_human_reply
+from agents.onboarding_agent.rating import quote_batch, BATCH_FIELDS
+from core.context import context_savings
+from core.db import run_db
+from core.session_store import get_session_store, SessionTooLarge
+from core.sse import sse_token_stream
+import asyncio
+import json
+import os
+import time
+
+# ----------------------------
+# Config
+# ----------------------------
+QUOTE_BATCH_MAX_ROWS = int(os.getenv("QUOTE_BATCH_MAX_ROWS", "100000"))   # prospects per /quotes/batch call
 
 app = FastAPI(title="InsurAI Onboarding API", version="1.0")
 
-# In-memory session store (for demo, you can switch to Redis/DB later)
-sessions = {}
+# Session registry (expiry and limits): in-process LRU+TTL, or shared across
+# workers (SESSION_BACKEND=sqlite). The conversation itself lives in the
+# graph checkpointer under the same id.
+sessions = get_session_store("onboarding")
+
+
+async def _require_session(session_id: str) -> dict:
+    session = await run_db(sessions.get, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+async def _touch_session(session_id: str, session: dict):
+    session["turns"] = session.get("turns", 0) + 1
+    await run_db(sessions.set, session_id, session)
+
+
+async def _load_state(session_id: str) -> dict:
+    await _require_session(session_id)
+    return await onboarding_runner.get_state(session_id) or {}
 
 
 class UserInput(BaseModel):
@@ -14,45 +46,111 @@ class UserInput(BaseModel):
     message: str
 
 
+class QuoteBatchRequest(BaseModel):
+    """One list per field, one entry per prospect: vehicle -> age, kms, cc (optional); health -> members, avg_age."""
+    insurance_type: str
+    age: list[float] | None = None
+    kms: list[float] | None = None
+    cc: list[float] | None = None
+    members: list[float] | None = None
+    avg_age: list[float] | None = None
+
+
+def _quote_json(insurance_type: str, columns: dict) -> bytes:
+    return json.dumps(quote_batch(insurance_type, columns).as_dict(), separators=(",", ":")).encode()
+
+
 @app.post("/onboarding/start")
-def start_onboarding(session_id: str):
+async def start_onboarding(session_id: str):
     """
-    Start a new onboarding session.
+    Start a new onboarding session; returns Sarah's greeting and first question.
     """
-    if session_id in sessions:
+    if not await run_db(sessions.create, session_id, {"started_at": time.time(), "turns": 0}):
         raise HTTPException(status_code=400, detail="Session already exists")
-    sessions[session_id] = {}
-    return {"message": "Onboarding session started", "session_id": session_id}
+    await onboarding_runner.delete(session_id)   # leftovers of an expired session with this id
+    turn = await onboarding_runner.turn(session_id, initial=OnboardingState())
+    return {"message": "Onboarding session started", "session_id": session_id,
+            "replies": turn["messages"], "prompt": turn["prompt"]}
 
 
 @app.post("/onboarding/next")
-def continue_onboarding(user_input: UserInput):
+async def continue_onboarding(user_input: UserInput):
     """
-    Continue an onboarding session with the user's message.
+    Answer the question the session is waiting on with the user's message.
+    Runs one turn of the graph: up to Sarah's next question, or to the end.
     """
-    if user_input.session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    state = sessions[user_input.session_id]
+    session = await _require_session(user_input.session_id)
 
     try:
-        # Run one step of the graph
-        result = onboarding_app.invoke(state)
-        sessions[user_input.session_id] = result
-        return {"state": result}
+        turn = await onboarding_runner.turn(user_input.session_id, user_input.message)
+    except SessionTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    await _touch_session(user_input.session_id, session)
+    return {"replies": turn["messages"], "prompt": turn["prompt"], "done": turn["done"], "state": turn["state"]}
+
+
+@app.post("/onboarding/next/stream")
+async def continue_onboarding_stream(user_input: UserInput):
+    """
+    Stream Sarah's reply to the user's message as Server-Sent Events.
+    Needs a quoted policy in the session; the exchange is saved once the stream ends
+    and the session keeps waiting on the same question.
+    """
+    session = await _require_session(user_input.session_id)
+    state = await onboarding_runner.get_state(user_input.session_id) or {}
+    if "premium" not in state:
+        raise HTTPException(status_code=409, detail="No policy has been quoted in this session yet")
+    await _touch_session(user_input.session_id, session)
+    return sse_token_stream(
+        onboarding_runner.stream_and_save(user_input.session_id, state, stream_human_reply(state, user_input.message)))
+
+
+@app.post("/onboarding/quotes/batch")
+async def quote_prospects(request: QuoteBatchRequest):
+    """
+    Basic, Standard and Premium quotes for many prospects in one call (aggregator partners).
+    Priced exactly like the conversation; premiums come back as one list per tier, in input order.
+    """
+    insurance_type = request.insurance_type.lower()
+    fields = BATCH_FIELDS.get(insurance_type, ())
+    columns = {f: getattr(request, f) for f in fields if getattr(request, f) is not None}
+    if max((len(v) for v in columns.values()), default=0) > QUOTE_BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {QUOTE_BATCH_MAX_ROWS} prospects per call")
+    try:
+        # vectorised pricing plus JSON encoding off the event loop
+        body = await asyncio.to_thread(_quote_json, insurance_type, columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(body, media_type="application/json")
 
 
 @app.get("/onboarding/state/{session_id}")
-def get_state(session_id: str):
+async def get_state(session_id: str):
     """
     Fetch current onboarding state.
     """
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    return sessions[session_id]
+    return await _load_state(session_id)
+
+
+@app.get("/onboarding/pending/{session_id}")
+async def pending_question(session_id: str):
+    """
+    The question the session is currently waiting on.
+    """
+    await _require_session(session_id)
+    return await onboarding_runner.pending(session_id)
+
+
+@app.get("/onboarding/context-savings/{session_id}")
+async def get_context_savings(session_id: str):
+    """
+    Prompt tokens saved by the bounded conversation context in this session.
+    """
+    return context_savings(await _load_state(session_id))
 
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("agents.onboarding_agent.onboarding_api:app", host="0.0.0.0", port=8000, reload=True)
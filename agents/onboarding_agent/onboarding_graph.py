@@ -1,11 +1,21 @@
-from langgraph.graph import StateGraph, START, END
 from typing import TypedDict
-from core.dial_client import DialClient
-from core.email_service import send_policy_email, generate_policy_pdf
-import json, time, re, os
+from core.dial_client import get_dial_client
+from core.email_service import send_policy_email
+from core.policy_pdf import render_policy_pdf
+from core.conversation import ConversationRunner, say, ask
+from core.metrics import timed_node
+from core.fast_classifier import TieredClassifier
+from core.context import ConversationContext
+from core.policy_store import get_policy_store
+from agents.onboarding_agent.intent_rules import onboarding_intent_classifier
+from agents.onboarding_agent.rating import (
+    vehicle_premium, health_premium, plan_tiers,
+    VEHICLE_COVERAGE, VEHICLE_BENEFITS, HEALTH_COVERAGE, HEALTH_BENEFITS,
+)
+import json, time, re
 
-dial = DialClient()
-POLICY_FILE = "policies.json"
+intent_classifier = TieredClassifier("onboarding_intent", onboarding_intent_classifier)
+conversation_context = ConversationContext()
 
 
 class OnboardingState(TypedDict, total=False):
@@ -22,11 +32,20 @@ class OnboardingState(TypedDict, total=False):
     error: str
     conversation: list
     reconsider: bool
+    plan_selected: bool
+    context_summary: str
+    summarized_upto: int
+    context_stats: dict
+    history_size: list
+    email_outbox_id: int
 
 
 # ----------------------------
 # Helpers
 # ----------------------------
+PLAN_NAMES = {"1": "Basic", "2": "Standard", "3": "Premium"}
+
+
 def parse_number(text: str, default: int = 0) -> int:
     if not text:
         return default
@@ -43,10 +62,11 @@ def parse_number(text: str, default: int = 0) -> int:
         return default
 
 
-def llm_classify_intent(state: OnboardingState, user_msg: str) -> str:
+async def llm_classify_intent(state: OnboardingState, user_msg: str) -> str:
+    history = await conversation_context.render(state, "onboarding.classify_intent", budget_tokens=300)
     prompt = f"""
 Conversation so far:
-{json.dumps(state.get("conversation", []), indent=2)}
+{history}
 
 Current policy:
 Premium INR {int(state.get("premium",0))}, Coverage INR {state.get("coverage",0)}, Benefits: {state.get("benefits","")}
@@ -63,19 +83,24 @@ Classify the user's intent into one of:
 Reply with just one label.
 """
     try:
-        resp = dial.chat([
+        resp = await get_dial_client().chat([
             {"role": "system", "content": "You are an insurance assistant that classifies user intent."},
             {"role": "user", "content": prompt}
-        ])
+        ], cache=True, call_site="onboarding.classify_intent")
         intent = resp.strip().lower()
         return intent if intent in ["negotiate", "benefits", "confirm", "reject", "reconsider", "other"] else "other"
     except:
         return "other"
 
 
-def llm_human_reply(state: OnboardingState, user_msg: str) -> str:
+async def classify_intent(state: OnboardingState, user_msg: str) -> str:
+    """Local rules answer confident cases; everything else goes to the LLM classifier"""
+    return await intent_classifier.classify(user_msg, lambda: llm_classify_intent(state, user_msg))
+
+
+async def build_human_reply_messages(state: OnboardingState, user_msg: str) -> list:
     policy_context = f"Premium INR {int(state['premium'])}, Coverage INR {state['coverage']}, Benefits: {state['benefits']}"
-    conversation = json.dumps(state.get("conversation", []), indent=2)
+    conversation = await conversation_context.render(state, "onboarding.human_reply", budget_tokens=800)
 
     prompt = f"""
 You are a friendly, experienced insurance agent named Sarah talking to {state.get('name','the customer')} over the phone.
@@ -101,17 +126,37 @@ Customer just said: "{user_msg}"
 
 Respond naturally like you're having a real conversation. Keep it short and conversational - 1-2 sentences max.
 """
+    return [
+        {"role": "system", "content": "You are Sarah, a friendly insurance agent having a natural phone conversation."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+async def llm_human_reply(state: OnboardingState, user_msg: str) -> str:
     try:
-        reply = dial.chat([
-            {"role": "system", "content": "You are Sarah, a friendly insurance agent having a natural phone conversation."},
-            {"role": "user", "content": prompt}
-        ])
+        reply = await get_dial_client().chat(await build_human_reply_messages(state, user_msg), call_site="onboarding.human_reply")
         return reply.strip()
     except:
         return "Hmm, let me think about that. This plan covers the main things - accidents, theft, roadside help. What do you think?"
 
 
-def llm_choose_plan(state: OnboardingState, user_request: str):
+async def stream_human_reply(state: OnboardingState, user_msg: str):
+    """
+    Streams Sarah's reply token by token for the HTTP layer. Both turns are
+    recorded in the conversation once the stream has finished.
+    """
+    state.setdefault("conversation", [])
+    messages = await build_human_reply_messages(state, user_msg)
+    parts = []
+    async for token in get_dial_client().chat_stream(messages, call_site="onboarding.human_reply"):
+        parts.append(token)
+        yield token
+
+    state["conversation"].append({"role": "user", "content": user_msg, "ts": int(time.time())})
+    state["conversation"].append({"role": "assistant", "content": "".join(parts).strip(), "ts": int(time.time())})
+
+
+async def llm_choose_plan(state: OnboardingState, user_request: str):
     prompt = f"""
 You are an experienced insurance agent. You have 3 plans:
 
@@ -126,10 +171,10 @@ Reply in JSON like:
 {{"plan":"2","reason":"Sounds like they want good coverage without breaking the bank"}}
 """
     try:
-        resp = dial.chat([
+        resp = await get_dial_client().chat([
             {"role": "system", "content": "You are an insurance agent helping pick the right plan."},
             {"role": "user", "content": prompt}
-        ])
+        ], cache=True, call_site="onboarding.choose_plan")
         data = json.loads(resp)
         if "plan" in data and data["plan"] in {"1", "2", "3"}:
             return data
@@ -150,15 +195,9 @@ def save_policy_json(state: OnboardingState):
         "timestamp": int(time.time())
     }
     try:
-        if os.path.exists(POLICY_FILE):
-            with open(POLICY_FILE, "r") as f:
-                data = json.load(f)
-        else:
-            data = []
-        data.append(record)
-        with open(POLICY_FILE, "w") as f:
-            json.dump(data, f, indent=2)
-        print(f"Policy saved to {POLICY_FILE}")
+        store = get_policy_store()
+        store.append(record)
+        print(f"Policy saved to {store.path}")
     except Exception as e:
         print("Failed to save policy JSON:", e)
 
@@ -167,159 +206,143 @@ def save_policy_json(state: OnboardingState):
 # Nodes
 # ----------------------------
 def collect_user_info(state: OnboardingState) -> OnboardingState:
-    print("Hi there! I'm Sarah from InsurAI. I'm here to help you find the right insurance today.")
-    state["name"] = input("Let's start with your name - what should I call you? ").strip()
-    state["phone"] = input("And can I get your mobile number? ").strip()
+    say("Hi there! I'm Sarah from InsurAI. I'm here to help you find the right insurance today.")
+    state["name"] = ask("Let's start with your name - what should I call you?")
+    state["phone"] = ask("And can I get your mobile number?")
     state["conversation"] = []
     return state
 
 
 def ask_type(state: OnboardingState) -> OnboardingState:
-    print(f"\nNice to meet you, {state['name']}! So what brings you here today - looking for health insurance or something for your vehicle?")
-    choice = input("> ").strip()
+    choice = ask(f"Nice to meet you, {state['name']}! So what brings you here today - looking for health insurance or something for your vehicle?")
     state["insurance_choice"] = choice
     state["conversation"].append({"role": "user", "content": choice})
     return state
 
 
 def vehicle_tool(state: OnboardingState) -> OnboardingState:
-    print("\nAlright, let me get some details about your ride.")
-    name = input("What kind of vehicle are we talking about? ").strip()
-    kms = input("How many kilometers has it done so far? ").strip()
-    age = input("And how old is it - in years? ").strip()
-    cc = input("What's the engine size? ").strip()
+    say("Alright, let me get some details about your ride.")
+    name = ask("What kind of vehicle are we talking about?")
+    kms = ask("How many kilometers has it done so far?")
+    age = ask("And how old is it - in years?")
+    cc = ask("What's the engine size?")
 
     kms_val = parse_number(kms, 0)
     age_val = parse_number(age, 0)
     cc_val = parse_number(cc, 0)
 
     state["details"] = {"name": name, "kms": kms_val, "age": age_val, "cc": cc_val}
-
-    base_premium = 5000 + age_val * 200 + (kms_val // 10000) * 300
-    state["premium"] = float(base_premium)
-    state["coverage"] = 200000
-    state["benefits"] = "Accident cover, theft protection, roadside assistance"
+    state["premium"] = vehicle_premium(age_val, kms_val, cc_val)
+    state["coverage"] = VEHICLE_COVERAGE
+    state["benefits"] = VEHICLE_BENEFITS
     return state
 
 
 def health_tool(state: OnboardingState) -> OnboardingState:
-    print("\nGreat choice on the health insurance. Let me understand your family situation.")
-    members = parse_number(input("How many people do you want covered including yourself? ").strip(), 1)
-    avg_age = parse_number(input("What's the average age of everyone? ").strip(), 30)
+    say("Great choice on the health insurance. Let me understand your family situation.")
+    members = parse_number(ask("How many people do you want covered including yourself?"), 1)
+    avg_age = parse_number(ask("What's the average age of everyone?"), 30)
     state["details"] = {"members": members, "age": avg_age}
-    base_premium = 8000 + members * 2000 + (avg_age // 10) * 1000
-    state["premium"] = float(base_premium)
-    state["coverage"] = 500000
-    state["benefits"] = "Hospitalization cover, critical illness cover, free annual health check-up"
+    state["premium"] = health_premium(members, avg_age)
+    state["coverage"] = HEALTH_COVERAGE
+    state["benefits"] = HEALTH_BENEFITS
     return state
 
 
-def plan_options(state: OnboardingState) -> OnboardingState:
+async def plan_options(state: OnboardingState) -> OnboardingState:
     state["reconsider"] = False
-    base_premium = state["premium"]
-    base_coverage = state["coverage"]
-    base_benefits = state["benefits"]
-
-    plans = {
-        "1": {"name": "Basic", "premium": int(base_premium * 0.8), "coverage": int(base_coverage * 0.8), "benefits": base_benefits},
-        "2": {"name": "Standard", "premium": int(base_premium), "coverage": base_coverage, "benefits": base_benefits},
-        "3": {"name": "Premium", "premium": int(base_premium * 1.2), "coverage": int(base_coverage * 1.5), "benefits": base_benefits + ", legal protection cover"}
-    }
+    state["plan_selected"] = False
+    plans = plan_tiers(state["premium"], state["coverage"], state["benefits"])
 
-    print(f"\nOkay {state['name']}, based on what you've told me, I've got three options for you:")
-    print(f"The Basic plan is {plans['1']['premium']} rupees - covers the essentials, keeps costs down.")
-    print(f"Standard is {plans['2']['premium']} - that's what most people go with, good balance.")
-    print(f"And Premium is {plans['3']['premium']} - gives you everything plus legal cover too.")
+    say(f"Okay {state['name']}, based on what you've told me, I've got three options for you:\n"
+        f"The Basic plan is {plans['1']['premium']} rupees - covers the essentials, keeps costs down.\n"
+        f"Standard is {plans['2']['premium']} - that's what most people go with, good balance.\n"
+        f"And Premium is {plans['3']['premium']} - gives you everything plus legal cover too.")
 
-    user_choice = input("What feels right to you? You can just say 1, 2, 3 or tell me what you're thinking: ").strip()
+    user_choice = ask("What feels right to you? You can just say 1, 2, 3 or tell me what you're thinking:")
 
     if user_choice in plans:
         state.update(plans[user_choice])
+        state["plan_selected"] = True
         return state
 
     for k, p in plans.items():
         if p["name"].lower() in user_choice.lower():
             state.update(plans[k])
+            state["plan_selected"] = True
             return state
 
-    decision = llm_choose_plan(state, user_choice)
+    decision = await llm_choose_plan(state, user_choice)
     if decision and decision["plan"] in plans:
-        print(f"You know what, from what you're saying, I think the {plans[decision['plan']]['name']} plan makes sense.")
-        print(f"{decision['reason']}")
+        say(f"You know what, from what you're saying, I think the {plans[decision['plan']]['name']} plan makes sense.")
+        say(f"{decision['reason']}")
         state.update(plans[decision["plan"]])
+        state["plan_selected"] = True
         return state
 
-    print("Sorry, I didn't quite catch that. Let me ask again.")
-    return plan_options(state)
+    # the graph comes back here for another try
+    say("Sorry, I didn't quite catch that. Let me ask again.")
+    return state
 
 
 def policy_present(state: OnboardingState) -> OnboardingState:
-    print(f"\nPerfect! So here's what we've got for you, {state['name']}:")
-    print(f"You'll pay {int(state['premium'])} rupees for this")
-    print(f"Coverage up to {state['coverage']} rupees") 
-    print(f"And you get: {state['benefits']}")
+    say(f"Perfect! So here's what we've got for you, {state['name']}:\n"
+        f"You'll pay {int(state['premium'])} rupees for this\n"
+        f"Coverage up to {state['coverage']} rupees\n"
+        f"And you get: {state['benefits']}")
     return state
 
 
-def negotiate_confirm(state: OnboardingState) -> OnboardingState:
-    while True:
-        user_msg = input("\nWhat do you think? ").strip()
-        state["conversation"].append({"role": "user", "content": user_msg, "ts": int(time.time())})
-        intent = llm_classify_intent(state, user_msg)
-
-        if intent == "negotiate":
-            if state.get("discount_applied"):
-                print("I hear you on the price, but honestly this is already our best rate. You're getting solid coverage and we're really good with claims.")
-            else:
-                new_premium = round(state["premium"] * 0.95, 2)
-                state["premium"] = new_premium
-                state["discount_applied"] = True
-                print(f"You know what, let me see what I can do... I can bring it down to {int(new_premium)} rupees. That's really the best I can offer.")
-            continue
-
-        elif intent == "benefits":
-            print(llm_human_reply(state, user_msg))
-            continue
-
-        elif intent == "confirm":
-            state["confirmed"] = True
-            print(f"Excellent! I'm so glad we found something that works for you, {state['name']}. Let me get this sorted out.")
-            return state
+async def negotiate_confirm(state: OnboardingState) -> OnboardingState:
+    """One exchange per pass; the graph loops back here until the user confirms, rejects or reconsiders"""
+    user_msg = ask("What do you think?")
+    state["conversation"].append({"role": "user", "content": user_msg, "ts": int(time.time())})
+    intent = await classify_intent(state, user_msg)
 
-        elif intent == "reject":
-            state["confirmed"] = False
-            state["error"] = "User rejected the policy."
-            print("No worries at all. If things change or you want to chat about options later, just give us a call, okay?")
-            return state
+    if intent == "negotiate":
+        if state.get("discount_applied"):
+            say("I hear you on the price, but honestly this is already our best rate. You're getting solid coverage and we're really good with claims.")
+        else:
+            new_premium = round(state["premium"] * 0.95, 2)
+            state["premium"] = new_premium
+            state["discount_applied"] = True
+            say(f"You know what, let me see what I can do... I can bring it down to {int(new_premium)} rupees. That's really the best I can offer.")
+
+    elif intent == "confirm":
+        state["confirmed"] = True
+        say(f"Excellent! I'm so glad we found something that works for you, {state['name']}. Let me get this sorted out.")
+
+    elif intent == "reject":
+        state["confirmed"] = False
+        state["error"] = "User rejected the policy."
+        say("No worries at all. If things change or you want to chat about options later, just give us a call, okay?")
+
+    elif intent == "reconsider":
+        decision = await llm_choose_plan(state, user_msg)
+        state["reconsider"] = True
+        if decision:
+            say(f"Actually, let me show you the {PLAN_NAMES[decision['plan']]} plan instead - {decision['reason']}.")
+        else:
+            say("Sure thing, let's look at the other options again.")
 
-        elif intent == "reconsider":
-            decision = llm_choose_plan(state, user_msg)
-            if decision:
-                print(f"Actually, let me show you the {plans[decision['plan']]['name']} plan instead - {decision['reason']}.")
-                state["reconsider"] = True
-                return state
-            else:
-                state["reconsider"] = True
-                print("Sure thing, let's look at the other options again.")
-                return state
+    else:
+        # benefits questions and everything else get a conversational answer
+        say(await llm_human_reply(state, user_msg))
 
-        else:
-            print(llm_human_reply(state, user_msg))
-            continue
+    return state
 
 
 def email_tool(state: OnboardingState) -> OnboardingState:
     if not state.get("email"):
-        state["email"] = input("Great! I'll need your email to send over the policy documents: ").strip()
+        state["email"] = ask("Great! I'll need your email to send over the policy documents:")
 
-    pdf_path = generate_policy_pdf(
+    pdf_bytes = render_policy_pdf(
         user_name=state.get("name", "Customer"),
         policy_name=state.get("insurance_choice", "Insurance"),
         premium=state.get("premium", 0),
         coverage=state.get("coverage", 0),
         benefits=state.get("benefits", ""),
-        insurance_type=state.get("insurance_choice", "general"),
-        filename="policy.pdf"
+        insurance_type=state.get("insurance_choice", "general")
     )
 
     subject = f"Your {state.get('insurance_choice','Insurance')} Policy - All Set!"
@@ -341,48 +364,63 @@ Sarah
 InsurAI
 """
 
-    send_policy_email(state["email"], subject, body, pdf_path)
+    state["email_outbox_id"] = send_policy_email(state["email"], subject, body, pdf_bytes)
     save_policy_json(state)
-    print(f"Perfect! I've sent everything to {state['email']}. You should get it in a couple minutes.")
-    print("Thanks for choosing us today! Take care.")
+    say(f"Perfect! I've sent everything to {state['email']}. You should get it in a couple minutes.")
+    say("Thanks for choosing us today! Take care.")
     return state
 
 
 # ----------------------------
 # Graph
 # ----------------------------
-workflow = StateGraph(OnboardingState)
-workflow.add_node("UserInfo", collect_user_info)
-workflow.add_node("AskType", ask_type)
-workflow.add_node("VehicleTool", vehicle_tool)
-workflow.add_node("HealthTool", health_tool)
-workflow.add_node("PlanOptions", plan_options)
-workflow.add_node("PolicyPresent", policy_present)
-workflow.add_node("NegotiateConfirm", negotiate_confirm)
-workflow.add_node("EmailTool", email_tool)
-
-workflow.add_edge(START, "UserInfo")
-workflow.add_edge("UserInfo", "AskType")
-workflow.add_conditional_edges(
-    "AskType",
-    lambda s: "VehicleTool" if "vehicle" in s.get("insurance_choice", "").lower() or "car" in s.get("insurance_choice", "").lower() else "HealthTool",
-    {"VehicleTool": "VehicleTool", "HealthTool": "HealthTool"}
-)
-workflow.add_edge("VehicleTool", "PlanOptions")
-workflow.add_edge("HealthTool", "PlanOptions")
-workflow.add_edge("PlanOptions", "PolicyPresent")
-workflow.add_edge("PolicyPresent", "NegotiateConfirm")
-
-workflow.add_conditional_edges(
-    "NegotiateConfirm",
-    lambda s: (
-        "EmailTool" if s.get("confirmed")
-        else ("PlanOptions" if s.get("reconsider")
-              else ("END" if s.get("error") else "NegotiateConfirm"))
-    ),
-    {"EmailTool": "EmailTool", "PlanOptions": "PlanOptions", "NegotiateConfirm": "NegotiateConfirm", "END": END}
-)
+def build_workflow():
+    """The onboarding graph, uncompiled. LangGraph is only imported once a conversation needs it."""
+    from langgraph.graph import StateGraph, START, END
+
+    workflow = StateGraph(OnboardingState)
+    # every node is timed (insurai_graph_node_seconds at /metrics)
+    for name, node in {
+        "UserInfo": collect_user_info,
+        "AskType": ask_type,
+        "VehicleTool": vehicle_tool,
+        "HealthTool": health_tool,
+        "PlanOptions": plan_options,
+        "PolicyPresent": policy_present,
+        "NegotiateConfirm": negotiate_confirm,
+        "EmailTool": email_tool,
+    }.items():
+        workflow.add_node(name, timed_node("onboarding", name, node))
+
+    workflow.add_edge(START, "UserInfo")
+    workflow.add_edge("UserInfo", "AskType")
+    workflow.add_conditional_edges(
+        "AskType",
+        lambda s: "VehicleTool" if "vehicle" in s.get("insurance_choice", "").lower() or "car" in s.get("insurance_choice", "").lower() else "HealthTool",
+        {"VehicleTool": "VehicleTool", "HealthTool": "HealthTool"}
+    )
+    workflow.add_edge("VehicleTool", "PlanOptions")
+    workflow.add_edge("HealthTool", "PlanOptions")
+    workflow.add_conditional_edges(
+        "PlanOptions",
+        lambda s: "PolicyPresent" if s.get("plan_selected") else "PlanOptions",
+        {"PolicyPresent": "PolicyPresent", "PlanOptions": "PlanOptions"}
+    )
+    workflow.add_edge("PolicyPresent", "NegotiateConfirm")
+
+    workflow.add_conditional_edges(
+        "NegotiateConfirm",
+        lambda s: (
+            "EmailTool" if s.get("confirmed")
+            else ("PlanOptions" if s.get("reconsider")
+                  else ("END" if s.get("error") else "NegotiateConfirm"))
+        ),
+        {"EmailTool": "EmailTool", "PlanOptions": "PlanOptions", "NegotiateConfirm": "NegotiateConfirm", "END": END}
+    )
+
+    workflow.add_edge("EmailTool", END)
+    return workflow
 
-workflow.add_edge("EmailTool", END)
 
-onboarding_app = workflow.compile()
\ No newline at end of file
+# Compiled on first use with the shared checkpointer; one HTTP call = one turn
+onboarding_runner = ConversationRunner(build_workflow, name="onboarding")
\ No newline at end of file
@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+
+# ----------------------------
+# Rating tables
+# ----------------------------
+# Vehicle: base + per year of age + per started 10,000 km. Engine size (cc) is
+# collected but not rated yet.
+VEHICLE_BASE = 5000
+VEHICLE_PER_YEAR = 200
+VEHICLE_KMS_BAND = 10000
+VEHICLE_PER_KMS_BAND = 300
+VEHICLE_COVERAGE = 200000
+VEHICLE_BENEFITS = "Accident cover, theft protection, roadside assistance"
+
+# Health: base + per member + per full decade of the members' average age
+HEALTH_BASE = 8000
+HEALTH_PER_MEMBER = 2000
+HEALTH_AGE_BAND = 10
+HEALTH_PER_AGE_BAND = 1000
+HEALTH_COVERAGE = 500000
+HEALTH_BENEFITS = "Hospitalization cover, critical illness cover, free annual health check-up"
+
+# (choice, name, premium factor, coverage factor, extra benefits)
+PLAN_TIERS = (
+    ("1", "Basic", 0.8, 0.8, ""),
+    ("2", "Standard", 1.0, 1.0, ""),
+    ("3", "Premium", 1.2, 1.5, ", legal protection cover"),
+)
+
+BATCH_FIELDS = {"vehicle": ("age", "kms", "cc"), "health": ("members", "avg_age")}
+
+
+# ----------------------------
+# One customer (the conversation)
+# ----------------------------
+def vehicle_premium(age, kms, cc=0) -> float:
+    return float(VEHICLE_BASE + age * VEHICLE_PER_YEAR + (kms // VEHICLE_KMS_BAND) * VEHICLE_PER_KMS_BAND)
+
+
+def health_premium(members, avg_age) -> float:
+    return float(HEALTH_BASE + members * HEALTH_PER_MEMBER + (avg_age // HEALTH_AGE_BAND) * HEALTH_PER_AGE_BAND)
+
+
+def plan_tiers(base_premium: float, base_coverage: int, base_benefits: str) -> dict:
+    """The three plans offered for a base quote, keyed by the number the customer picks."""
+    return {
+        choice: {
+            "name": name,
+            "premium": int(base_premium * premium_factor),
+            "coverage": base_coverage if coverage_factor == 1.0 else int(base_coverage * coverage_factor),
+            "benefits": base_benefits + extra,
+        }
+        for choice, name, premium_factor, coverage_factor, extra in PLAN_TIERS
+    }
+
+
+# ----------------------------
+# Many customers (aggregator quotes)
+# ----------------------------
+@dataclass
+class QuoteBatch:
+    """All three tiers for a batch of prospects, column by column."""
+    insurance_type: str
+    base_premium: object        # np.ndarray, float64
+    premiums: dict              # tier name -> np.ndarray, int64
+    coverage: dict              # tier name -> int (the same for every prospect)
+    benefits: dict              # tier name -> str
+
+    def __len__(self) -> int:
+        return len(self.base_premium)
+
+    def as_dict(self) -> dict:
+        return {
+            "insurance_type": self.insurance_type,
+            "count": len(self),
+            "tiers": list(self.premiums),
+            "base_premium": self.base_premium.tolist(),
+            "premium": {tier: values.tolist() for tier, values in self.premiums.items()},
+            "coverage": self.coverage,
+            "benefits": self.benefits,
+        }
+
+
+def _columns(np, insurance_type: str, columns: dict) -> list:
+    """Validated float64 arrays for the rating fields, all the same length."""
+    fields = BATCH_FIELDS.get(insurance_type)
+    if fields is None:
+        raise ValueError(f"insurance_type must be one of {sorted(BATCH_FIELDS)}")
+    arrays = []
+    for field in fields:
+        values = columns.get(field)
+        if values is None:
+            if field != "cc":
+                raise ValueError(f"missing column {field!r}")
+            values = np.zeros(len(arrays[0]) if arrays else 0)
+        arr = np.asarray(values, dtype=np.float64)
+        if arr.ndim != 1:
+            raise ValueError(f"column {field!r} must be a flat list of numbers")
+        if not np.isfinite(arr).all() or (arr < 0).any():
+            raise ValueError(f"column {field!r} must hold finite, non-negative numbers")
+        arrays.append(arr)
+    if len({len(a) for a in arrays}) > 1:
+        raise ValueError(f"columns {fields} must have the same length")
+    return arrays
+
+
+def quote_batch(insurance_type: str, columns: dict) -> QuoteBatch:
+    """
+    Vectorised vehicle_premium / health_premium + plan_tiers: every prospect
+    gets exactly the premiums the conversation would quote them.
+    `columns` maps the fields in BATCH_FIELDS to equal-length sequences
+    (lists or arrays); raises ValueError for missing, ragged or negative input.
+    """
+    import numpy as np   # only bulk quoting pays for the NumPy import
+    arrays = _columns(np, insurance_type, columns)
+    if insurance_type == "vehicle":
+        age, kms, _cc = arrays
+        base = VEHICLE_BASE + age * VEHICLE_PER_YEAR + np.floor_divide(kms, VEHICLE_KMS_BAND) * VEHICLE_PER_KMS_BAND
+        coverage, benefits = VEHICLE_COVERAGE, VEHICLE_BENEFITS
+    else:
+        members, avg_age = arrays
+        base = HEALTH_BASE + members * HEALTH_PER_MEMBER + np.floor_divide(avg_age, HEALTH_AGE_BAND) * HEALTH_PER_AGE_BAND
+        coverage, benefits = HEALTH_COVERAGE, HEALTH_BENEFITS
+
+    tiers = plan_tiers(0.0, coverage, benefits)
+    premiums = {}
+    for _, name, premium_factor, _, _ in PLAN_TIERS:
+        # int() truncates toward zero; premiums are positive, so trunc matches it
+        scaled = base if premium_factor == 1.0 else base * premium_factor
+        premiums[name] = np.trunc(scaled).astype(np.int64)
+    return QuoteBatch(
+        insurance_type=insurance_type,
+        base_premium=base,
+        premiums=premiums,
+        coverage={t["name"]: t["coverage"] for t in tiers.values()},
+        benefits={t["name"]: t["benefits"] for t in tiers.values()},
+    )
@@ -0,0 +1,33 @@
+from core.fast_classifier import KeywordClassifier
+
+# ----------------------------
+# Local rules for support query categories
+# ----------------------------
+SUPPORT_QUERY_RULES = {
+    "satisfied": [
+        (r"^(ok(ay)?[, ]*)?(thanks?( you)?( so much| a lot)?|thx|ty|cheers)[.! ]*$", 1.0),
+        (r"^(that'?s (it|all)|all good|i'?m good|i'?m all set|all set|nothing else|no thanks|bye|goodbye)[.! ]*$", 1.0),
+    ],
+    "general_help": [
+        (r"^(hi|hii+|hello|hey|hey there|good (morning|afternoon|evening)|namaste)[.! ]*$", 1.0),
+        (r"\b(help|question)\b", 0.3),
+    ],
+    "health_insurance": [
+        (r"\bhealth\b", 0.9),
+        (r"\b(hospital\w*|medical|mediclaim|maternity|surgery|illness|cashless|family floater|pre-?existing)\b", 0.6),
+    ],
+    "vehicle_insurance": [
+        (r"\b(vehicle|car|bike|motor|two[- ]wheeler|scooter)\b", 0.9),
+        (r"\b(third[- ]party|zero dep\w*|comprehensive|roadside|own damage)\b", 0.7),
+    ],
+    "claims": [
+        (r"\bclaim(s|ed|ing)?\b", 1.0),
+        (r"\b(reimburse\w*|settle\w*)\b", 0.6),
+    ],
+    "company_info": [
+        (r"\binsurai\b", 0.8),
+        (r"\b(about (you|your company)|who are you|your company|mission|support hours|24/?7)\b", 0.7),
+    ],
+}
+
+support_query_classifier = KeywordClassifier(SUPPORT_QUERY_RULES)
@@ -1,13 +1,31 @@
 # agents/support_agent/support_api.py
+import time
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Dict, Any
-from agents.support_agent.support_graph import support_app, SupportState
+from agents.support_agent.support_graph import support_runner, SupportState, stream_reply, needs_escalation
+from core.context import context_savings
+from core.db import run_db
+from core.session_store import get_session_store, SessionTooLarge
+from core.sse import sse_token_stream
 
 router = APIRouter()
 
-# In-memory session storage (simple for now)
-user_sessions: Dict[str, Dict[str, Any]] = {}
+# Session registry (expiry and limits): in-process LRU+TTL, or shared across
+# workers (SESSION_BACKEND=sqlite). The conversation itself lives in the
+# graph checkpointer under the same id.
+user_sessions = get_session_store("support")
+
+
+async def _require_session(session_id: str) -> dict:
+    session = await run_db(user_sessions.get, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found. Please start a session first.")
+    return session
+
+
+async def _touch_session(session_id: str, session: dict):
+    session["turns"] = session.get("turns", 0) + 1
+    await run_db(user_sessions.set, session_id, session)
 
 
 class SupportRequest(BaseModel):
@@ -16,53 +34,84 @@ class SupportRequest(BaseModel):
 
 
 @router.post("/support/start")
-def start_session(session_id: str):
+async def start_session(session_id: str):
     """
     Start a new support session for a given session_id.
+    Runs the graph up to Maya's first question.
     """
-    if session_id in user_sessions:
+    if not await run_db(user_sessions.create, session_id, {"started_at": time.time(), "turns": 0}):
         raise HTTPException(status_code=400, detail="Session already exists")
-    user_sessions[session_id] = SupportState()
-    return {"message": f"Support session {session_id} started."}
+    await support_runner.delete(session_id)   # leftovers of an expired session with this id
+    turn = await support_runner.turn(session_id, initial=SupportState())
+    return {"message": f"Support session {session_id} started.", "replies": turn["messages"], "prompt": turn["prompt"]}
 
 
 @router.post("/support/query")
-def process_query(request: SupportRequest):
+async def process_query(request: SupportRequest):
     """
-    Process a user query inside a session.
+    Answer the question the session is waiting on (name, query, follow-up).
+    Runs exactly one turn of the graph and returns what Maya said plus her next question.
     """
-    session_id = request.session_id
-    user_query = request.user_query
+    session = await _require_session(request.session_id)
+    try:
+        turn = await support_runner.turn(request.session_id, request.user_query)
+    except SessionTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing query: {e}")
+    await _touch_session(request.session_id, session)
 
-    if session_id not in user_sessions:
-        raise HTTPException(status_code=404, detail="Session not found. Please start a session first.")
+    return {
+        "response": turn["messages"][-1] if turn["messages"] else "I'm here to help!",
+        "replies": turn["messages"],
+        "prompt": turn["prompt"],
+        "done": turn["done"],
+        "session_state": turn["state"],
+    }
 
-    # Update session state with query
-    state = user_sessions[session_id]
-    state["user_query"] = user_query
 
-    # Run through support graph
-    try:
-        updated_state = support_app.invoke(state)
-        user_sessions[session_id] = updated_state
+@router.get("/support/pending/{session_id}")
+async def pending_question(session_id: str):
+    """
+    The question the session is currently waiting on.
+    """
+    await _require_session(session_id)
+    return await support_runner.pending(session_id)
 
-        return {
-            "response": updated_state.get("conversation", [])[-1]["content"] if updated_state.get("conversation") else "I'm here to help!",
-            "session_state": updated_state
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing query: {e}")
+
+@router.post("/support/query/stream")
+async def stream_query(request: SupportRequest):
+    """
+    Same as /support/query but streams Maya's reply as Server-Sent Events.
+    The reply is saved to the session once the stream completes; the session
+    keeps waiting on the same follow-up question. Queries that need a human
+    specialist are refused (409): /support/query escalates them.
+    """
+    session = await _require_session(request.session_id)
+    state = await support_runner.get_state(request.session_id)
+    if not state or "conversation" not in state:
+        raise HTTPException(status_code=409, detail="Tell Maya your name first (POST /support/query)")
+    if needs_escalation(request.user_query):
+        raise HTTPException(status_code=409, detail="This needs a claims specialist; send it to POST /support/query")
+    await _touch_session(request.session_id, session)
+    return sse_token_stream(
+        support_runner.stream_and_save(request.session_id, state, stream_reply(state, request.user_query)))
 
 
 @router.post("/support/end")
-def end_session(session_id: str):
+async def end_session(session_id: str):
     """
     End a support session and clean up.
     """
-    if session_id not in user_sessions:
+    if await run_db(user_sessions.pop, session_id) is None:
         raise HTTPException(status_code=404, detail="Session not found.")
 
-    state = user_sessions.pop(session_id)
+    state = await support_runner.get_state(session_id) or {}
+    await support_runner.delete(session_id)
     state["session_complete"] = True
 
-    return {"message": f"Support session {session_id} ended.", "final_state": state}
+    return {
+        "message": f"Support session {session_id} ended.",
+        "final_state": state,
+        "context_savings": context_savings(state),
+    }
@@ -1,9 +1,15 @@
-from langgraph.graph import StateGraph, START, END
 from typing import TypedDict
-from core.dial_client import DialClient
-import json, time, re
-
-dial = DialClient()
+from core.dial_client import get_dial_client
+from core.conversation import ConversationRunner, say, ask, run_in_terminal
+from core.metrics import timed_node
+from core.fast_classifier import TieredClassifier
+from core.context import ConversationContext
+from agents.support_agent.query_rules import support_query_classifier
+import asyncio
+import time
+
+query_classifier = TieredClassifier("support_query", support_query_classifier)
+conversation_context = ConversationContext()
 
 class SupportState(TypedDict, total=False):
     name: str
@@ -13,6 +19,10 @@ class SupportState(TypedDict, total=False):
     satisfaction: bool
     needs_human: bool
     session_complete: bool
+    context_summary: str
+    summarized_upto: int
+    context_stats: dict
+    history_size: list
 
 
 # ----------------------------
@@ -64,11 +74,13 @@ INSURANCE_EDUCATION = {
 # ----------------------------
 # Helper Functions
 # ----------------------------
-def llm_classify_query(state: SupportState, user_query: str) -> str:
+async def llm_classify_query(state: SupportState, user_query: str) -> str:
     """Classify what the user is asking about"""
+    history = await conversation_context.render(state, "support.classify_query", budget_tokens=300)
     prompt = f"""
 User query: "{user_query}"
-Previous conversation: {json.dumps(state.get("conversation", []), indent=2)}
+Previous conversation:
+{history}
 
 Classify this query into one of these categories:
 - health_insurance (questions about health insurance)
@@ -82,10 +94,10 @@ Reply with just the category name.
 """
     
     try:
-        resp = dial.chat([
+        resp = await get_dial_client().chat([
             {"role": "system", "content": "You are a support query classifier."},
             {"role": "user", "content": prompt}
-        ])
+        ], cache=True, call_site="support.classify_query")
         category = resp.strip().lower()
         valid_categories = ["health_insurance", "vehicle_insurance", "company_info", "claims", "general_help", "satisfied"]
         return category if category in valid_categories else "general_help"
@@ -93,8 +105,13 @@ Reply with just the category name.
         return "general_help"
 
 
-def llm_generate_response(state: SupportState, user_query: str, category: str) -> str:
-    """Generate human-like responses based on query category"""
+async def classify_query(state: SupportState, user_query: str) -> str:
+    """Local rules answer confident cases; everything else goes to the LLM classifier"""
+    return await query_classifier.classify(user_query, lambda: llm_classify_query(state, user_query))
+
+
+async def build_response_messages(state: SupportState, user_query: str, category: str) -> list:
+    """Maya's prompt for a query category (shared by the blocking and streaming paths)"""
     
     if category == "company_info":
         context = f"""
@@ -121,7 +138,7 @@ def llm_generate_response(state: SupportState, user_query: str, category: str) -
     else:
         context = "General insurance and company support information available."
     
-    conversation_history = json.dumps(state.get("conversation", []), indent=2)
+    conversation_history = await conversation_context.render(state, "support.generate_response", budget_tokens=1200)
     
     prompt = f"""
 You are Maya, a friendly support agent at InsurAI. You're talking to {state.get('name', 'someone')} who needs help understanding insurance.
@@ -148,31 +165,74 @@ User just asked: "{user_query}"
 
 Give a helpful, natural response. If they're asking about something specific, explain it simply. If it's a general question, guide them to what they might want to know.
 """
-    
+    return [
+        {"role": "system", "content": "You are Maya, a friendly and knowledgeable insurance support agent."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+async def llm_generate_response(state: SupportState, user_query: str, category: str) -> str:
+    """Generate human-like responses based on query category"""
     try:
-        response = dial.chat([
-            {"role": "system", "content": "You are Maya, a friendly and knowledgeable insurance support agent."},
-            {"role": "user", "content": prompt}
-        ])
+        response = await get_dial_client().chat(await build_response_messages(state, user_query, category),
+                                   call_site="support.generate_response")
         return response.strip()
     except:
         return "I'm here to help you understand insurance better. What would you like to know about?"
 
 
+def needs_escalation(user_query: str) -> bool:
+    """Specific claim problems go to a human specialist rather than the model."""
+    query = user_query.lower()
+    return "claim" in query and "problem" in query
+
+
+async def stream_reply(state: SupportState, user_query: str):
+    """
+    Streaming counterpart of process_query for the HTTP layer.
+    Yields Maya's reply token by token; the assistant turn is written to
+    state only once the stream has finished. Queries that need_escalation()
+    must go through the graph's follow-up turn instead, which hands them over.
+    """
+    state.setdefault("conversation", [])
+    state["user_query"] = user_query
+    state["conversation"].append({"role": "user", "content": user_query, "timestamp": time.time()})
+
+    category = await classify_query(state, user_query)
+    state["current_topic"] = category
+    if category == "satisfied":
+        state["satisfaction"] = True
+        yield "Glad I could help! Is there anything else you'd like to know?"
+        return
+
+    messages = await build_response_messages(state, user_query, category)
+    parts = []
+    async for token in get_dial_client().chat_stream(messages, call_site="support.generate_response"):
+        parts.append(token)
+        yield token
+
+    state["conversation"].append({
+        "role": "assistant",
+        "content": "".join(parts).strip(),
+        "category": category,
+        "timestamp": time.time()
+    })
+
+
 # ----------------------------
 # Workflow Nodes
 # ----------------------------
 def welcome_user(state: SupportState) -> SupportState:
     """Welcome the user and get their name"""
-    print("Hi there! I'm Maya from InsurAI support. I'm here to help you understand insurance and answer any questions you have.")
+    say("Hi there! I'm Maya from InsurAI support. I'm here to help you understand insurance and answer any questions you have.")
     
-    name_input = input("What should I call you? ").strip()
+    name_input = ask("What should I call you?")
     if name_input:
         state["name"] = name_input
-        print(f"Nice to meet you, {name_input}!")
+        say(f"Nice to meet you, {name_input}!")
     else:
         state["name"] = "friend"
-        print("No worries!")
+        say("No worries!")
     
     state["conversation"] = []
     return state
@@ -180,34 +240,34 @@ def welcome_user(state: SupportState) -> SupportState:
 
 def get_user_query(state: SupportState) -> SupportState:
     """Get what the user wants to know about"""
-    print("\nSo what can I help you with today? You can ask me about:")
-    print("- Health insurance - what it is, why you need it")
-    print("- Vehicle insurance - car, bike coverage")  
-    print("- About InsurAI - our company and services")
-    print("- Or anything else insurance-related!")
+    say("So what can I help you with today? You can ask me about:\n"
+        "- Health insurance - what it is, why you need it\n"
+        "- Vehicle insurance - car, bike coverage\n"
+        "- About InsurAI - our company and services\n"
+        "- Or anything else insurance-related!")
     
-    query = input("\nWhat's on your mind? ").strip()
+    query = ask("What's on your mind?")
     state["user_query"] = query
     state["conversation"].append({"role": "user", "content": query, "timestamp": time.time()})
     
     return state
 
 
-def process_query(state: SupportState) -> SupportState:
+async def process_query(state: SupportState) -> SupportState:
     """Process the user's query and provide helpful information"""
     user_query = state.get("user_query", "")
     
     # Classify the query
-    category = llm_classify_query(state, user_query)
+    category = await classify_query(state, user_query)
     state["current_topic"] = category
     
     # Generate response based on category
     if category == "satisfied":
-        print("Glad I could help! Is there anything else you'd like to know?")
+        say("Glad I could help! Is there anything else you'd like to know?")
         state["satisfaction"] = True
     else:
-        response = llm_generate_response(state, user_query, category)
-        print(f"\n{response}")
+        response = await llm_generate_response(state, user_query, category)
+        say(response)
         
         state["conversation"].append({
             "role": "assistant", 
@@ -219,80 +279,88 @@ def process_query(state: SupportState) -> SupportState:
     return state
 
 
-def handle_followup(state: SupportState) -> SupportState:
-    """Handle follow-up questions and check if user needs more help"""
-    while True:
-        followup = input("\nAnything else you'd like to know? (or say 'thanks' if you're all set): ").strip().lower()
-        
-        if not followup or followup in ["thanks", "thank you", "no", "nope", "i'm good", "all good", "that's it"]:
-            state["satisfaction"] = True
-            print(f"You're welcome, {state.get('name')}! Feel free to reach out anytime if you have more questions.")
-            print("Have a great day!")
-            break
-        
-        # Process the follow-up question
-        state["user_query"] = followup
-        state["conversation"].append({"role": "user", "content": followup, "timestamp": time.time()})
-        
-        category = llm_classify_query(state, followup)
-        response = llm_generate_response(state, followup, category)
-        print(f"\n{response}")
-        
-        state["conversation"].append({
-            "role": "assistant",
-            "content": response,
-            "category": category, 
-            "timestamp": time.time()
-        })
-        
-        # Check if this seems like a complex issue that needs human help
-        if "claim" in followup.lower() and "problem" in followup.lower():
-            print("\nActually, for specific claim issues, let me connect you with one of our claims specialists who can look into your account directly.")
-            state["needs_human"] = True
-            break
+async def handle_followup(state: SupportState) -> SupportState:
+    """One follow-up question per pass; the graph loops back here until the session is complete"""
+    followup = ask("Anything else you'd like to know? (or say 'thanks' if you're all set):").lower()
+    
+    if not followup or followup in ["thanks", "thank you", "no", "nope", "i'm good", "all good", "that's it"]:
+        state["satisfaction"] = True
+        say(f"You're welcome, {state.get('name')}! Feel free to reach out anytime if you have more questions.")
+        say("Have a great day!")
+        state["session_complete"] = True
+        return state
+    
+    # Process the follow-up question
+    state["user_query"] = followup
+    state["conversation"].append({"role": "user", "content": followup, "timestamp": time.time()})
+    
+    category = await classify_query(state, followup)
+    response = await llm_generate_response(state, followup, category)
+    say(response)
+    
+    state["conversation"].append({
+        "role": "assistant",
+        "content": response,
+        "category": category, 
+        "timestamp": time.time()
+    })
+    
+    # Check if this seems like a complex issue that needs human help
+    if needs_escalation(followup):
+        say("Actually, for specific claim issues, let me connect you with one of our claims specialists who can look into your account directly.")
+        state["needs_human"] = True
+        state["session_complete"] = True
     
-    state["session_complete"] = True
     return state
 
 
 def end_session(state: SupportState) -> SupportState:
     """End the support session"""
     if state.get("needs_human"):
-        print("I'll have someone from our team call you within the next hour to help with your specific situation.")
+        say("I'll have someone from our team call you within the next hour to help with your specific situation.")
     
-    print("\nThanks for choosing InsurAI! Remember, we're here 24/7 if you need anything.")
+    say("Thanks for choosing InsurAI! Remember, we're here 24/7 if you need anything.")
     return state
 
 
 # ----------------------------
 # Graph Setup
 # ----------------------------
-workflow = StateGraph(SupportState)
+def build_workflow():
+    """The support graph, uncompiled. LangGraph is only imported once a conversation needs it."""
+    from langgraph.graph import StateGraph, START, END
+
+    workflow = StateGraph(SupportState)
+
+    # Add nodes (each one timed: insurai_graph_node_seconds at /metrics)
+    for name, node in {
+        "Welcome": welcome_user,
+        "GetQuery": get_user_query,
+        "ProcessQuery": process_query,
+        "HandleFollowup": handle_followup,
+        "EndSession": end_session,
+    }.items():
+        workflow.add_node(name, timed_node("support", name, node))
 
-# Add nodes
-workflow.add_node("Welcome", welcome_user)
-workflow.add_node("GetQuery", get_user_query) 
-workflow.add_node("ProcessQuery", process_query)
-workflow.add_node("HandleFollowup", handle_followup)
-workflow.add_node("EndSession", end_session)
+    # Add edges
+    workflow.add_edge(START, "Welcome")
+    workflow.add_edge("Welcome", "GetQuery")
+    workflow.add_edge("GetQuery", "ProcessQuery")
+    workflow.add_edge("ProcessQuery", "HandleFollowup")
 
-# Add edges
-workflow.add_edge(START, "Welcome")
-workflow.add_edge("Welcome", "GetQuery")
-workflow.add_edge("GetQuery", "ProcessQuery")
-workflow.add_edge("ProcessQuery", "HandleFollowup")
+    # Conditional edge from HandleFollowup
+    workflow.add_conditional_edges(
+        "HandleFollowup",
+        lambda state: "EndSession" if state.get("session_complete") else "HandleFollowup",
+        {"EndSession": "EndSession", "HandleFollowup": "HandleFollowup"}
+    )
 
-# Conditional edge from HandleFollowup
-workflow.add_conditional_edges(
-    "HandleFollowup",
-    lambda state: "EndSession" if state.get("session_complete") else "HandleFollowup",
-    {"EndSession": "EndSession", "HandleFollowup": "HandleFollowup"}
-)
+    workflow.add_edge("EndSession", END)
+    return workflow
 
-workflow.add_edge("EndSession", END)
 
-# Compile the workflow
-support_app = workflow.compile()
+# Compiled on first use with the shared checkpointer; one HTTP call = one turn
+support_runner = ConversationRunner(build_workflow, name="support")
 
 
 # ----------------------------
@@ -305,9 +373,7 @@ def run_support():
     print("=" * 50)
     
     try:
-        initial_state = SupportState()
-        final_state = support_app.invoke(initial_state)
-        return final_state
+        return asyncio.run(run_in_terminal(build_workflow(), SupportState()))
     except KeyboardInterrupt:
         print("\n\nThanks for visiting InsurAI support. Have a great day!")
     except Exception as e:
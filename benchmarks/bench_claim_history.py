@@ -0,0 +1,121 @@
+"""
+Claim history listing (claims_store.claim_history) on insurances with
+--depths claims each: the old fetch-all of every claim, LIMIT/OFFSET paging
+and keyset paging, for the first, middle and last page. Keyset pages should
+cost the same at every depth and position; fetch-all and OFFSET grow with it.
+
+    python -m benchmarks.bench_claim_history --depths 10,1000,50000 --page 10
+
+Runs on a throwaway database built through the migration runner; every claim
+carries a --doc-bytes document_text, which a listing must never read.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from core import db
+from agents.claims_agent import claims_store
+from agents.claims_agent.claims_store import claim_history, HISTORY_DEFAULT_COLUMNS
+
+FETCH_ALL_SQL = """
+    SELECT claim_number, claim_amount, claim_reason, status
+    FROM claims
+    WHERE insurance_type=? AND insurance_ref_id=?
+"""
+SEED_SQL = """
+    INSERT INTO claims (claim_number, user_id, insurance_type, insurance_ref_id, claim_reason,
+                        document_text, claim_amount, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+OFFSET_SQL = f"""
+    SELECT {", ".join(HISTORY_DEFAULT_COLUMNS)}
+    FROM claims
+    WHERE insurance_type=? AND insurance_ref_id=?
+    ORDER BY created_at, id LIMIT ? OFFSET ?
+"""
+
+
+def seed(depths: list[int], doc_bytes: int):
+    """Insurance i (health) gets depths[i] claims, one per minute, interleaved with the others."""
+    document = "x" * doc_bytes
+    with db.transaction() as conn:
+        rows = []
+        for n in range(max(depths)):
+            created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(1700000000 + n * 60))
+            for ref_id, depth in enumerate(depths, start=1):
+                if n < depth:
+                    rows.append((f"B-{ref_id}-{n}", 1, "health", ref_id, "bench", document, 1000.0, created_at))
+            if len(rows) >= 10000:
+                conn.executemany(SEED_SQL, rows)
+                rows = []
+        conn.executemany(SEED_SQL, rows)
+        conn.execute("ANALYZE")
+
+
+def timed(fn, runs: int) -> float:
+    """Median milliseconds of `runs` calls."""
+    ms = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        fn()
+        ms.append((time.perf_counter() - t) * 1000)
+    return round(statistics.median(ms), 3)
+
+
+def cursors(ref_id: int, page: int) -> list:
+    """The cursor for every page of one insurance (None for the first)."""
+    out, cursor = [None], None
+    while True:
+        cursor = claim_history("health", ref_id, limit=page, cursor=cursor).next_cursor
+        if cursor is None:
+            return out
+        out.append(cursor)
+
+
+def bench_depth(ref_id: int, depth: int, page: int, runs: int) -> dict:
+    pages = cursors(ref_id, page)
+    positions = {"first": 0, "middle": len(pages) // 2, "last": len(pages) - 1}
+
+    def fetch_all():
+        with db.connection() as conn:
+            return conn.execute(FETCH_ALL_SQL, ("health", ref_id)).fetchall()
+
+    def offset_page(index):
+        with db.connection() as conn:
+            return conn.execute(OFFSET_SQL, ("health", ref_id, page, index * page)).fetchall()
+
+    result = {"claims": depth, "pages": len(pages), "fetch_all_ms": timed(fetch_all, runs)}
+    for name, index in positions.items():
+        result[f"offset_{name}_ms"] = timed(lambda: offset_page(index), runs)
+        result[f"keyset_{name}_ms"] = timed(lambda: claim_history("health", ref_id, limit=page, cursor=pages[index]), runs)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depths", default="10,1000,50000", help="claims per insurance, comma-separated")
+    parser.add_argument("--page", type=int, default=claims_store.CLAIMS_HISTORY_PAGE)
+    parser.add_argument("--doc-bytes", type=int, default=2000, help="document_text size per claim")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+    depths = [int(d) for d in args.depths.split(",")]
+
+    with tempfile.TemporaryDirectory() as directory:
+        db.DB_PATH = os.path.join(directory, "history.db")
+        db.init_db()
+        t = time.perf_counter()
+        seed(depths, args.doc_bytes)
+        seed_s = time.perf_counter() - t
+        results = {str(depth): bench_depth(ref_id, depth, args.page, args.runs)
+                   for ref_id, depth in enumerate(depths, start=1)}
+        db.pool.close_all()
+
+    print(json.dumps({"page": args.page, "doc_bytes": args.doc_bytes, "seed_s": round(seed_s, 1),
+                      "depths": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Claims saved per second: the old save_claim (INSERT, commit, UPDATE claim_number,
+commit) versus a single INSERT with a preallocated claim number, and versus the
+group-commit writer shared by concurrent threads.
+
+    python -m benchmarks.bench_claims --claims 2000 --threads 8 [--synchronous FULL]
+
+Group commit pays off when every commit is an fsync (synchronous=FULL); with
+the default WAL + synchronous=NORMAL commits are already cheap.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from core import db, seed_db
+from agents.claims_agent import claims_store
+
+RECORD = {
+    "user_id": 1,
+    "insurance_type": "health",
+    "insurance_ref_id": 1,
+    "claim_reason": "bench",
+    "document_text": "City hospital bill",
+    "document_info": "Hospital bill",
+    "claim_amount": 1000,
+    "reimbursement": 1000,
+}
+
+
+def legacy_save(record):
+    # previous save_claim: two statements, two commits
+    conn = db.pool.get()
+    c = conn.cursor()
+    c.execute("""
+        INSERT INTO claims (user_id, insurance_type, insurance_ref_id, claim_reason, document_text, document_info, claim_amount, reimbursement, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'initiated')
+    """, (record["user_id"], record["insurance_type"], record["insurance_ref_id"], record["claim_reason"],
+          record["document_text"], record["document_info"], record["claim_amount"], record["reimbursement"]))
+    claim_id = c.lastrowid
+    conn.commit()
+    claim_number = f"CLM-{datetime.now().year}-{claim_id:05d}"
+    c.execute("UPDATE claims SET claim_number=? WHERE id=?", (claim_number, claim_id))
+    conn.commit()
+    return claim_id, claim_number
+
+
+def single_save(record):
+    return claims_store.insert_claims([record])[0]
+
+
+def group_save(record):
+    return claims_store.claim_writer.submit(record).result()
+
+
+MODES = {"legacy": legacy_save, "single": single_save, "group": group_save}
+
+
+def fresh_db(directory, name):
+    db.DB_PATH = os.path.join(directory, name)
+    seed_db.reset_db()
+    seed_db.seed_data()
+    return db.DB_PATH
+
+
+def run(mode, claims, threads):
+    save = MODES[mode]
+    per_thread = claims // threads
+    numbers = []
+    lock = threading.Lock()
+
+    def worker():
+        saved = [save(RECORD)[1] for _ in range(per_thread)]
+        with lock:
+            numbers.extend(saved)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    db.pool.close_all()
+    assert len(set(numbers)) == len(numbers), "duplicate claim numbers"
+    return {"mode": mode, "claims": len(numbers), "claims_per_sec": round(len(numbers) / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claims", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--synchronous", default=db.SQLITE_PRAGMAS["synchronous"])
+    args = parser.parse_args()
+    db.SQLITE_PRAGMAS["synchronous"] = args.synchronous
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = []
+        for mode in MODES:
+            fresh_db(directory, f"{mode}.db")
+            results.append(run(mode, args.claims, args.threads))
+    print(json.dumps({"threads": args.threads, "synchronous": args.synchronous, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Reads/writes per second under concurrent load: a fresh default sqlite3
+connection per operation (the old get_connection) versus the pooled, WAL-tuned
+connections in core.db.
+
+    python -m benchmarks.bench_db --threads 8 --seconds 5 --write-ratio 0.2
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from core import db, seed_db
+
+LOOKUP_SQL = """
+    SELECT uhi.id, uhi.user_id, uhi.status, p.name, p.coverage_limit, u.name, u.email
+    FROM user_health_insurance uhi
+    JOIN policies p ON uhi.policy_id = p.id
+    JOIN users u ON uhi.user_id = u.id
+    WHERE uhi.id=?
+"""
+INSERT_SQL = """
+    INSERT INTO claims (user_id, insurance_type, insurance_ref_id, claim_reason, document_text, claim_amount, reimbursement)
+    VALUES (1, 'health', 1, 'bench', 'City hospital bill', 1000, 1000)
+"""
+
+
+def naive_read(path):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(LOOKUP_SQL, (1,)).fetchone()
+    finally:
+        conn.close()
+
+
+def naive_write(path):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(INSERT_SQL)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def pooled_read(path):
+    with db.connection() as conn:
+        conn.execute(LOOKUP_SQL, (1,)).fetchone()
+
+
+def pooled_write(path):
+    with db.transaction() as conn:
+        conn.execute(INSERT_SQL)
+
+
+def fresh_db(directory, name):
+    db.DB_PATH = os.path.join(directory, name)
+    seed_db.reset_db()
+    seed_db.seed_data()
+    db.pool.close_all()
+    if name.startswith("naive"):
+        # back to the default rollback journal for the baseline
+        conn = sqlite3.connect(db.DB_PATH)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+    return db.DB_PATH
+
+
+def run(mode, path, threads, seconds, write_ratio):
+    read, write = (naive_read, naive_write) if mode == "naive" else (pooled_read, pooled_write)
+    counts = {"reads": 0, "writes": 0, "locked_errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        local = {"reads": 0, "writes": 0, "locked_errors": 0}
+        while time.perf_counter() < deadline:
+            try:
+                if rnd.random() < write_ratio:
+                    write(path)
+                    local["writes"] += 1
+                else:
+                    read(path)
+                    local["reads"] += 1
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                local["locked_errors"] += 1
+        with lock:
+            for k, v in local.items():
+                counts[k] += v
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    db.pool.close_all()
+    return {
+        "mode": mode,
+        "reads_per_sec": round(counts["reads"] / seconds, 1),
+        "writes_per_sec": round(counts["writes"] / seconds, 1),
+        "locked_errors": counts["locked_errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = [
+            run(mode, fresh_db(directory, f"{mode}.db"), args.threads, args.seconds, args.write_ratio)
+            for mode in ("naive", "pooled")
+        ]
+    print(json.dumps({"threads": args.threads, "seconds": args.seconds,
+                      "write_ratio": args.write_ratio, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
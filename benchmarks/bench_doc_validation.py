@@ -0,0 +1,145 @@
+"""
+Claim-document validation with and without the local pre-screen and the
+persistent verdict memo, against a simulated LLM validator.
+
+The workload mixes valid new documents, obvious failures (no hospital /
+police station details) and resubmissions of earlier documents with
+different whitespace and case. Reports LLM calls made and avoided, the
+per-document latency distribution, and how many valid documents were
+rejected (should be 0 in every mode).
+
+    python -m benchmarks.bench_doc_validation --docs 2000 --latency 0.2 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from core import db
+from core.document_validation import DocumentValidator, DocumentPrescreen, SQLiteValidationMemo, normalize_document
+from agents.claims_agent.document_rules import CLAIM_DOCUMENT_RULES, CLAIM_DOCUMENT_REQUIRES, CLAIM_DOCUMENT_MIN_CHARS
+
+VALID = {
+    "health": [
+        "City Hospital, Pune. Discharge summary for patient {n}. Admitted on 3 March for dengue, total bill INR {amt}.",
+        "Apollo Clinic invoice {n}: consultation with Dr. Mehta, lab report and pharmacy charges INR {amt}.",
+        "Sunrise Nursing Home - in-patient bill no {n}, ICU 2 days, ward 3 days, amount INR {amt}.",
+    ],
+    "vehicle": [
+        "FIR no {n}/2025 registered at Kothrud Police Station. Car hit by truck, repair estimate INR {amt}.",
+        "Police complaint {n}: bike stolen near market, reported to SHO Andheri police station. Value INR {amt}.",
+    ],
+}
+INVALID = {
+    "health": ["Grocery receipt {n}: rice, dal, oil, total INR {amt}.", "Gym membership renewal {n}, INR {amt}."],
+    "vehicle": ["Car wash invoice {n}, premium polish INR {amt}.", "Fuel bill {n} at highway pump, INR {amt}."],
+}
+
+
+def make_workload(count: int, invalid_share: float, resubmit_share: float, seed: int) -> list[tuple[str, str, bool]]:
+    """[(claim_type, text, should_pass)], with resubmissions lightly reformatted."""
+    rnd = random.Random(seed)
+    docs = []
+    for n in range(count):
+        if docs and rnd.random() < resubmit_share:
+            claim_type, text, ok = rnd.choice(docs)
+            text = text.upper() if rnd.random() < 0.5 else "  " + text.replace(" ", "  ") + "\n"
+            docs.append((claim_type, text, ok))
+            continue
+        claim_type = rnd.choice(["health", "vehicle"])
+        ok = rnd.random() >= invalid_share
+        template = rnd.choice((VALID if ok else INVALID)[claim_type])
+        docs.append((claim_type, template.format(n=n, amt=rnd.randint(500, 90000)), ok))
+    return docs
+
+
+class SimulatedValidator:
+    """Stands in for DialClient.validate_claim_document: sleeps, then applies the prompt's rules."""
+
+    def __init__(self, latency: float, seed: int):
+        self.latency = latency
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    async def __call__(self, claim_type: str, text: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency * self._random.uniform(0.6, 1.8))
+        needed = ("hospital", "clinic", "nursing home") if claim_type == "health" else ("police", "fir")
+        text = normalize_document(text)
+        return "YES | document details" if any(w in text for w in needed) else "NO"
+
+
+async def run(mode: str, docs, latency: float, concurrency: int, seed: int) -> dict:
+    llm = SimulatedValidator(latency, seed)
+    if mode == "llm_only":
+        async def validate(claim_type, text):
+            return await llm(claim_type, text)
+        validator = None
+    else:
+        validator = DocumentValidator(
+            "bench",
+            DocumentPrescreen(CLAIM_DOCUMENT_RULES, CLAIM_DOCUMENT_MIN_CHARS, CLAIM_DOCUMENT_REQUIRES),
+            memo=SQLiteValidationMemo() if mode == "prescreen+memo" else None,
+            use_prescreen=True,
+            use_memo=mode == "prescreen+memo",
+        )
+
+        async def validate(claim_type, text):
+            return await validator.validate(claim_type, text, lambda: llm(claim_type, text))
+
+    gate = asyncio.Semaphore(concurrency)
+    ms, false_rejects = [], 0
+
+    async def one(claim_type, text, should_pass):
+        nonlocal false_rejects
+        async with gate:
+            t = time.perf_counter()
+            result = await validate(claim_type, text)
+            ms.append((time.perf_counter() - t) * 1000)
+        if should_pass and not result.startswith("YES"):
+            false_rejects += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(*d) for d in docs))
+    elapsed = time.perf_counter() - start
+    q = statistics.quantiles(ms, n=100)
+    return {
+        "mode": mode,
+        "llm_calls": llm.calls,
+        "llm_calls_avoided": len(docs) - llm.calls,
+        "valid_docs_rejected": false_rejects,
+        "p50_ms": round(q[49], 2),
+        "p95_ms": round(q[94], 2),
+        "p99_ms": round(q[98], 2),
+        "docs_per_sec": round(len(docs) / elapsed, 1),
+        **({"stats": validator.stats_dict()} if validator else {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--invalid-share", type=float, default=0.25)
+    parser.add_argument("--resubmit-share", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean seconds per LLM validation")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    docs = make_workload(args.docs, args.invalid_share, args.resubmit_share, args.seed)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        db.DB_PATH = os.path.join(directory, "validation.db")
+        db.init_db()
+        for mode in ("llm_only", "prescreen", "prescreen+memo"):
+            results.append(asyncio.run(run(mode, docs, args.latency, args.concurrency, args.seed)))
+        db.pool.close_all()
+    print(json.dumps({"docs": args.docs, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
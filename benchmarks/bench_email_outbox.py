@@ -0,0 +1,74 @@
+"""
+Outbox throughput and latency against the offline FakeTransport.
+
+    python -m benchmarks.bench_email_outbox --messages 2000 --workers 4 --latency 0.05 --failure-rate 0.05
+
+Reports how long enqueue() blocks the request path, end-to-end delivery
+throughput, and how many provider calls were needed. --attachments sends
+every message on its own (the batch API does not take attachments).
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from core import db
+from core.email_outbox import EmailOutbox
+from core.email_transport import FakeTransport
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per provider API call")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--attachments", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db.DB_PATH = os.path.join(directory, "outbox.db")
+        db.init_db()
+        transport = FakeTransport(latency=args.latency, failure_rate=args.failure_rate, seed=1)
+        outbox = EmailOutbox(transport, workers=args.workers, backoff_base=0.05, backoff_max=0.5,
+                             max_attempts=10, poll_interval=0.05)
+        attachments = [{"filename": "policy.pdf", "content": "JVBERi0=", "type": "application/pdf"}] \
+            if args.attachments else None
+
+        outbox.start()
+        start = time.perf_counter()
+        enqueue_ms = []
+        for i in range(args.messages):
+            t = time.perf_counter()
+            outbox.enqueue(f"user{i}@example.com", "Your policy", "<p>Hi</p>", attachments)
+            enqueue_ms.append((time.perf_counter() - t) * 1000)
+        while outbox.stats()["sent"] + outbox.stats()["failed"] < args.messages:
+            time.sleep(0.02)
+        elapsed = time.perf_counter() - start
+        outbox.stop()
+        stats = outbox.stats()
+        db.pool.close_all()
+
+    print(json.dumps({
+        "messages": args.messages,
+        "workers": args.workers,
+        "provider_latency_s": args.latency,
+        "failure_rate": args.failure_rate,
+        "attachments": args.attachments,
+        "enqueue_ms": {"mean": round(statistics.mean(enqueue_ms), 3), "p99": round(percentile(enqueue_ms, 99), 3)},
+        "delivered_per_sec": round(stats["sent"] / elapsed, 1),
+        "provider_calls": transport.calls,
+        "outbox": stats,
+        "inline_estimate_per_sec": round(1 / args.latency, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
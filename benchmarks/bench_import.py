@@ -0,0 +1,94 @@
+"""
+Cold-start guard: how long `import main` takes in a fresh interpreter, from
+`python -X importtime`, and which packages it pulls in.
+
+    python -m benchmarks.bench_import --runs 7 --budget-ms 1500
+
+Each run is a new process with no .pyc warm-up beyond what is on disk. Reports
+the median cumulative import time of the module, the slowest top-level
+packages (self time summed per package) and exits non-zero if the median is
+over --budget-ms or any --deferred package was imported: the LLM SDK,
+LangGraph and the vendor SDKs must only load on first use (or when
+STARTUP_WARMUP=1 runs the lifespan warm-up).
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFERRED = ("openai", "langgraph", "langchain_core", "twilio", "resend", "fpdf", "PyPDF2", "numpy", "httpx")
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def import_once(module: str, env: dict) -> tuple[float, dict]:
+    """(cumulative ms for `module`, {module name: self us}) for one fresh interpreter."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    modules, total_us = {}, None
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, indent, name = int(m[1]), int(m[2]), m[3], m[4]
+        modules[name] = self_us
+        if name == module and not indent:
+            total_us = cumulative_us
+    return total_us / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="fail if the median import is slower")
+    parser.add_argument("--deferred", nargs="*", default=list(DEFERRED), help="packages that must not load at import")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # importing must not need credentials or touch a database; point the paths somewhere harmless anyway
+        env = {**os.environ, "INSURAI_DB_PATH": os.path.join(tmp, "insurai.db"),
+               "CHECKPOINT_DB_PATH": os.path.join(tmp, "checkpoints.db"), "PYTHONDONTWRITEBYTECODE": "1"}
+        for key in ("DAIL_API_KEY", "API_VERSION", "AZURE_ENDPOINT"):
+            env.pop(key, None)
+        import_once(args.module, env)   # populate the OS file cache
+        totals, modules = [], {}
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            total, modules = import_once(args.module, env)
+            totals.append(total)
+        wall_ms = (time.perf_counter() - start) / args.runs * 1000
+
+    packages = {}
+    for name, self_us in modules.items():
+        top = name.split(".")[0]
+        packages[top] = packages.get(top, 0) + self_us
+    slowest = sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]
+    loaded = sorted({name.split(".")[0] for name in modules} & set(args.deferred))
+    median = statistics.median(totals)
+
+    print(json.dumps({
+        "module": args.module,
+        "runs": args.runs,
+        "import_ms_median": round(median, 1),
+        "import_ms_min": round(min(totals), 1),
+        "process_wall_ms": round(wall_ms, 1),
+        "modules_loaded": len(modules),
+        "slowest_packages_ms": {name: round(us / 1000, 1) for name, us in slowest},
+        "deferred_packages_loaded": loaded,
+        "budget_ms": args.budget_ms,
+        "ok": median <= args.budget_ms and not loaded,
+    }, indent=2))
+    sys.exit(0 if median <= args.budget_ms and not loaded else 1)
+
+
+if __name__ == "__main__":
+    main()
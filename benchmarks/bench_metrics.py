@@ -0,0 +1,172 @@
+"""
+Overhead of the metrics layer (core.metrics): the raw cost of one histogram
+observation, of a timed graph node (sync and async) and of a timed
+connection() block, then whole support-graph turns with metrics on versus
+METRICS_ENABLED=0 (run in a subprocess, since nodes are wrapped at import).
+
+The budget: timers may add at most --budget (default 1%) to a turn, estimated
+as observations per turn x cost per timed call over the measured turn time.
+
+    python -m benchmarks.bench_metrics --iterations 200000 --turns 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from core import db
+from core.metrics import Histogram, timed_node, render_metrics
+
+
+def per_call_ns(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    fn(iterations)
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def bench_observe(iterations: int) -> float:
+    child = Histogram("bench_seconds", "bench", ("a",)).labels("x")
+
+    def loop(n):
+        observe = child.observe
+        for i in range(n):
+            observe(0.003)
+    return per_call_ns(loop, iterations)
+
+
+def bench_sync_node(iterations: int) -> float:
+    def node(state):
+        return state
+
+    def loop(fn):
+        def run(n):
+            state = {}
+            for _ in range(n):
+                fn(state)
+        return run
+
+    timed = timed_node("bench", "sync", node)
+    return per_call_ns(loop(timed), iterations) - per_call_ns(loop(node), iterations)
+
+
+def bench_async_node(iterations: int) -> float:
+    async def node(state):
+        return state
+
+    def loop(fn):
+        def run(n):
+            async def go():
+                state = {}
+                for _ in range(n):
+                    await fn(state)
+            asyncio.run(go())
+        return run
+
+    timed = timed_node("bench", "async", node)
+    return per_call_ns(loop(timed), iterations) - per_call_ns(loop(node), iterations)
+
+
+def bench_connection(iterations: int, tmp: str) -> float:
+    db.DB_PATH = os.path.join(tmp, "bench.db")
+
+    def loop(n):
+        for _ in range(n):
+            with db.connection():
+                pass
+
+    db.METRICS_ENABLED = False
+    off = per_call_ns(loop, iterations)
+    db.METRICS_ENABLED = True
+    on = per_call_ns(loop, iterations)
+    db.pool.close_all()
+    return on - off
+
+
+def observation_count() -> int:
+    return sum(int(float(v)) for v in re.findall(r"^\w+_count(?:\{[^}]*\})? (\S+)$", render_metrics(), re.M))
+
+
+def measure_turns(turns: int, tmp: str) -> dict:
+    """Mean support-graph turn (offline LLM, SQLite checkpointer) and observations recorded per turn."""
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    import agents.support_agent.support_graph as support_graph
+    from benchmarks.bench_turns import offline_chat
+    from core.conversation import ConversationRunner
+    from core.dial_client import get_dial_client
+
+    get_dial_client().chat = offline_chat
+
+    async def run():
+        conn = await aiosqlite.connect(os.path.join(tmp, "ckpt.db"))
+        saver = AsyncSqliteSaver(conn)
+        await saver.setup()
+        runner = ConversationRunner(support_graph.build_workflow, checkpointer=saver)
+        try:
+            await runner.turn("bench", initial={})
+            await runner.turn("bench", "Asha")
+            for i in range(20):   # warm-up
+                await runner.turn("bench", f"warm-up question {i}")
+            before, ms = observation_count(), []
+            for i in range(turns):
+                t = time.perf_counter()
+                await runner.turn("bench", f"question number {i} about my health cover")
+                ms.append((time.perf_counter() - t) * 1000)
+            return ms, (observation_count() - before) / turns
+        finally:
+            await conn.close()
+
+    ms, observations = asyncio.run(run())
+    return {"turn_mean_ms": round(statistics.fmean(ms), 3), "turn_p50_ms": round(statistics.median(ms), 3),
+            "observations_per_turn": round(observations, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--budget", type=float, default=0.01, help="allowed share of a turn spent in timers")
+    parser.add_argument("--turns-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.turns_only:
+            print(json.dumps(measure_turns(args.turns, tmp)))
+            return
+
+        micro = {
+            "observe_ns": round(bench_observe(args.iterations), 1),
+            "sync_node_overhead_ns": round(bench_sync_node(args.iterations), 1),
+            "async_node_overhead_ns": round(bench_async_node(args.iterations), 1),
+            "connection_overhead_ns": round(bench_connection(args.iterations // 4, tmp), 1),
+        }
+        on = measure_turns(args.turns, tmp)
+
+    child = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_metrics", "--turns-only", "--turns", str(args.turns)],
+        env={**os.environ, "METRICS_ENABLED": "0"}, capture_output=True, text=True, check=True,
+    )
+    off = json.loads(child.stdout.strip().splitlines()[-1])
+
+    per_timer_ns = max(micro["sync_node_overhead_ns"], micro["async_node_overhead_ns"], micro["connection_overhead_ns"])
+    estimated_ms = on["observations_per_turn"] * per_timer_ns / 1e6
+    share = estimated_ms / on["turn_mean_ms"]
+    print(json.dumps({
+        "micro": micro,
+        "turns": {"metrics_on": on, "metrics_off": off,
+                  "measured_delta_ms": round(on["turn_mean_ms"] - off["turn_mean_ms"], 3)},
+        "estimated_overhead_ms_per_turn": round(estimated_ms, 4),
+        "estimated_overhead_share": round(share, 5),
+        "budget": args.budget,
+        "within_budget": share <= args.budget,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
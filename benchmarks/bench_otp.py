@@ -0,0 +1,76 @@
+"""
+OTP issue / verify operations per second for each OtpStore backend.
+
+    python -m benchmarks.bench_otp --phones 20000 --threads 4
+
+The redis backend runs against the in-process LocalRedis stand-in, so its
+numbers measure the store logic, not a network round trip.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from core import db
+from core.otp_store import MemoryOtpStore, SQLiteOtpStore, RedisOtpStore, LocalRedis
+
+
+def make_store(backend):
+    limits = {"rate_limit": 10 ** 9, "ttl": 300}
+    if backend == "memory":
+        return MemoryOtpStore(sweep_interval=1, **limits)
+    if backend == "sqlite":
+        return SQLiteOtpStore(**limits)
+    return RedisOtpStore(LocalRedis(), **limits)
+
+
+def run_phase(fn, phones, threads):
+    chunks = [phones[i::threads] for i in range(threads)]
+    workers = [threading.Thread(target=lambda c=c: [fn(p) for p in c]) for c in chunks]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return round(len(phones) / (time.perf_counter() - start), 1)
+
+
+def bench(backend, count, threads):
+    store = make_store(backend)
+    phones = [f"+9190000{i:05d}" for i in range(count)]
+    codes = {}
+
+    def issue(phone):
+        codes[phone] = store.issue(phone)
+
+    ok = []
+
+    def verify(phone):
+        ok.append(store.verify(phone, codes[phone]))
+
+    issue_rate = run_phase(issue, phones, threads)
+    verify_rate = run_phase(verify, phones, threads)
+    replay = sum(store.verify(p, codes[p]) for p in phones[:100])   # codes are single use
+    store.close()
+    db.pool.close_all()
+    assert all(ok) and replay == 0
+    return {"backend": backend, "issue_per_sec": issue_rate, "verify_per_sec": verify_rate}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phones", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db.DB_PATH = os.path.join(directory, "otp.db")
+        db.init_db()
+        results = [bench(b, args.phones, args.threads) for b in ("memory", "sqlite", "redis")]
+    print(json.dumps({"phones": args.phones, "threads": args.threads, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
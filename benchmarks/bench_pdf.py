@@ -0,0 +1,89 @@
+"""
+Policy PDFs per second: the old render-to-policy.pdf-and-read-back path versus
+in-memory rendering from the cached template, one at a time and in batches
+over the process pool.
+
+    python -m benchmarks.bench_pdf --count 2000 --workers 4
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from fpdf import FPDF
+from core import policy_pdf
+
+
+def legacy_render(path, user_name, policy_name, premium, coverage, benefits, insurance_type):
+    # previous generate_policy_pdf + the re-read in send_policy_email
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(200, 10, "InsurAI Insurance Policy Document", ln=True, align="C")
+    pdf.ln(10)
+    pdf.set_font("Arial", "", 12)
+    pdf.cell(200, 10, f"Policy Holder: {user_name}", ln=True)
+    pdf.cell(200, 10, f"Policy Type: {insurance_type.capitalize()}", ln=True)
+    pdf.cell(200, 10, f"Policy Name: {policy_name}", ln=True)
+    pdf.cell(200, 10, f"Premium: INR {premium}/year", ln=True)
+    pdf.cell(200, 10, f"Coverage: INR {coverage}", ln=True)
+    pdf.multi_cell(200, 10, f"Benefits: {benefits}", align="L")
+    pdf.ln(10)
+    pdf.cell(200, 10, "This is a system-generated insurance policy.", ln=True, align="C")
+    pdf.output(path)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def make_docs(count):
+    return [
+        {
+            "user_name": f"Customer {i}",
+            "policy_name": ("Basic", "Standard", "Premium")[i % 3],
+            "premium": 5000 + i,
+            "coverage": 200000,
+            "benefits": "Accident cover, theft protection, roadside assistance",
+            "insurance_type": ("health", "car", "bike")[i % 3],
+        }
+        for i in range(count)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=policy_pdf.PDF_RENDER_WORKERS)
+    args = parser.parse_args()
+    docs = make_docs(args.count)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "policy.pdf")
+        legacy, legacy_s = timed(lambda: [legacy_render(path, **d) for d in docs])
+    single, single_s = timed(lambda: [policy_pdf.render_policy_pdf(**d) for d in docs])
+    policy_pdf.render_policy_pdfs(docs[:args.workers * policy_pdf.PDF_BATCH_MIN], args.workers)   # warm the pool
+    batch, batch_s = timed(lambda: policy_pdf.render_policy_pdfs(docs, args.workers))
+    policy_pdf.shutdown_render_pool()
+
+    # documents differ only in their CreationDate stamp
+    assert [len(b) for b in legacy] == [len(b) for b in single] == [len(b) for b in batch]
+    assert all(b.startswith(b"%PDF") for b in batch)
+    print(json.dumps({
+        "count": args.count,
+        "workers": args.workers,
+        "pdfs_per_sec": {
+            "legacy_file": round(args.count / legacy_s, 1),
+            "single_in_memory": round(args.count / single_s, 1),
+            "batch_process_pool": round(args.count / batch_s, 1),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Claim-document ingestion: pages/sec of text extraction across document
+sizes, in-process versus split over the process pool, plus the streaming
+multipart reader's throughput (upload -> temp file) for the same files.
+
+    python -m benchmarks.bench_pdf_extract --pages 1 5 20 50 --repeat 3 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from fpdf import FPDF
+
+from core.pdf_service import extract_pdf_text, receive_pdf_upload, shutdown_extract_pool
+
+BOUNDARY = "bench-boundary-7d1f"
+
+
+def make_bill(pages: int) -> bytes:
+    """A hospital-bill-like PDF: `pages` pages of 40 itemised lines each."""
+    pdf = FPDF()
+    for p in range(pages):
+        pdf.add_page()
+        pdf.set_font("Arial", "", 10)
+        for line in range(40):
+            pdf.cell(0, 6, f"City Hospital - item {p * 40 + line}: ward charges, pharmacy, INR {100 + line * 7}", ln=True)
+    out = pdf.output(dest="S")
+    return out.encode("latin-1") if isinstance(out, str) else bytes(out)
+
+
+def multipart_body(data: bytes) -> bytes:
+    head = (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"bill.pdf\"\r\n"
+            "Content-Type: application/pdf\r\n\r\n").encode()
+    return head + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def chunks(body: bytes, size: int = 64 * 1024):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+def time_extract(path: str, pages: int, repeat: int, workers: int) -> float:
+    extract_pdf_text(path, max_pages=pages, workers=workers)   # warm-up (starts the pool)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extract_pdf_text(path, max_pages=pages, workers=workers)
+    return pages * repeat / (time.perf_counter() - start)
+
+
+def time_upload(body: bytes, repeat: int) -> float:
+    async def run():
+        for _ in range(repeat):
+            upload = await receive_pdf_upload(chunks(body), f"multipart/form-data; boundary={BOUNDARY}",
+                                              max_bytes=len(body))
+            upload.discard()
+    start = time.perf_counter()
+    asyncio.run(run())
+    return len(body) * repeat / (time.perf_counter() - start) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20, 50])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            data = make_bill(pages)
+            path = os.path.join(tmp, f"bill-{pages}.pdf")
+            with open(path, "wb") as f:
+                f.write(data)
+            results.append({
+                "pages": pages,
+                "kb": round(len(data) / 1024, 1),
+                "inline_pages_per_sec": round(time_extract(path, pages, args.repeat, workers=1), 1),
+                "pool_pages_per_sec": round(time_extract(path, pages, args.repeat, workers=args.workers), 1),
+                "upload_mb_per_sec": round(time_upload(multipart_body(data), max(args.repeat, 20)), 1),
+            })
+    shutdown_extract_pool()
+    print(json.dumps({"workers": args.workers, "cpus": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
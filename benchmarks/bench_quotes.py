@@ -0,0 +1,120 @@
+"""
+Bulk premium quoting (agents.onboarding_agent.rating): the per-customer
+formulas the conversation uses, looped in Python, against the NumPy batch
+path, for --rows prospects of each insurance type. Every batch row is
+checked against the scalar result (all three tiers), then the columnar JSON
+response and a POST /onboarding/quotes/batch round trip are timed.
+
+    python -m benchmarks.bench_quotes --rows 1000000 --http-rows 10000
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from agents.onboarding_agent.rating import (
+    quote_batch, vehicle_premium, health_premium, plan_tiers,
+    VEHICLE_COVERAGE, VEHICLE_BENEFITS, HEALTH_COVERAGE, HEALTH_BENEFITS,
+)
+
+
+def prospects(kind: str, rows: int, seed: int = 11) -> dict:
+    rng = np.random.default_rng(seed)
+    if kind == "vehicle":
+        return {"age": rng.integers(0, 25, rows).astype(np.float64),
+                "kms": rng.integers(0, 300000, rows).astype(np.float64),
+                "cc": rng.choice([800, 1200, 1500, 2000, 3000], rows).astype(np.float64)}
+    return {"members": rng.integers(1, 8, rows).astype(np.float64),
+            "avg_age": np.round(rng.uniform(1, 80, rows), 1)}
+
+
+def scalar_quotes(kind: str, columns: dict) -> list[dict]:
+    if kind == "vehicle":
+        return [plan_tiers(vehicle_premium(a, k, c), VEHICLE_COVERAGE, VEHICLE_BENEFITS)
+                for a, k, c in zip(columns["age"], columns["kms"], columns["cc"])]
+    return [plan_tiers(health_premium(m, a), HEALTH_COVERAGE, HEALTH_BENEFITS)
+            for m, a in zip(columns["members"], columns["avg_age"])]
+
+
+def mismatches(batch, scalar: list[dict]) -> int:
+    bad = 0
+    for tier in scalar[0].values():
+        name = tier["name"]
+        expected = np.fromiter((plans[c]["premium"] for plans in scalar for c in plans
+                                if plans[c]["name"] == name), dtype=np.int64, count=len(scalar))
+        bad += int((batch.premiums[name] != expected).sum())
+        bad += int(batch.coverage[name] != tier["coverage"]) + int(batch.benefits[name] != tier["benefits"])
+    return bad
+
+
+def bench_kind(kind: str, rows: int) -> dict:
+    columns = prospects(kind, rows)
+    as_lists = {k: v.tolist() for k, v in columns.items()}   # what the scalar loop sees in the conversation
+
+    t = time.perf_counter()
+    scalar = scalar_quotes(kind, as_lists)
+    scalar_s = time.perf_counter() - t
+
+    runs = []
+    for _ in range(5):
+        t = time.perf_counter()
+        batch = quote_batch(kind, columns)
+        runs.append(time.perf_counter() - t)
+    batch_s = statistics.median(runs)
+
+    t = time.perf_counter()
+    from_lists = quote_batch(kind, as_lists)
+    from_lists_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    body = json.dumps(batch.as_dict(), separators=(",", ":"))
+    json_s = time.perf_counter() - t
+
+    return {
+        "rows": rows,
+        "python_loop_s": round(scalar_s, 3),
+        "numpy_batch_ms": round(batch_s * 1000, 2),
+        "numpy_from_lists_ms": round(from_lists_s * 1000, 2),
+        "speedup": round(scalar_s / batch_s, 1),
+        "quotes_per_sec": int(rows / batch_s),
+        "json_encode_ms": round(json_s * 1000, 1),
+        "json_mb": round(len(body) / 1e6, 1),
+        "mismatches": mismatches(batch, scalar) + mismatches(from_lists, scalar),
+    }
+
+
+def bench_http(rows: int, calls: int) -> dict:
+    from fastapi.testclient import TestClient
+    from agents.onboarding_agent.onboarding_api import app
+
+    client = TestClient(app)
+    payload = {"insurance_type": "vehicle", **{k: v.tolist() for k, v in prospects("vehicle", rows).items()}}
+    client.post("/onboarding/quotes/batch", json=payload)   # warm-up (imports NumPy)
+    ms = []
+    for _ in range(calls):
+        t = time.perf_counter()
+        response = client.post("/onboarding/quotes/batch", json=payload)
+        ms.append((time.perf_counter() - t) * 1000)
+        assert response.status_code == 200 and response.json()["count"] == rows
+    p50 = statistics.median(ms)
+    return {"rows_per_call": rows, "calls": calls, "p50_ms": round(p50, 2), "max_ms": round(max(ms), 2),
+            "quotes_per_sec": int(rows / (p50 / 1000))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--http-rows", type=int, default=10000, help="prospects per API call (0 = skip)")
+    parser.add_argument("--http-calls", type=int, default=20)
+    args = parser.parse_args()
+
+    result = {kind: bench_kind(kind, args.rows) for kind in ("vehicle", "health")}
+    if args.http_rows:
+        result["http"] = bench_http(args.http_rows, args.http_calls)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+OTP send latency and SMS throughput against the offline FakeSmsGateway:
+sending inline (the caller waits for the provider, as before) versus queueing
+on the SmsDispatcher worker pool.
+
+    python -m benchmarks.bench_sms --messages 500 --latency 0.2 --workers 8
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+from core.sms_service import FakeSmsGateway, SmsDispatcher, FINAL_STATUSES
+
+
+def timed_calls(fn, count):
+    ms = []
+    for i in range(count):
+        t = time.perf_counter()
+        fn(i)
+        ms.append((time.perf_counter() - t) * 1000)
+    return ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per provider call")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    # inline: only a sample, it takes latency * messages
+    inline_count = min(args.messages, 20)
+    gateway = FakeSmsGateway(latency=args.latency, delivery_delay=0.1, seed=1)
+    inline_ms = timed_calls(lambda i: gateway.send(f"+91900000{i:04d}", "Your OTP is 123456"), inline_count)
+
+    gateway = FakeSmsGateway(latency=args.latency, failure_rate=args.failure_rate, delivery_delay=0.1, seed=1)
+    dispatcher = SmsDispatcher(gateway, workers=args.workers)
+    finished = threading.Semaphore(0)
+    start = time.perf_counter()
+    jobs = []
+    queued_ms = timed_calls(
+        lambda i: jobs.append(dispatcher.dispatch(
+            f"+91900000{i:04d}", "Your OTP is 123456",
+            on_status=lambda job: job["status"] in ("sent", "error") and finished.release(),
+        )),
+        args.messages,
+    )
+    for _ in jobs:
+        finished.acquire()
+    handed_over = time.perf_counter() - start
+
+    # delivery reports by polling
+    time.sleep(gateway.delivery_delay)
+    statuses = [dispatcher.refresh(j)["status"] for j in jobs]
+    dispatcher.shutdown()
+    assert all(s in FINAL_STATUSES for s in statuses)
+
+    print(json.dumps({
+        "messages": args.messages,
+        "provider_latency_s": args.latency,
+        "workers": args.workers,
+        "caller_wait_ms": {
+            "inline_mean": round(statistics.mean(inline_ms), 3),
+            "queued_mean": round(statistics.mean(queued_ms), 3),
+            "queued_max": round(max(queued_ms), 3),
+        },
+        "sms_per_sec": {
+            "inline": round(1 / args.latency, 1),
+            "dispatcher": round(args.messages / handed_over, 1),
+        },
+        "final_statuses": {s: statuses.count(s) for s in sorted(set(statuses))},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
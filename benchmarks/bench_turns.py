@@ -0,0 +1,70 @@
+"""
+Per-turn latency of the support graph driven one HTTP-style turn at a time
+through the SQLite checkpointer, early in a conversation versus late in it,
+with old checkpoints pruned (CHECKPOINT_KEEP) and with every checkpoint kept.
+The LLM is replaced by an instant offline reply so only graph + checkpoint
+cost is measured.
+
+    python -m benchmarks.bench_turns --turns 300 --window 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+import agents.support_agent.support_graph as support_graph
+from core.conversation import ConversationRunner, CHECKPOINT_KEEP
+from core.dial_client import get_dial_client
+
+
+async def offline_chat(messages, cache=False, **kwargs):
+    return "general_help" if "classifier" in messages[0]["content"] else "Here's the short version: you're covered."
+
+
+async def run(turns: int, window: int, keep: int, path: str) -> dict:
+    conn = await aiosqlite.connect(path)
+    saver = AsyncSqliteSaver(conn)
+    await saver.setup()
+    runner = ConversationRunner(support_graph.build_workflow, checkpointer=saver, keep=keep)
+    try:
+        await runner.turn("bench", initial={})
+        await runner.turn("bench", "Asha")
+        ms = []
+        for i in range(turns):
+            t = time.perf_counter()
+            await runner.turn("bench", f"question number {i} about my health cover")
+            ms.append((time.perf_counter() - t) * 1000)
+        rows = (await (await conn.execute("SELECT COUNT(*) FROM checkpoints")).fetchone())[0]
+    finally:
+        await conn.close()
+    return {
+        "keep": keep or "all",
+        "first_turns_p50_ms": round(statistics.median(ms[:window]), 2),
+        "last_turns_p50_ms": round(statistics.median(ms[-window:]), 2),
+        "checkpoint_rows": rows,
+        "db_kb": round(os.path.getsize(path) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--window", type=int, default=30, help="turns per early/late sample")
+    args = parser.parse_args()
+
+    get_dial_client().chat = offline_chat
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for keep in (CHECKPOINT_KEEP or 2, 0):
+            results.append(asyncio.run(run(args.turns, args.window, keep, os.path.join(tmp, f"ckpt-{keep}.db"))))
+    print(json.dumps({"turns": args.turns, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Cost of token accounting (core.usage): one ledger.record() on the LLM call
+path, the per-call budget check, and a flush of the aggregated rows to
+SQLite, for --sessions conversations making --calls LLM calls each across
+the agents' call sites. Then the same traffic with a per-session token budget
+to show how many calls move to the fallback model and what that saves.
+
+    python -m benchmarks.bench_usage --sessions 2000 --calls 20 --budget 3000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from core import db
+from core.usage import UsageLedger, usage_scope
+
+CALL_SITES = {   # call site -> (agent, prompt tokens, completion tokens), roughly what the agents send
+    "support.classify_query": ("support", 200, 2),
+    "support.generate_response": ("support", 320, 60),
+    "onboarding.classify_intent": ("onboarding", 180, 2),
+    "onboarding.human_reply": ("onboarding", 420, 70),
+    "onboarding.choose_plan": ("onboarding", 260, 25),
+    "context.summary": ("onboarding", 500, 120),
+    "claims.validate_document": ("claims", 650, 20),
+}
+
+
+def traffic(sessions: int, calls: int, seed: int = 7) -> list[tuple]:
+    rnd = random.Random(seed)
+    sites = list(CALL_SITES)
+    return [(f"s{s}", site, *CALL_SITES[site])
+            for s in range(sessions) for site in (rnd.choice(sites) for _ in range(calls))]
+
+
+def run(ledger: UsageLedger, calls: list[tuple]) -> dict:
+    async def go():
+        record_s = check_s = 0.0
+        models = {}
+        for session_id, site, agent, prompt, completion in calls:
+            with usage_scope(session_id=session_id, agent=agent, endpoint="POST /bench"):
+                t = time.perf_counter()
+                model = await ledger.model_for("gpt-4o")
+                t1 = time.perf_counter()
+                ledger.record(site, model, prompt, completion)
+                t2 = time.perf_counter()
+            check_s += t1 - t
+            record_s += t2 - t1
+            models[model] = models.get(model, 0) + 1
+        return record_s, check_s, models
+
+    record_s, check_s, models = asyncio.run(go())
+    pending = len(ledger._pending)
+    t = time.perf_counter()
+    ledger.flush()
+    flush_ms = (time.perf_counter() - t) * 1000
+    cost = sum(r["cost_usd"] for r in ledger.top("model", days=1))
+    return {
+        "record_us": round(record_s / len(calls) * 1e6, 2),
+        "budget_check_us": round(check_s / len(calls) * 1e6, 2),
+        "rows_flushed": pending,
+        "flush_ms": round(flush_ms, 1),
+        "calls_by_model": models,
+        "cost_usd": round(cost, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--calls", type=int, default=20, help="LLM calls per session")
+    parser.add_argument("--budget", type=int, default=3000, help="session token budget for the second run")
+    args = parser.parse_args()
+
+    calls = traffic(args.sessions, args.calls)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, budget in (("no_budget", 0), ("budget", args.budget)):
+            db.DB_PATH = os.path.join(tmp, f"{name}.db")
+            db.init_db()
+            results[name] = run(UsageLedger(flush_interval=0, max_rows=len(calls) + 1, session_budget=budget), calls)
+            db.pool.close_all()
+
+    saved = 1 - results["budget"]["cost_usd"] / results["no_budget"]["cost_usd"]
+    print(json.dumps({"sessions": args.sessions, "calls": len(calls), "session_budget": args.budget,
+                      **results, "budget_cost_saving": round(saved, 3)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Assert that the hot claim/insurance queries are served by indexes.
+
+    python -m benchmarks.check_query_plans
+
+Builds a throwaway database through the migration runner, runs
+EXPLAIN QUERY PLAN for each query below and exits non-zero if any of them
+scans a table instead of searching an index, or sorts its result in a temp
+B-tree (a paginated ORDER BY must come straight off the index).
+"""
+import json
+import os
+import sys
+import tempfile
+
+from core import db
+from core.migrations import MIGRATIONS
+
+HOT_QUERIES = {
+    # claims_store.claim_history (show_existing_claims, GET /claims/claims/history), first and later pages
+    "claim_history_first_page": ("""
+        SELECT created_at, id, claim_number, claim_amount, claim_reason, status
+        FROM claims
+        WHERE insurance_type=? AND insurance_ref_id=?
+        ORDER BY created_at, id LIMIT ?
+    """, ("health", 1, 11)),
+    "claim_history_next_page": ("""
+        SELECT created_at, id, claim_number, claim_amount, claim_reason, status
+        FROM claims
+        WHERE insurance_type=? AND insurance_ref_id=? AND (created_at, id) > (?, ?)
+        ORDER BY created_at, id LIMIT ?
+    """, ("health", 1, "2025-01-01 00:00:00", 1, 11)),
+    # claims_graph.lookup_insurance (health / vehicle)
+    "health_insurance_lookup": ("""
+        SELECT uhi.id, uhi.user_id, uhi.status, p.name, p.coverage_limit, p.premium, p.is_active,
+               u.name, u.email, u.phone
+        FROM user_health_insurance uhi
+        JOIN policies p ON uhi.policy_id = p.id
+        JOIN users u ON uhi.user_id = u.id
+        WHERE uhi.id=?
+    """, (1,)),
+    "vehicle_insurance_lookup": ("""
+        SELECT uvi.id, uvi.user_id, uvi.status, p.name, p.coverage_limit, p.premium, p.is_active,
+               u.name, u.email, u.phone, uvi.number_plate, uvi.vehicle_type
+        FROM user_vehicle_insurance uvi
+        JOIN policies p ON uvi.policy_id = p.id
+        JOIN users u ON uvi.user_id = u.id
+        WHERE uvi.id=?
+    """, (1,)),
+    # insurances held by a user, joined to their policies
+    "user_health_insurances": ("""
+        SELECT uhi.id, p.name, uhi.status
+        FROM user_health_insurance uhi JOIN policies p ON uhi.policy_id = p.id
+        WHERE uhi.user_id=?
+    """, (1,)),
+    "user_vehicle_insurances": ("""
+        SELECT uvi.id, p.name, uvi.status
+        FROM user_vehicle_insurance uvi JOIN policies p ON uvi.policy_id = p.id
+        WHERE uvi.user_id=?
+    """, (1,)),
+    # status filters
+    "claims_by_status": ("SELECT id, claim_number FROM claims WHERE status=?", ("initiated",)),
+    "active_health_insurances": ("SELECT id FROM user_health_insurance WHERE status=?", ("active",)),
+    "active_policies_by_type": ("SELECT id, name FROM policies WHERE type=? AND is_active=1", ("health",)),
+}
+
+
+def uses_index(plan: list[str]) -> bool:
+    # "SCAN <table>" without an index is a full table scan; a temp B-tree sorts every matching row
+    return all((not step.startswith("SCAN ") or " USING " in step) and not step.startswith("USE TEMP B-TREE")
+               for step in plan)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        db.DB_PATH = os.path.join(directory, "plans.db")
+        db.init_db()
+        failures = {}
+        report = {}
+        with db.connection() as conn:
+            conn.execute("ANALYZE")
+            version = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0]
+            for name, (sql, params) in HOT_QUERIES.items():
+                plan = db.explain_query_plan(conn, sql, params)
+                report[name] = plan
+                if not uses_index(plan):
+                    failures[name] = plan
+        db.pool.close_all()
+
+    assert version == max(m.version for m in MIGRATIONS)
+    print(json.dumps({"schema_version": version, "plans": report, "failures": failures}, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Assert that expired and evicted sessions take their conversation checkpoints
+with them (ConversationRunner.purge_removed, run by main's lifespan every
+SESSION_SWEEP_INTERVAL seconds).
+
+    python -m benchmarks.check_session_purge
+
+For both session backends: --sessions conversations are started against a
+store that holds --max-sessions, so the oldest are evicted; the rest expire
+after --ttl seconds except one that keeps talking, and one expired id is
+reused for a new session before the purge runs. Exits non-zero unless exactly
+the live conversations are left in the checkpoint database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import TypedDict
+
+from core import db
+from core.conversation import ConversationRunner, ask
+from core.session_store import MemorySessionStore, SQLiteSessionStore
+
+
+class ChatState(TypedDict, total=False):
+    name: str
+    topic: str
+
+
+def build_workflow():
+    from langgraph.graph import StateGraph, END
+
+    def name(state):
+        state["name"] = ask("name?")
+        return state
+
+    def topic(state):
+        state["topic"] = ask("topic?")
+        return state
+
+    workflow = StateGraph(ChatState)
+    workflow.add_node("name", name)
+    workflow.add_node("topic", topic)
+    workflow.set_entry_point("name")
+    workflow.add_edge("name", "topic")
+    workflow.add_edge("topic", END)
+    return workflow
+
+
+async def threads(saver) -> set[str]:
+    async with saver.conn.execute("SELECT DISTINCT thread_id FROM checkpoints") as cursor:
+        return {row[0] for row in await cursor.fetchall()}
+
+
+async def start(runner, store, session_id: str):
+    store.create(session_id, {"turns": 0})
+    await runner.delete(session_id)
+    await runner.turn(session_id, initial={})
+
+
+async def check_backend(store, saver, sessions: int, ttl: float) -> dict:
+    runner = ConversationRunner(build_workflow, checkpointer=saver, keep=1)
+    ids = [f"{store.namespace}-{i}" for i in range(sessions)]
+    for session_id in ids:
+        await start(runner, store, session_id)
+    evicted = ids[:sessions - store.max_sessions]
+    after_eviction = await threads(saver)
+    deleted_evicted = await runner.purge_removed(store)
+    after_evicted_purge = await threads(saver)
+
+    time.sleep(ttl * 1.5)
+    keeper, reused = ids[-1], ids[-2]
+    await runner.turn(keeper, "Ann")
+    store.set(keeper, {"turns": 1})
+    store.sweep()                           # `reused` expires here ...
+    await start(runner, store, reused)      # ... and is started again before the purge runs
+    deleted_expired = await runner.purge_removed(store)
+    left = await threads(saver)
+
+    expected = {keeper, reused}
+    return {
+        "evicted": len(evicted),
+        "evicted_threads_before_purge": len(after_eviction & set(evicted)),
+        "deleted_evicted": deleted_evicted,
+        "evicted_threads_left": len(after_evicted_purge & set(evicted)),
+        "deleted_expired": deleted_expired,
+        "threads_left": sorted(left),
+        "ok": not (after_evicted_purge & set(evicted)) and left == expected
+              and (await runner.pending(keeper))["prompt"] == "topic?",
+    }
+
+
+async def run(args) -> dict:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        db.DB_PATH = os.path.join(directory, "sessions.db")
+        db.init_db()
+        stores = {
+            "memory": MemorySessionStore("purge-memory", ttl=args.ttl, max_sessions=args.max_sessions),
+            "sqlite": SQLiteSessionStore("purge-sqlite", ttl=args.ttl, max_sessions=args.max_sessions),
+        }
+        for name, store in stores.items():
+            conn = await aiosqlite.connect(os.path.join(directory, f"checkpoints-{name}.db"))
+            saver = AsyncSqliteSaver(conn)
+            await saver.setup()
+            results[name] = await check_backend(store, saver, args.sessions, args.ttl)
+            await conn.close()
+        db.pool.close_all()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--max-sessions", type=int, default=5)
+    parser.add_argument("--ttl", type=float, default=0.5, help="session TTL in seconds")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if all(r["ok"] for r in results.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Replay labelled queries through the tiered classifiers.
+
+    python -m benchmarks.eval_classifier                      # local tier only, offline
+    python -m benchmarks.eval_classifier --threshold 0.6
+    python -m benchmarks.eval_classifier --sweep              # accuracy / calls saved per threshold
+    python -m benchmarks.eval_classifier --llm                # also send fall-through queries to the LLM
+
+Input is JSON Lines: {"classifier": "support_query" | "onboarding_intent", "text": ..., "label": ...}
+"""
+import argparse
+import asyncio
+import json
+import os
+from collections import defaultdict
+
+from core.fast_classifier import FAST_CLASSIFIER_THRESHOLD
+from agents.support_agent.query_rules import support_query_classifier
+from agents.onboarding_agent.intent_rules import onboarding_intent_classifier
+
+DEFAULT_DATA = os.path.join(os.path.dirname(__file__), "data", "classifier_eval.jsonl")
+
+LOCAL = {
+    "support_query": support_query_classifier,
+    "onboarding_intent": onboarding_intent_classifier,
+}
+
+
+def load(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def llm_fallbacks():
+    # Imported lazily: the graph modules need Azure credentials
+    from agents.support_agent.support_graph import llm_classify_query
+    from agents.onboarding_agent.onboarding_graph import llm_classify_intent
+
+    policy = {"premium": 7500, "coverage": 200000, "benefits": "Accident cover, theft protection", "conversation": []}
+    return {
+        "support_query": lambda text: llm_classify_query({"conversation": []}, text),
+        "onboarding_intent": lambda text: llm_classify_intent(dict(policy), text),
+    }
+
+
+async def evaluate(rows, threshold, fallbacks=None):
+    report = defaultdict(lambda: {"total": 0, "local": 0, "local_correct": 0, "llm": 0, "llm_correct": 0, "misses": []})
+    for row in rows:
+        r = report[row["classifier"]]
+        r["total"] += 1
+        label, confidence = LOCAL[row["classifier"]].predict(row["text"])
+        if label is not None and confidence >= threshold:
+            r["local"] += 1
+            if label == row["label"]:
+                r["local_correct"] += 1
+            else:
+                r["misses"].append({"text": row["text"], "expected": row["label"], "got": label,
+                                    "confidence": round(confidence, 3)})
+            continue
+        r["llm"] += 1
+        if fallbacks:
+            if await fallbacks[row["classifier"]](row["text"]) == row["label"]:
+                r["llm_correct"] += 1
+
+    out = {}
+    for name, r in report.items():
+        summary = {
+            "threshold": threshold,
+            "total": r["total"],
+            "handled_locally": r["local"],
+            "llm_calls": r["llm"],
+            "llm_calls_saved_pct": round(100 * r["local"] / r["total"], 1),
+            "local_accuracy": round(r["local_correct"] / r["local"], 4) if r["local"] else None,
+            "local_misses": r["misses"],
+        }
+        if fallbacks:
+            summary["overall_accuracy"] = round((r["local_correct"] + r["llm_correct"]) / r["total"], 4)
+        out[name] = summary
+    return out
+
+
+async def run(args):
+    rows = load(args.data)
+    fallbacks = llm_fallbacks() if args.llm else None
+    if not args.sweep:
+        return await evaluate(rows, args.threshold, fallbacks)
+
+    results = []
+    for t in [0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]:
+        for name, s in (await evaluate(rows, t, fallbacks)).items():
+            s.pop("local_misses")
+            results.append({"classifier": name, **s})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA)
+    parser.add_argument("--threshold", type=float, default=FAST_CLASSIFIER_THRESHOLD)
+    parser.add_argument("--sweep", action="store_true", help="evaluate thresholds 0.3 .. 1.0")
+    parser.add_argument("--llm", action="store_true", help="call the LLM for fall-through queries")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Local stand-in for Azure OpenAI, for load tests that must not spend tokens.
+
+Serves chat completions (plain and streamed) and embeddings on the Azure
+routes DialClient uses (/openai/deployments/{model}/...) and on the plain
+OpenAI /v1 routes. Replies follow the call site: the classifiers get a
+label, the plan picker JSON, the document validator YES/NO, everything else
+filler text; streams end with a usage chunk if stream_options.include_usage
+is set. Timing is time-to-first-token drawn from --latency plus completion
+tokens at --tokens-per-sec; --error-rate of requests fail with 429/500
+(DialClient retries them like real throttling).
+
+    python -m benchmarks.fake_openai --port 8901 --latency lognormal:0.5:0.4 --tokens-per-sec 80 --error-rate 0.01
+
+Latency specs: fixed:S | uniform:LO:HI | lognormal:MEDIAN:SIGMA (seconds).
+GET /stats reports requests served and errors injected.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass, field, asdict
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = ("you know what honestly this plan covers the essentials and most people we help go with it "
+         "because hospital bills add up fast so having solid cover really matters").split()
+
+
+@dataclass
+class FakeLLMConfig:
+    latency: str = "lognormal:0.5:0.4"   # time to first token
+    tokens_per_sec: float = 80.0         # generation speed, 0 = instant
+    output_tokens: int = 60              # mean length of free-text replies
+    error_rate: float = 0.0
+    embed_dim: int = 1536
+    seed: int | None = None
+
+
+@dataclass
+class FakeLLMStats:
+    chat: int = 0
+    chat_stream: int = 0
+    embeddings: int = 0
+    errors_injected: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    by_call_site: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def parse_latency(spec: str):
+    """'lognormal:0.5:0.4' -> sampler(random.Random) -> seconds"""
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rnd: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rnd: rnd.uniform(*values)
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda rnd: rnd.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"bad latency spec {spec!r} (fixed:S | uniform:LO:HI | lognormal:MEDIAN:SIGMA)")
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# ----------------------------
+# Replies per call site
+# ----------------------------
+def _said(prompt: str, marker: str) -> str:
+    """The quoted user text after `marker` in one of the agents' prompts."""
+    m = re.search(marker + r'\s*"(.*?)"', prompt, re.S)
+    return (m.group(1) if m else prompt).lower()
+
+
+def reply_for(messages: list, rnd: random.Random, output_tokens: int) -> tuple[str, str]:
+    """(call site, reply text) for a chat request."""
+    system = messages[0].get("content", "") if messages else ""
+    prompt = messages[-1].get("content", "") if messages else ""
+
+    if "support query classifier" in system:
+        said = _said(prompt, "User query:")
+        for label, words in (("claims", ("claim",)), ("vehicle_insurance", ("car", "bike", "vehicle")),
+                             ("health_insurance", ("health", "hospital", "medical")),
+                             ("company_info", ("insurai", "company", "about you")),
+                             ("satisfied", ("thanks", "thank you", "bye"))):
+            if any(w in said for w in words):
+                return "support.classify", label
+        return "support.classify", "general_help"
+
+    if "classifies user intent" in system:
+        said = _said(prompt, "User just said:")
+        for label, words in (("negotiate", ("price", "cheaper", "discount", "expensive")),
+                             ("confirm", ("yes", "deal", "go ahead", "sign me up")),
+                             ("reject", ("no thanks", "not interested")),
+                             ("benefits", ("benefit", "cover")), ("reconsider", ("other plan", "switch"))):
+            if any(w in said for w in words):
+                return "onboarding.classify", label
+        return "onboarding.classify", "other"
+
+    if "pick the right plan" in system:
+        plan = rnd.choice("123")
+        return "onboarding.choose_plan", json.dumps({"plan": plan, "reason": "It fits what you told me without overpaying."})
+
+    if "claims validator" in system:
+        text = prompt.lower()
+        needed = ("hospital", "clinic") if "health insurance claim" in text else ("police", "fir")
+        document = text.split("task:", 1)[0]
+        if any(w in document for w in needed):
+            return "claims.validate_document", "YES | Issuer and reference found in the document"
+        return "claims.validate_document", "NO"
+
+    if "summarise insurance conversations" in system:
+        return "context.summary", "Customer asked about cover and price; no decision yet."
+
+    n = max(1, int(rnd.gauss(output_tokens, output_tokens / 4)))
+    return "chat.reply", " ".join(rnd.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def embedding_for(text: str, dim: int) -> np.ndarray:
+    """Deterministic unit vector per input, so cached and fresh embeddings agree."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+# ----------------------------
+# App
+# ----------------------------
+def create_app(config: FakeLLMConfig) -> FastAPI:
+    app = FastAPI(title="fake-openai")
+    rnd = random.Random(config.seed)
+    sample_latency = parse_latency(config.latency)
+    stats = FakeLLMStats()
+
+    def generation_time(tokens: int) -> float:
+        return tokens / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+
+    def injected_error() -> JSONResponse | None:
+        if rnd.random() >= config.error_rate:
+            return None
+        stats.errors_injected += 1
+        status = rnd.choice((429, 500))
+        message = "Rate limit reached (simulated)" if status == 429 else "Internal server error (simulated)"
+        return JSONResponse({"error": {"code": str(status), "message": message}}, status_code=status,
+                            headers={"retry-after-ms": "50"})
+
+    async def chat(model: str, request: Request):
+        body = await request.json()
+        if (error := injected_error()) is not None:
+            await asyncio.sleep(sample_latency(rnd) / 4)
+            return error
+
+        messages = body.get("messages", [])
+        site, text = reply_for(messages, rnd, config.output_tokens)
+        prompt_tokens = sum(count_tokens(m.get("content") or "") for m in messages)
+        tokens = text.split(" ")
+        stats.by_call_site[site] = stats.by_call_site.get(site, 0) + 1
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += len(tokens)
+        created, completion_id = int(time.time()), "chatcmpl-" + uuid.uuid4().hex
+        model = body.get("model", model)
+
+        if not body.get("stream"):
+            stats.chat += 1
+            await asyncio.sleep(sample_latency(rnd) + generation_time(len(tokens)))
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                          "total_tokens": prompt_tokens + len(tokens)},
+            }
+
+        stats.chat_stream += 1
+
+        def chunk(delta: dict, finish: str | None = None) -> str:
+            return "data: " + json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }) + "\n\n"
+
+        async def events():
+            await asyncio.sleep(sample_latency(rnd))
+            yield chunk({"role": "assistant", "content": ""})
+            per_token = generation_time(1)
+            for i, token in enumerate(tokens):
+                if per_token:
+                    await asyncio.sleep(per_token)
+                yield chunk({"content": token if i == 0 else " " + token})
+            yield chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield "data: " + json.dumps({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [], "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                                             "total_tokens": prompt_tokens + len(tokens)},
+                }) + "\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def embeddings(model: str, request: Request):
+        body = await request.json()
+        if (error := injected_error()) is not None:
+            return error
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        stats.embeddings += 1
+        tokens = sum(count_tokens(str(t)) for t in inputs)
+        stats.prompt_tokens += tokens
+        await asyncio.sleep(sample_latency(rnd) / 2)
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for i, text in enumerate(inputs):
+            vec = embedding_for(str(text), config.embed_dim)
+            data.append({"object": "embedding", "index": i,
+                         "embedding": base64.b64encode(vec.tobytes()).decode() if as_base64 else vec.tolist()})
+        return {"object": "list", "data": data, "model": body.get("model", model),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def azure_chat(deployment: str, request: Request):
+        return await chat(deployment, request)
+
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def azure_embeddings(deployment: str, request: Request):
+        return await embeddings(deployment, request)
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat(request: Request):
+        return await chat("fake", request)
+
+    @app.post("/v1/embeddings")
+    async def openai_embeddings(request: Request):
+        return await embeddings("fake", request)
+
+    @app.get("/stats")
+    def get_stats():
+        return {"config": asdict(config), **stats.as_dict()}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", default=FakeLLMConfig.latency)
+    parser.add_argument("--tokens-per-sec", type=float, default=FakeLLMConfig.tokens_per_sec)
+    parser.add_argument("--output-tokens", type=int, default=FakeLLMConfig.output_tokens)
+    parser.add_argument("--error-rate", type=float, default=FakeLLMConfig.error_rate)
+    parser.add_argument("--embed-dim", type=int, default=FakeLLMConfig.embed_dim)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    parse_latency(args.latency)   # fail fast on a bad spec
+    config = FakeLLMConfig(latency=args.latency, tokens_per_sec=args.tokens_per_sec, output_tokens=args.output_tokens,
+                           error_rate=args.error_rate, embed_dim=args.embed_dim, seed=args.seed)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""
+Offline load test of the whole API: N simulated users hold support,
+onboarding and claims conversations against the real app (uvicorn, SQLite,
+checkpointer, email/SMS workers) while every LLM call goes to the local
+stand-in server (benchmarks.fake_openai) - no Azure tokens are spent.
+
+Reports per endpoint: requests, errors, requests/sec and p50/p95/p99 latency
+(streamed replies also time the first token), plus whole conversations per
+scenario, what the fake LLM served and the app's token ledger by call site. Output is JSON (stdout, or --out).
+
+    python -m benchmarks.load_test --users 20 --duration 60 --latency lognormal:0.5:0.4 --error-rate 0.01
+
+The app runs in this process on a temp copy of the database, so simulated
+users can read their OTP from the fake SMS gateway like a phone would. SMS
+and email use the fake transports; claims users get their own seeded policy
+holder (and phone number) each.
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import re
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.fake_openai import FakeLLMConfig, parse_latency
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("support", "onboarding", "claims")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout}s")
+            time.sleep(0.1)
+
+
+def seed_policy_holders(db_path: str, users: int) -> list[dict]:
+    """One health and one vehicle insurance per simulated user, each with a unique phone."""
+    holders = []
+    with sqlite3.connect(db_path) as conn:
+        for i in range(users):
+            tag = uuid.uuid4().hex[:8]
+            cur = conn.execute("INSERT INTO users (name, email, phone) VALUES (?, ?, ?)",
+                               (f"Load User {i}", f"load-{tag}@example.com", f"+9170{tag}"))
+            user_id = cur.lastrowid
+            health = conn.execute("INSERT INTO user_health_insurance (user_id, policy_id) VALUES (?, 2)",
+                                  (user_id,)).lastrowid
+            vehicle = conn.execute("""
+                INSERT INTO user_vehicle_insurance (user_id, policy_id, number_plate, vehicle_type)
+                VALUES (?, 4, ?, 'car')
+            """, (user_id, f"LT{i:04d}")).lastrowid
+            holders.append({"phone": f"+9170{tag}", "health": health, "vehicle": vehicle})
+    return holders
+
+
+# ----------------------------
+# Measurements
+# ----------------------------
+class Recorder:
+    def __init__(self):
+        self.latency = defaultdict(list)    # endpoint -> [ms]
+        self.errors = defaultdict(int)
+        self.conversations = defaultdict(list)
+        self.failed_conversations = defaultdict(int)
+        self.failures: dict[str, str] = {}  # first failure per scenario, for diagnosis
+
+    @staticmethod
+    def _summary(ms: list[float]) -> dict:
+        if len(ms) < 2:
+            return {"p50_ms": round(ms[0], 1)} if ms else {}
+        q = statistics.quantiles(ms, n=100, method="inclusive")
+        return {"p50_ms": round(q[49], 1), "p95_ms": round(q[94], 1), "p99_ms": round(q[98], 1),
+                "max_ms": round(max(ms), 1)}
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name in sorted(set(self.latency) | set(self.errors)):
+            ms = self.latency[name]
+            endpoints[name] = {"requests": len(ms) + self.errors[name], "errors": self.errors[name],
+                               "rps": round(len(ms) / elapsed, 2), **self._summary(ms)}
+        conversations = {}
+        for name in SCENARIOS:
+            ms = self.conversations[name]
+            if ms or self.failed_conversations[name]:
+                conversations[name] = {"completed": len(ms), "failed": self.failed_conversations[name],
+                                       "per_sec": round(len(ms) / elapsed, 2), **self._summary(ms)}
+        return {"endpoints": endpoints, "conversations": conversations, "first_failures": self.failures}
+
+
+class ConversationFailed(Exception):
+    pass
+
+
+class User:
+    """One simulated user: an HTTP client plus the recorder it reports into."""
+
+    def __init__(self, index: int, client: httpx.AsyncClient, recorder: Recorder, holder: dict, inbox: "Inbox"):
+        self.index = index
+        self.client = client
+        self.recorder = recorder
+        self.holder = holder
+        self.inbox = inbox
+
+    async def call(self, name: str, method: str, url: str, **kwargs) -> dict:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.errors[name] += 1
+            raise ConversationFailed(f"{name}: {type(e).__name__} {e}") from e
+        if response.status_code >= 400:
+            self.recorder.errors[name] += 1
+            raise ConversationFailed(f"{name}: HTTP {response.status_code} {response.text[:200]}")
+        self.recorder.latency[name].append((time.perf_counter() - start) * 1000)
+        return response.json()
+
+    async def stream(self, name: str, url: str, payload: dict) -> str:
+        """POST to an SSE endpoint; records time to first token and to the final frame."""
+        start = time.perf_counter()
+        first, event, text = None, None, None
+        try:
+            async with self.client.stream("POST", url, json=payload) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise ConversationFailed(f"{name}: HTTP {response.status_code} {response.text[:200]}")
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line.split(":", 1)[1].strip()
+                    elif line.startswith("data:"):
+                        first = first or time.perf_counter()
+                        data = json.loads(line[5:])
+                        if event == "error":
+                            raise ConversationFailed(f"{name}: stream error {data}")
+                        if event == "done":
+                            text = data["response"]
+        except ConversationFailed:
+            self.recorder.errors[name] += 1
+            raise
+        except httpx.HTTPError as e:
+            self.recorder.errors[name] += 1
+            raise ConversationFailed(f"{name}: {type(e).__name__} {e}") from e
+        if text is None:
+            self.recorder.errors[name] += 1
+            raise ConversationFailed(f"{name}: stream ended without a done event")
+        end = time.perf_counter()
+        self.recorder.latency[name].append((end - start) * 1000)
+        self.recorder.latency[name + " (first token)"].append(((first or end) - start) * 1000)
+        return text
+
+
+def answer(prompt: str | None, answers: list[tuple[str, str]]) -> str:
+    for fragment, reply in answers:
+        if fragment in (prompt or ""):
+            return reply
+    raise ConversationFailed(f"unexpected prompt: {prompt!r}")
+
+
+# ----------------------------
+# Scenarios
+# ----------------------------
+MAX_TURNS = 20
+
+
+async def support_conversation(user: User, run: int):
+    sid = f"support-{user.index}-{run}-{uuid.uuid4().hex[:6]}"
+    turn = await user.call("POST /support/support/start", "POST", "/support/support/start", params={"session_id": sid})
+    questions = ["What does health insurance actually cover?", "And how do claims work with you?"]
+    answers = [("call you", f"Asha {user.index}"), ("on your mind", "Is car insurance required by law?")]
+    streamed = False
+    for _ in range(MAX_TURNS):
+        prompt = turn["prompt"]
+        if prompt and "Anything else" in prompt:
+            if not streamed:
+                await user.stream("POST /support/support/query/stream", "/support/support/query/stream",
+                                  {"session_id": sid, "user_query": questions[0]})
+                streamed = True
+            message = questions.pop() if questions else "thanks"
+        else:
+            message = answer(prompt, answers)
+        turn = await user.call("POST /support/support/query", "POST", "/support/support/query",
+                               json={"session_id": sid, "user_query": message})
+        if turn["done"]:
+            break
+    else:
+        raise ConversationFailed("support conversation did not finish")
+    await user.call("POST /support/support/end", "POST", "/support/support/end", params={"session_id": sid})
+
+
+async def onboarding_conversation(user: User, run: int):
+    sid = f"onboarding-{user.index}-{run}-{uuid.uuid4().hex[:6]}"
+    turn = await user.call("POST /onboarding/onboarding/start", "POST", "/onboarding/onboarding/start",
+                           params={"session_id": sid})
+    vehicle = run % 2 == 1
+    answers = [
+        ("your name", f"Ravi {user.index}"), ("mobile number", f"98{user.index:04d}{run % 10000:04d}"),
+        ("health insurance or something", "my car" if vehicle else "health insurance"),
+        ("kind of vehicle", "Maruti Swift"), ("kilometers", "42000"), ("how old is it", "4"), ("engine size", "1200"),
+        ("How many people", "3"), ("average age", "34"),
+        ("What feels right", "something in the middle, good cover without going overboard"),
+        ("email", f"ravi.{user.index}.{run}@example.com"),
+    ]
+    replies = ["Hmm, is there any way to make it cheaper?", "What does it cover if I'm hospitalised?", "yes"]
+    streamed = False
+    for _ in range(MAX_TURNS):
+        prompt = turn["prompt"]
+        if prompt and "What do you think" in prompt:
+            if not streamed:
+                await user.stream("POST /onboarding/onboarding/next/stream", "/onboarding/onboarding/next/stream",
+                                  {"session_id": sid, "message": "Does it include roadside help?"})
+                streamed = True
+            message = replies.pop(0) if replies else "yes"
+        else:
+            message = answer(prompt, answers)
+        turn = await user.call("POST /onboarding/onboarding/next", "POST", "/onboarding/onboarding/next",
+                               json={"session_id": sid, "message": message})
+        if turn["done"]:
+            if turn["state"].get("error"):
+                raise ConversationFailed(f"onboarding ended with {turn['state']['error']}")
+            return
+    raise ConversationFailed("onboarding conversation did not finish")
+
+
+async def claims_conversation(user: User, run: int):
+    sid = f"claims-{user.index}-{run}-{uuid.uuid4().hex[:6]}"
+    kind = "vehicle" if run % 2 else "health"
+    document = (f"FIR no {user.index}/{run} filed at Kothrud Police Station, rear bumper damage, estimate INR 18000"
+                if kind == "vehicle" else
+                f"City Hospital Pune, bill {user.index}-{run}: 2 days in ward, pharmacy and lab, total INR 18000")
+    answers = [("Health or Vehicle", kind), ("Insurance ID", str(user.holder[kind])), ("(yes/no)", "yes"),
+               ("claim amount", "18000"), ("claim reason", "load test claim"), ("claim document", document)]
+    seen = user.inbox.count(user.holder["phone"])
+    turn = await user.call("POST /claims/claims/start", "POST", "/claims/claims/start", params={"session_id": sid})
+    for _ in range(MAX_TURNS):
+        prompt = turn["prompt"]
+        if prompt and "OTP" in prompt:
+            message = await user.inbox.wait_for_code(user.holder["phone"], seen)
+        else:
+            message = answer(prompt, answers)
+        turn = await user.call("POST /claims/claims/next", "POST", "/claims/claims/next",
+                               json={"session_id": sid, "message": message})
+        if turn["done"]:
+            if turn.get("error") or not turn.get("claim_number"):
+                raise ConversationFailed(f"claim ended with {turn.get('error')}")
+            return
+    raise ConversationFailed("claims conversation did not finish")
+
+
+CONVERSATIONS = {"support": support_conversation, "onboarding": onboarding_conversation,
+                 "claims": claims_conversation}
+
+
+class Inbox:
+    """Reads OTPs out of the fake SMS gateway, the way the user would read their phone."""
+
+    def __init__(self, gateway):
+        self.gateway = gateway
+        self.messages = defaultdict(list)
+        self._cursor = 0
+
+    def _pull(self):
+        outbox = self.gateway.outbox
+        while self._cursor < len(outbox):
+            to, body = outbox[self._cursor]
+            self.messages[to].append(body)
+            self._cursor += 1
+
+    def count(self, phone: str) -> int:
+        self._pull()
+        return len(self.messages[phone])
+
+    async def wait_for_code(self, phone: str, seen: int, timeout: float = 10.0) -> str:
+        deadline = time.monotonic() + timeout
+        while self.count(phone) <= seen:
+            if time.monotonic() > deadline:
+                raise ConversationFailed(f"no OTP SMS for {phone}")
+            await asyncio.sleep(0.05)
+        return re.search(r"\d{4,8}", self.messages[phone][-1]).group(0)
+
+
+async def drive(base_url: str, users: int, duration: float, scenarios: list[str], holders: list[dict],
+                inbox: Inbox, ramp_up: float) -> dict:
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+
+    async def simulated_user(index: int, client: httpx.AsyncClient):
+        await asyncio.sleep(ramp_up * index / max(1, users))
+        user = User(index, client, recorder, holders[index], inbox)
+        run = 0
+        while time.monotonic() < deadline:
+            scenario = scenarios[(index + run) % len(scenarios)]
+            start = time.perf_counter()
+            try:
+                await CONVERSATIONS[scenario](user, run)
+                recorder.conversations[scenario].append((time.perf_counter() - start) * 1000)
+            except ConversationFailed as e:
+                recorder.failed_conversations[scenario] += 1
+                recorder.failures.setdefault(scenario, str(e))
+            run += 1
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(simulated_user(i, client) for i in range(users)))
+        elapsed = time.perf_counter() - start
+    return {"elapsed_s": round(elapsed, 1), **recorder.report(elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds; conversations in flight finish")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds to start all users")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--latency", default=FakeLLMConfig.latency, help="fake LLM time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=FakeLLMConfig.tokens_per_sec)
+    parser.add_argument("--output-tokens", type=int, default=FakeLLMConfig.output_tokens)
+    parser.add_argument("--error-rate", type=float, default=FakeLLMConfig.error_rate)
+    parser.add_argument("--llm-url", help="use an already running fake_openai server instead of starting one")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    parse_latency(args.latency)
+
+    tmp = tempfile.mkdtemp(prefix="insurai-load-")
+    # registered first so it runs last, after the app's own atexit hooks (email drain)
+    atexit.register(shutil.rmtree, tmp, True)
+    llm = None
+    try:
+        llm_url = args.llm_url
+        if not llm_url:
+            port = free_port()
+            llm_url = f"http://127.0.0.1:{port}"
+            llm = subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.fake_openai", "--port", str(port), "--latency", args.latency,
+                 "--tokens-per-sec", str(args.tokens_per_sec), "--output-tokens", str(args.output_tokens),
+                 "--error-rate", str(args.error_rate)],
+                cwd=ROOT,
+            )
+        wait_until_up(f"{llm_url}/stats")
+
+        db_path = os.path.join(tmp, "insurai.db")
+        shutil.copy(os.path.join(ROOT, "core", "insurai.db"), db_path)
+        holders = seed_policy_holders(db_path, args.users)
+        # before the app is imported: every module reads its config at import
+        os.environ.update({
+            "AZURE_ENDPOINT": llm_url, "DAIL_API_KEY": "fake-key",
+            "INSURAI_DB_PATH": db_path,
+            "CHECKPOINT_DB_PATH": os.path.join(tmp, "checkpoints.db"),
+            "POLICY_STORE_PATH": os.path.join(tmp, "policies.jsonl"),
+            "EMAIL_TRANSPORT": "fake", "SMS_TRANSPORT": "fake",
+            "OTP_RATE_LIMIT": "1000000",
+        })
+        os.environ.setdefault("API_VERSION", "2024-02-01")
+
+        import uvicorn
+        import main as insurai
+        from core.sms_service import get_sms_dispatcher
+
+        app_port = free_port()
+        server = uvicorn.Server(uvicorn.Config(insurai.app, host="127.0.0.1", port=app_port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        wait_until_up(f"http://127.0.0.1:{app_port}/")
+
+        inbox = Inbox(get_sms_dispatcher().transport)
+        result = asyncio.run(drive(f"http://127.0.0.1:{app_port}", args.users, args.duration, args.scenarios,
+                                   holders, inbox, args.ramp_up))
+        usage = httpx.get(f"http://127.0.0.1:{app_port}/usage/top", params={"by": "call_site"}).json()["top"]
+        server.should_exit = True
+        thread.join(timeout=30)
+
+        report = {
+            "users": args.users,
+            "duration_s": args.duration,
+            "scenarios": args.scenarios,
+            "fake_llm": httpx.get(f"{llm_url}/stats").json(),
+            "token_usage_by_call_site": usage,
+            **result,
+        }
+    finally:
+        if llm is not None:
+            llm.terminate()
+            llm.wait(timeout=10)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
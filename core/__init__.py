@@ -0,0 +1,4 @@
+# Load .env once, before any core module reads its config from the environment
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from core import db
+
+CLAIM_NUMBER_BLOCK = int(os.getenv("CLAIM_NUMBER_BLOCK", "50"))
+
+
+def format_claim_number(year: int, seq: int) -> str:
+    return f"CLM-{year}-{seq:05d}"
+
+
+class ClaimNumberAllocator:
+    """
+    Per-year claim number sequence backed by the claim_sequences table.
+    Numbers are reserved from the database `block_size` at a time and then
+    handed out from memory, so most claims need no extra round trip.
+    Reservations use their own connection and commit immediately - they must
+    never ride along in (and be rolled back with) a caller's transaction.
+    Numbers left in a block when the process exits are skipped, so the
+    sequence is unique and increasing but may have gaps; use block_size=1
+    for a gap-free sequence.
+    """
+
+    def __init__(self, block_size: int = CLAIM_NUMBER_BLOCK):
+        self.block_size = max(1, block_size)
+        self._blocks: dict[int, list[int]] = {}   # year -> [next, end)
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._conn_key = None
+
+    def _connection(self) -> sqlite3.Connection:
+        key = (db.DB_PATH, os.getpid())
+        if self._conn is None or self._conn_key != key:
+            self._conn = db.get_connection()
+            self._conn_key = key
+            self._blocks.clear()
+        return self._conn
+
+    def _reserve(self, year: int, count: int) -> tuple[int, int]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO claim_sequences (year, next_value) VALUES (?, 1)", (year,))
+            start = conn.execute("SELECT next_value FROM claim_sequences WHERE year=?", (year,)).fetchone()[0]
+            conn.execute("UPDATE claim_sequences SET next_value=? WHERE year=?", (start + count, year))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return start, start + count
+
+    def take(self, count: int = 1, year: int | None = None) -> list[str]:
+        """Allocate `count` consecutive-as-possible claim numbers for `year` (default: this year)."""
+        year = year or datetime.now().year
+        out = []
+        with self._lock:
+            self._connection()
+            while len(out) < count:
+                block = self._blocks.get(year)
+                if block is None or block[0] >= block[1]:
+                    block = list(self._reserve(year, max(self.block_size, count - len(out))))
+                    self._blocks[year] = block
+                n = min(count - len(out), block[1] - block[0])
+                out.extend(format_claim_number(year, s) for s in range(block[0], block[0] + n))
+                block[0] += n
+        return out
+
+    def next(self, year: int | None = None) -> str:
+        return self.take(1, year)[0]
+
+
+allocator = ClaimNumberAllocator()
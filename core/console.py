@@ -0,0 +1,6 @@
+import asyncio
+
+
+async def ainput(prompt: str = "") -> str:
+    """input() for async code (e.g. the terminal driver) - reads stdin on a worker thread so the event loop keeps running."""
+    return await asyncio.to_thread(input, prompt)
@@ -0,0 +1,137 @@
+import json
+import os
+
+# ----------------------------
+# Config
+# ----------------------------
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "6"))          # turns kept verbatim
+CONTEXT_SUMMARY_CHUNK = int(os.getenv("CONTEXT_SUMMARY_CHUNK", "4"))    # fold older turns this many at a time
+CONTEXT_SUMMARY_WORDS = int(os.getenv("CONTEXT_SUMMARY_WORDS", "120"))
+
+# Fields that carry no meaning for the model
+NON_SEMANTIC_FIELDS = {"timestamp", "ts"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars per token) - good enough for budgeting."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def format_turn(turn: dict) -> str:
+    role = turn.get("role", "user")
+    extras = {k: v for k, v in turn.items() if k not in NON_SEMANTIC_FIELDS | {"role", "content"}}
+    tag = " [" + ", ".join(str(v) for v in extras.values()) + "]" if extras else ""
+    return f"{role}{tag}: {turn.get('content', '')}"
+
+
+def json_history_chars(state: dict) -> int:
+    """
+    len(json.dumps(conversation, indent=2)) without re-encoding the whole
+    history on every call: turns are only ever appended, so each one is
+    measured once and the running total kept on the state (history_size).
+    """
+    conversation = state.get("conversation") or []
+    counted, chars = state.get("history_size") or (0, 0)
+    if counted > len(conversation):   # conversation was reset
+        counted, chars = 0, 0
+    for turn in conversation[counted:]:
+        # each item is indented two more spaces on every line
+        dumped = json.dumps(turn, indent=2)
+        chars += len(dumped) + 2 * (dumped.count("\n") + 1)
+    state["history_size"] = [len(conversation), chars]
+    if not conversation:
+        return 2   # "[]"
+    return chars + 4 + 2 * (len(conversation) - 1)   # "[\n", "\n]" and ",\n" separators
+
+
+def context_savings(state: dict) -> dict:
+    """Prompt tokens saved this session versus sending the full JSON history every call."""
+    stats = state.get("context_stats") or {}
+    raw = sum(s["raw_tokens"] for s in stats.values())
+    sent = sum(s["sent_tokens"] for s in stats.values())
+    return {
+        "raw_tokens": raw,
+        "sent_tokens": sent,
+        "saved_tokens": raw - sent,
+        "saved_pct": round(100 * (raw - sent) / raw, 1) if raw else 0.0,
+        "by_call_site": stats,
+    }
+
+
+class ConversationContext:
+    """
+    Bounded conversation context for agent prompts.
+    - the last `keep_turns` turns stay verbatim
+    - older turns are folded into a running summary, `summary_chunk` turns at a time,
+      so each turn is summarised once and the summary is updated incrementally
+    - timestamps are dropped and turns are rendered one per line
+    - render() trims to a per-call-site token budget
+    Summary state lives on the session state (context_summary, summarized_upto,
+    context_stats, history_size) so it survives between HTTP calls.
+    Summaries go through `dial`, or the shared DialClient when it is None.
+    """
+
+    def __init__(self, dial=None, keep_turns: int = CONTEXT_KEEP_TURNS,
+                 summary_chunk: int = CONTEXT_SUMMARY_CHUNK, summary_words: int = CONTEXT_SUMMARY_WORDS):
+        self.dial = dial
+        self.keep_turns = keep_turns
+        self.summary_chunk = summary_chunk
+        self.summary_words = summary_words
+
+    async def _fold(self, summary: str, turns: list) -> str | None:
+        prompt = f"""
+Running summary so far:
+{summary or "(empty)"}
+
+New conversation turns:
+{chr(10).join(format_turn(t) for t in turns)}
+
+Update the running summary with the new turns. Keep facts the customer shared
+(name, needs, vehicle or health details, price objections, decisions) and drop small talk.
+Reply with the updated summary only, at most {self.summary_words} words.
+"""
+        if self.dial is None:
+            from core.dial_client import get_dial_client   # core.dial_client imports this module
+            self.dial = get_dial_client()
+        resp = await self.dial.chat([
+            {"role": "system", "content": "You summarise insurance conversations for another agent."},
+            {"role": "user", "content": prompt}
+        ], call_site="context.summary")
+        if not resp or resp.startswith("[Chat Error]"):
+            return None
+        return resp.strip()
+
+    async def render(self, state: dict, call_site: str, budget_tokens: int) -> str:
+        conversation = state.get("conversation") or []
+        summary = state.get("context_summary", "")
+        upto = state.get("summarized_upto", 0)
+
+        # Fold turns that have left the verbatim window into the summary
+        boundary = max(0, len(conversation) - self.keep_turns)
+        if boundary - upto >= self.summary_chunk:
+            folded = await self._fold(summary, conversation[upto:boundary])
+            if folded is not None:
+                summary, upto = folded, boundary
+                state["context_summary"] = summary
+                state["summarized_upto"] = upto
+
+        recent = [format_turn(t) for t in conversation[upto:]]
+        head = f"Summary of earlier conversation: {summary}\n" if summary else ""
+
+        # Enforce the budget: drop the oldest verbatim turns first, then cut the summary
+        text = head + "\n".join(recent)
+        while recent and estimate_tokens(text) > budget_tokens:
+            recent.pop(0)
+            text = head + "\n".join(recent)
+        if estimate_tokens(text) > budget_tokens:
+            text = text[: budget_tokens * 4]
+        if not text:
+            text = "(no previous messages)"
+
+        stats = state.setdefault("context_stats", {}).setdefault(
+            call_site, {"calls": 0, "raw_tokens": 0, "sent_tokens": 0}
+        )
+        stats["calls"] += 1
+        stats["raw_tokens"] += max(1, json_history_chars(state) // 4)   # == estimate_tokens(json.dumps(...))
+        stats["sent_tokens"] += estimate_tokens(text)
+        return text
@@ -0,0 +1,288 @@
+import asyncio
+import contextvars
+import copy
+import os
+import uuid
+import weakref
+from core.console import ainput
+from core.db import run_db
+from core.session_store import encode_state, SessionTooLarge, SESSION_MAX_BYTES
+from core.usage import usage_scope
+
+# ----------------------------
+# Config
+# ----------------------------
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", os.path.join(os.path.dirname(__file__), "checkpoints.db"))
+CHECKPOINT_KEEP = int(os.getenv("CHECKPOINT_KEEP", "2"))   # checkpoints kept per conversation, older ones are pruned
+
+# LangGraph's write channels for a paused question and the answers its node already got
+_PAUSE_CHANNELS = ("__interrupt__", "__resume__")
+
+
+# ----------------------------
+# Talking to the user from inside a node
+# ----------------------------
+# Messages said during the current turn. Graph nodes never touch the terminal:
+# say() queues text here and ask() hands it to the caller with the question.
+_turn_messages: contextvars.ContextVar[list | None] = contextvars.ContextVar("turn_messages", default=None)
+
+
+def say(text: str):
+    """Tell the user something; delivered with the next question or at the end of the turn."""
+    messages = _turn_messages.get()
+    if messages is None:
+        print(text)   # called outside a turn (scripts, batch jobs)
+    else:
+        messages.append(text)
+
+
+def ask(prompt: str) -> str:
+    """
+    Pause the graph until the user answers `prompt` (a LangGraph interrupt).
+    When the turn is resumed the node runs again from the top; questions it
+    already asked return their recorded answers at once, and whatever the
+    node said before them was shown last turn, so it is dropped here.
+    """
+    from langgraph.types import interrupt   # loaded already: ask() only runs inside a graph
+    messages = _turn_messages.get()
+    pending = list(messages) if messages else []
+    if messages:
+        messages.clear()
+    answer = interrupt({"prompt": prompt, "messages": pending})
+    if messages:
+        messages.clear()
+    return str(answer or "").strip()
+
+
+# ----------------------------
+# Checkpointer
+# ----------------------------
+_checkpointer = None
+_checkpointer_lock = asyncio.Lock()
+
+
+async def get_checkpointer():
+    """Process-wide SQLite checkpointer (CHECKPOINT_DB_PATH), opened on first use."""
+    global _checkpointer
+    if _checkpointer is None:
+        async with _checkpointer_lock:
+            if _checkpointer is None:
+                import aiosqlite
+                from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+                conn = await aiosqlite.connect(CHECKPOINT_DB_PATH)
+                saver = AsyncSqliteSaver(conn)
+                await saver.setup()
+                _checkpointer = saver
+    return _checkpointer
+
+
+async def close_checkpointer():
+    global _checkpointer
+    if _checkpointer is not None:
+        await _checkpointer.conn.close()
+        _checkpointer = None
+
+
+async def prune_checkpoints(saver, thread_id: str, keep: int = CHECKPOINT_KEEP):
+    """Drop all but the `keep` newest checkpoints of a conversation (ids sort by time)."""
+    if keep <= 0 or not hasattr(saver, "conn"):
+        return
+    async with saver.lock:
+        for table in ("checkpoints", "writes"):
+            await saver.conn.execute(
+                f"DELETE FROM {table} WHERE thread_id=? AND checkpoint_ns='' AND checkpoint_id < ("
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id=? AND checkpoint_ns='' "
+                "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?)",
+                (thread_id, thread_id, keep - 1),
+            )
+        await saver.conn.commit()
+
+
+# ----------------------------
+# Turn-by-turn execution
+# ----------------------------
+class ConversationRunner:
+    """
+    Runs a graph one conversational turn at a time, keyed by a thread id.
+    A turn starts (or resumes) the graph and returns as soon as it asks the
+    user something or finishes: {"messages", "prompt", "done", "state"}.
+    State lives in the checkpointer, and a resume loads only the latest
+    checkpoint, so a turn costs the same on message 3 as on message 300.
+    LLM calls made during a turn are charged to the thread and `name` in
+    the token ledger (core.usage).
+    The checkpointed state is capped at `max_bytes` once serialized: a
+    conversation over it takes no more turns, and update_state() refuses a
+    write that would take it over (both raise SessionTooLarge).
+    `workflow` is a StateGraph or a function that builds one; a builder
+    keeps LangGraph out of import time, as the graph is only built and
+    compiled on first use (or by warm_up()).
+    """
+
+    def __init__(self, workflow, checkpointer=None, keep: int = CHECKPOINT_KEEP, name: str = "",
+                 max_bytes: int = SESSION_MAX_BYTES):
+        self.workflow = workflow
+        self.name = name
+        self.keep = keep
+        self.max_bytes = max_bytes
+        self.oversize_rejections = 0
+        self._checkpointer = checkpointer
+        self._app = None
+        self._locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+    async def app(self):
+        if self._app is None:
+            saver = self._checkpointer or await get_checkpointer()
+            workflow = self.workflow() if callable(self.workflow) else self.workflow
+            self._app = workflow.compile(checkpointer=saver)
+        return self._app
+
+    async def warm_up(self):
+        """Build and compile the graph now rather than on the first turn."""
+        await self.app()
+
+    @staticmethod
+    def _config(thread_id: str) -> dict:
+        return {"configurable": {"thread_id": thread_id}}
+
+    def usage_scope(self, thread_id: str):
+        """Charge LLM calls made outside a turn (e.g. a streamed reply) to this conversation."""
+        return usage_scope(session_id=thread_id, agent=self.name or None)
+
+    def check_size(self, values: dict):
+        """Raise SessionTooLarge if `values` is over max_bytes once serialized."""
+        if self.max_bytes > 0 and len(encode_state(values).encode("utf-8")) > self.max_bytes:
+            self.oversize_rejections += 1
+            raise SessionTooLarge(f"conversation state exceeds {self.max_bytes} bytes")
+
+    def _lock(self, thread_id: str) -> asyncio.Lock:
+        # one turn at a time per conversation
+        lock = self._locks.get(thread_id)
+        if lock is None:
+            lock = self._locks[thread_id] = asyncio.Lock()
+        return lock
+
+    async def turn(self, thread_id: str, reply: str | None = None, initial: dict | None = None) -> dict:
+        """Answer the pending question with `reply` (or start the conversation from `initial`)."""
+        from langgraph.types import Command
+        async with self._lock(thread_id):
+            app = await self.app()
+            config = self._config(thread_id)
+            snapshot = await app.aget_state(config)
+            self.check_size(snapshot.values)
+            if snapshot.interrupts:
+                graph_input = Command(resume=reply or "")
+            elif snapshot.next:
+                graph_input = None   # a turn died half-way: carry on from its last checkpoint
+            elif snapshot.values:
+                return {"messages": [], "prompt": None, "done": True, "state": snapshot.values}
+            else:
+                graph_input = dict(initial or {})
+
+            messages = []
+            token = _turn_messages.set(messages)
+            try:
+                with self.usage_scope(thread_id):
+                    await app.ainvoke(graph_input, config)
+            finally:
+                _turn_messages.reset(token)
+
+            snapshot = await app.aget_state(config)
+            await prune_checkpoints(app.checkpointer, thread_id, self.keep)
+        return self._result(snapshot, messages)
+
+    @staticmethod
+    def _result(snapshot, trailing: list) -> dict:
+        if snapshot.interrupts:
+            question = snapshot.interrupts[0].value
+            return {"messages": question["messages"] + trailing, "prompt": question["prompt"],
+                    "done": False, "state": snapshot.values}
+        return {"messages": trailing, "prompt": None, "done": True, "state": snapshot.values}
+
+    async def pending(self, thread_id: str) -> dict | None:
+        """The question the conversation is waiting on (same shape as turn()), or None if unknown."""
+        snapshot = await (await self.app()).aget_state(self._config(thread_id))
+        if not snapshot.values and not snapshot.next:
+            return None
+        return self._result(snapshot, [])
+
+    async def get_state(self, thread_id: str) -> dict | None:
+        snapshot = await (await self.app()).aget_state(self._config(thread_id))
+        return snapshot.values if snapshot.values or snapshot.next else None
+
+    async def update_state(self, thread_id: str, values: dict):
+        """
+        Write changes made outside the graph (e.g. a streamed reply).
+        The conversation keeps waiting on the same question: the paused
+        node's question (and the answers it already got) move to the new
+        checkpoint, so the node is not run again until the user answers -
+        no repeated LLM calls or side effects.
+        Raises SessionTooLarge (and writes nothing) if the result would be over max_bytes.
+        """
+        if not values:
+            return
+        async with self._lock(thread_id):
+            app = await self.app()
+            config = self._config(thread_id)
+            saved = await app.checkpointer.aget_tuple(config)
+            before = await app.aget_state(config)
+            self.check_size({**before.values, **values})
+            await app.aupdate_state(config, values)
+            after = await app.aget_state(config)
+
+            new_ids = {task.name: task.id for task in after.tasks}
+            for task in before.tasks:
+                writes = [(channel, value) for task_id, channel, value in (saved.pending_writes if saved else ())
+                          if task_id == task.id and channel in _PAUSE_CHANNELS]
+                if writes and task.name in new_ids:
+                    await app.checkpointer.aput_writes(after.config, writes, new_ids[task.name])
+            await prune_checkpoints(app.checkpointer, thread_id, self.keep)
+
+    async def stream_and_save(self, thread_id: str, state: dict, tokens):
+        """
+        Relay a reply streamed outside the graph (tokens an async iterator that
+        updates `state` as it goes), then save every key it changed.
+        """
+        self.check_size(state)   # don't pay for a reply that could not be saved
+        before = copy.deepcopy(state)
+        with self.usage_scope(thread_id):
+            async for token in tokens:
+                yield token
+        # the reply (and e.g. a refreshed context summary) is only in `state` once the stream has finished
+        await self.update_state(thread_id, {k: v for k, v in state.items() if k not in before or before[k] != v})
+
+    async def delete(self, thread_id: str):
+        app = await self.app()
+        await app.checkpointer.adelete_thread(thread_id)
+
+    async def purge_removed(self, store) -> int:
+        """
+        Sweep a SessionStore and delete the conversations of the sessions it
+        expired or evicted. An id that came back to life (a new session with
+        the same id) is left alone; the check and the delete happen under the
+        turn lock, so a turn for a new session cannot be lost in between.
+        Returns the number of conversations deleted.
+        """
+        await run_db(store.sweep)
+        deleted = 0
+        for thread_id in store.take_removed():
+            async with self._lock(thread_id):
+                if await run_db(store.__contains__, thread_id):
+                    continue
+                await self.delete(thread_id)
+            deleted += 1
+        return deleted
+
+
+async def run_in_terminal(workflow, initial: dict | None = None) -> dict:
+    """Drive a graph from the console: print what it says, read each answer from stdin."""
+    from langgraph.checkpoint.memory import InMemorySaver
+    runner = ConversationRunner(workflow, checkpointer=InMemorySaver())
+    thread_id = uuid.uuid4().hex
+    reply = None
+    while True:
+        result = await runner.turn(thread_id, reply, initial)
+        for message in result["messages"]:
+            print(message)
+        if result["done"]:
+            return result["state"]
+        reply = await ainput(result["prompt"] + " ")
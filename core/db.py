@@ -1,91 +1,151 @@
-import sqlite3
+import asyncio
 import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from core.migrations import migrate
+from core.metrics import METRICS_ENABLED, db_seconds, db_lock_wait_seconds, db_call_seconds
+
+DB_PATH = os.getenv("INSURAI_DB_PATH", os.path.join(os.path.dirname(__file__), "insurai.db"))
+
+# Applied to every connection. WAL lets readers run alongside a writer,
+# synchronous=NORMAL drops the per-commit fsync of the WAL (still crash-safe),
+# and busy_timeout makes writers wait for the lock instead of failing.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),   # negative = KiB, i.e. 64 MB
+    "temp_store": "MEMORY",
+}
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "insurai.db")
 
 def get_connection():
-    return sqlite3.connect(DB_PATH)
+    """A new, tuned, unpooled connection - the caller must close it."""
+    conn = sqlite3.connect(DB_PATH, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    for name, value in SQLITE_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+# ----------------------------
+# Connection pool
+# ----------------------------
+_read_ok, _read_error = db_seconds.labels("read", "ok"), db_seconds.labels("read", "error")
+_write_ok, _write_error = db_seconds.labels("write", "ok"), db_seconds.labels("write", "error")
+_lock_wait = db_lock_wait_seconds.labels()
+
+
+class ConnectionPool:
+    """
+    One long-lived connection per thread (and per process, so forked workers
+    never share a handle). Async code should reach the database through
+    run_db(), which runs the call on a worker thread with that thread's connection.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all: list[sqlite3.Connection] = []
+
+    def get(self) -> sqlite3.Connection:
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is None or local.pid != os.getpid() or local.path != DB_PATH:
+            conn = get_connection()
+            local.conn, local.pid, local.path = conn, os.getpid(), DB_PATH
+            with self._lock:
+                self._all.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow this thread's connection for reads; a stray open transaction is rolled back."""
+        conn = self.get()
+        start = time.perf_counter()
+        timer = _read_error
+        try:
+            yield conn
+            timer = _read_ok
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if METRICS_ENABLED:
+                timer.observe(time.perf_counter() - start)
+
+    @contextmanager
+    def transaction(self, immediate: bool = False):
+        """
+        Commit on success, roll back on error. immediate=True takes the write
+        lock up front (BEGIN IMMEDIATE) so read-then-write blocks cannot deadlock.
+        Nested use joins the outer transaction.
+        """
+        conn = self.get()
+        if conn.in_transaction:
+            yield conn
+            return
+        start = time.perf_counter()
+        if immediate:
+            conn.execute("BEGIN IMMEDIATE")
+            if METRICS_ENABLED:
+                _lock_wait.observe(time.perf_counter() - start)
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            if METRICS_ENABLED:
+                _write_error.observe(time.perf_counter() - start)
+            raise
+        if METRICS_ENABLED:
+            _write_ok.observe(time.perf_counter() - start)
+
+    def close_all(self):
+        """Close every pooled connection (e.g. before deleting the database file)."""
+        with self._lock:
+            for conn in self._all:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._all.clear()
+        self._local = threading.local()
+
+
+pool = ConnectionPool()
+connection = pool.connection
+transaction = pool.transaction
+
+
+def _function_name(fn) -> str:
+    fn = getattr(fn, "func", fn)   # functools.partial
+    return getattr(fn, "__qualname__", type(fn).__name__)
+
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Run a blocking DB function off the event loop (timed per function in
+    insurai_db_call_seconds). Other blocking work goes to asyncio.to_thread,
+    so it does not show up as DB latency.
+    """
+    if not METRICS_ENABLED:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    start = time.perf_counter()
+    try:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    finally:
+        db_call_seconds.labels(_function_name(fn)).observe(time.perf_counter() - start)
+
+
+def explain_query_plan(conn, sql: str, params=()) -> list[str]:
+    """The `detail` column of EXPLAIN QUERY PLAN, one entry per plan step."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
 
 def init_db():
-    conn = get_connection()
-    c = conn.cursor()
-
-    # Users
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        email TEXT NOT NULL UNIQUE,
-        phone TEXT NOT NULL UNIQUE
-    )
-    """)
-
-    # Company Policies
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS policies (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        type TEXT NOT NULL,          -- 'health' or 'vehicle'
-        premium REAL NOT NULL,
-        benefits TEXT NOT NULL,
-        coverage_limit REAL NOT NULL,
-        is_custom INTEGER DEFAULT 0,
-        is_active INTEGER DEFAULT 1
-    )
-    """)
-
-    # User Health Insurance
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS user_health_insurance (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        policy_id INTEGER NOT NULL,
-        start_date TEXT DEFAULT CURRENT_TIMESTAMP,
-        end_date TEXT,
-        status TEXT DEFAULT 'active',
-        FOREIGN KEY(user_id) REFERENCES users(id),
-        FOREIGN KEY(policy_id) REFERENCES policies(id)
-    )
-    """)
-
-    # User Vehicle Insurance
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS user_vehicle_insurance (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        policy_id INTEGER NOT NULL,
-        number_plate TEXT NOT NULL,
-        vehicle_type TEXT NOT NULL,
-        brand_model TEXT,
-        age INTEGER,
-        kms_driven INTEGER,
-        wheels INTEGER,
-        start_date TEXT DEFAULT CURRENT_TIMESTAMP,
-        end_date TEXT,
-        status TEXT DEFAULT 'active',
-        FOREIGN KEY(user_id) REFERENCES users(id),
-        FOREIGN KEY(policy_id) REFERENCES policies(id)
-    )
-    """)
-
-    # Claims
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS claims (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        claim_number TEXT UNIQUE,
-        user_id INTEGER NOT NULL,
-        insurance_type TEXT NOT NULL,
-        insurance_ref_id INTEGER NOT NULL,
-        claim_reason TEXT,
-        document_text TEXT,
-        document_info TEXT,
-        claim_amount REAL,
-        reimbursement REAL,
-        status TEXT DEFAULT 'initiated',
-        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    )
-    """)
-
-    conn.commit()
-    conn.close()
+    """Create the schema / apply pending migrations."""
+    with connection() as conn:
+        migrate(conn)
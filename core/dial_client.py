@@ -1,50 +1,240 @@
+import asyncio
 import os
-from dotenv import load_dotenv
-from openai import AzureOpenAI
+import threading
+import time
+from core.llm_cache import ResponseCache, get_response_cache, make_cache_key
+from core.metrics import observe_llm, llm_cache_hits, llm_first_token_seconds
+from core.usage import get_usage_ledger
+from core.context import estimate_tokens
 
-load_dotenv()
+# ----------------------------
+# Shared HTTP connection pool
+# ----------------------------
+# Every DialClient talks to Azure through one pooled httpx client, so keep-alive
+# connections are reused across agents and a single worker can keep thousands of
+# LLM calls in flight. Tune the pool through the environment.
+DIAL_MAX_CONNECTIONS = int(os.getenv("DIAL_MAX_CONNECTIONS", "1000"))
+DIAL_MAX_KEEPALIVE = int(os.getenv("DIAL_MAX_KEEPALIVE", "200"))
+DIAL_KEEPALIVE_EXPIRY = float(os.getenv("DIAL_KEEPALIVE_EXPIRY", "30"))
+DIAL_TIMEOUT = float(os.getenv("DIAL_TIMEOUT", "60"))
+DIAL_MAX_RETRIES = int(os.getenv("DIAL_MAX_RETRIES", "2"))
 
-class DialClient:
-    def __init__(self):
-        self.client = AzureOpenAI(
-            api_key=os.getenv("DAIL_API_KEY"),
-            api_version=os.getenv("API_VERSION"),
-            azure_endpoint=os.getenv("AZURE_ENDPOINT"),
+# Embedding batching: inputs per request and concurrent requests per embed_many call
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+
+# Ask for a usage chunk at the end of streamed completions (stream_options; Azure
+# needs api-version 2024-09-01-preview or later). Without it stream tokens are estimated.
+DIAL_STREAM_USAGE = os.getenv("DIAL_STREAM_USAGE", "0") == "1"
+
+_http_client = None   # httpx.AsyncClient
+
+
+class DialError(RuntimeError):
+    """Raised when an LLM call cannot return a usable result."""
+
+
+def get_http_client():
+    """Return the process-wide pooled HTTP client (httpx.AsyncClient), creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        import httpx
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=DIAL_MAX_CONNECTIONS,
+                max_keepalive_connections=DIAL_MAX_KEEPALIVE,
+                keepalive_expiry=DIAL_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(DIAL_TIMEOUT, connect=10.0),
         )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared pool (call on application shutdown)."""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
+
+class DialClient:
+    """
+    LLM calls for the agents. Cheap to construct: the openai SDK is imported
+    and its client built on the first call. Agents share one instance
+    through get_dial_client().
+    """
+
+    def __init__(self, cache: ResponseCache | None = None):
         self.chat_model = os.getenv("DEFAULT_MODEL", "gpt-4o")  # fallback
         self.embed_model = os.getenv("EMBEDDING_MODEL", "text-embedding-005")
+        self.cache = cache if cache is not None else get_response_cache()
+        self._client = None
+        self._embed_cache = None
+
+    @property
+    def client(self):
+        """The Azure OpenAI SDK client, created (and the SDK imported) on the first LLM call."""
+        if self._client is None:
+            from openai import AsyncAzureOpenAI
+            self._client = AsyncAzureOpenAI(
+                api_key=os.getenv("DAIL_API_KEY"),
+                api_version=os.getenv("API_VERSION"),
+                azure_endpoint=os.getenv("AZURE_ENDPOINT"),
+                http_client=get_http_client(),
+                max_retries=DIAL_MAX_RETRIES,
+            )
+        return self._client
+
+    @property
+    def embed_cache(self):
+        if self._embed_cache is None:
+            from core.embedding_cache import EmbeddingCache
+            self._embed_cache = EmbeddingCache(self.embed_model)
+        return self._embed_cache
+
+    @staticmethod
+    def _account(call_site, model, usage=None, messages=(), text=""):
+        """Add one call to the token ledger; estimated from the text when the provider sent no usage."""
+        if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+            get_usage_ledger().record(call_site, model, usage.prompt_tokens, getattr(usage, "completion_tokens", 0) or 0)
+        else:
+            prompt = sum(estimate_tokens(m.get("content") or "") for m in messages)
+            get_usage_ledger().record(call_site, model, prompt, estimate_tokens(text or ""), estimated=True)
 
     # Generic chat
-    def chat(self, messages, temperature=0.0):
+    async def chat(self, messages, temperature=0.0, cache=False, call_site="chat"):
+        """
+        Chat completion. Pass cache=True from deterministic call sites
+        (classifiers, temperature 0) to reuse earlier answers to the same prompt.
+        `call_site` names the caller in the token ledger (core.usage).
+        """
+        model = await get_usage_ledger().model_for(self.chat_model)
+        key = None
+        if cache and self.cache is not None:
+            key = make_cache_key(model, messages, temperature)
+            hit = self.cache.get(key)
+            if hit is not None:
+                llm_cache_hits.labels("chat").inc()
+                return hit
+        start = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
-                model=self.chat_model,
+            response = await self.client.chat.completions.create(
+                model=model,
                 messages=messages,
                 temperature=temperature,
             )
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
         except Exception as e:
+            observe_llm("chat", model, start, "error")
             return f"[Chat Error] {str(e)}"
+        observe_llm("chat", model, start, usage=response.usage)
+        self._account(call_site, model, response.usage, messages, content)
+        if key is not None and content is not None:
+            self.cache.set(key, content)
+        return content
 
-    # Generic embedding
-    def embed(self, text):
+    # Streaming chat
+    async def chat_stream(self, messages, temperature=0.0, call_site="chat_stream"):
+        """
+        Async token iterator over a streamed chat completion.
+        Raises DialError if the request fails (before or during the stream).
+        """
+        model = await get_usage_ledger().model_for(self.chat_model)
+        extra = {"stream_options": {"include_usage": True}} if DIAL_STREAM_USAGE else {}
+        start, first, usage, parts = time.perf_counter(), False, None, []
         try:
-            response = self.client.embeddings.create(
-                model=self.embed_model,
-                input=text
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                **extra,
             )
-            return response.data[0].embedding
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if not first:
+                        first = True
+                        llm_first_token_seconds.labels(model).observe(time.perf_counter() - start)
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
         except Exception as e:
-            return f"[Embedding Error] {str(e)}"
+            observe_llm("chat_stream", model, start, "error")
+            self._account(call_site, model, None, messages, "".join(parts))   # partial output was still billed
+            raise DialError(f"[Chat Error] {str(e)}") from e
+        observe_llm("chat_stream", model, start, usage=usage)
+        self._account(call_site, model, usage, messages, "".join(parts))
+
+    # Generic embedding
+    async def embed(self, text):
+        """Embed one text. Raises DialError on failure."""
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts, batch_size=EMBED_BATCH_SIZE, concurrency=EMBED_CONCURRENCY):
+        """
+        Embed many texts -> contiguous float32 matrix (np.ndarray), one row per input (in order).
+        Texts already in the on-disk cache are never re-sent; the rest are
+        de-duplicated, split into provider-sized batches and embedded
+        concurrently (at most `concurrency` requests in flight).
+        Raises DialError if any batch fails.
+        """
+        import numpy as np
+        from core.embedding_cache import text_hash
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        hashes = [text_hash(t) for t in texts]
+        cached = await asyncio.to_thread(self.embed_cache.get_many, list(set(hashes)))
+
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in cached and h not in missing:
+                missing[h] = t
+        todo = list(missing.items())
+        batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+        sem = asyncio.Semaphore(concurrency)
+
+        async def run_batch(batch):
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    response = await self.client.embeddings.create(
+                        model=self.embed_model,
+                        input=[t for _, t in batch],
+                    )
+                except Exception as e:
+                    observe_llm("embeddings", self.embed_model, start, "error")
+                    raise DialError(f"[Embedding Error] {str(e)}") from e
+                observe_llm("embeddings", self.embed_model, start, usage=response.usage)
+                self._account("embeddings", self.embed_model, response.usage,
+                              [{"content": t} for _, t in batch])
+            rows = sorted(response.data, key=lambda d: d.index)
+            return [h for h, _ in batch], np.asarray([d.embedding for d in rows], dtype=np.float32)
+
+        fresh = {}
+        for batch_hashes, vectors in await asyncio.gather(*(run_batch(b) for b in batches)):
+            await asyncio.to_thread(self.embed_cache.put_many, batch_hashes, vectors)
+            fresh.update(zip(batch_hashes, vectors))
+
+        sample = next(iter(cached.values())) if cached else next(iter(fresh.values()))
+        out = np.empty((len(texts), sample.shape[0]), dtype=np.float32)
+        for i, h in enumerate(hashes):
+            out[i] = cached[h] if h in cached else fresh[h]
+        return out
 
     # 🔹 NEW: Document validation helper for Claims Agent
-    def validate_claim_document(self, claim_type: str, doc_text: str) -> str:
+    async def validate_claim_document(self, claim_type: str, doc_text: str,
+                                      call_site: str = "claims.validate_document") -> str:
         """
         Validate claim documents using GPT-4o.
         Returns either:
         - 'YES | ExtractedInfo' (if valid)
         - 'NO' (if invalid)
         """
+        model = await get_usage_ledger().model_for(self.chat_model)
+        start = time.perf_counter()
         try:
             messages = [
                 {
@@ -68,11 +258,28 @@ Validation rules:
 """
                 }
             ]
-            response = self.client.chat.completions.create(
-                model=self.chat_model,
+            response = await self.client.chat.completions.create(
+                model=model,
                 messages=messages,
                 temperature=0.0,
             )
+            observe_llm("validate_document", model, start, usage=response.usage)
+            self._account(call_site, model, response.usage, messages, response.choices[0].message.content)
             return response.choices[0].message.content.strip()
         except Exception as e:
+            observe_llm("validate_document", model, start, "error")
             return f"[Validation Error] {str(e)}"
+
+
+_dial_client: DialClient | None = None
+_dial_client_lock = threading.Lock()
+
+
+def get_dial_client() -> DialClient:
+    """The process-wide DialClient shared by every agent, created on first use."""
+    global _dial_client
+    if _dial_client is None:
+        with _dial_client_lock:
+            if _dial_client is None:
+                _dial_client = DialClient()
+    return _dial_client
@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict
+from typing import Awaitable, Callable
+from core.db import connection, transaction, init_db, run_db
+from core.ttl_lru import TTLLRUCache
+
+# ----------------------------
+# Config
+# ----------------------------
+DOC_VALIDATION_MEMO = os.getenv("DOC_VALIDATION_MEMO", "sqlite")            # sqlite | memory | off
+DOC_VALIDATION_TTL = float(os.getenv("DOC_VALIDATION_TTL", str(30 * 86400)))  # seconds a verdict is reused
+DOC_VALIDATION_MAX_ENTRIES = int(os.getenv("DOC_VALIDATION_MAX_ENTRIES", "100000"))
+DOC_PRESCREEN = os.getenv("DOC_PRESCREEN", "1") == "1"
+
+
+def normalize_document(text: str) -> str:
+    """Same document, same key: Unicode forms, case and whitespace are folded away."""
+    return " ".join(unicodedata.normalize("NFKC", text or "").casefold().split())
+
+
+def document_hash(text: str) -> str:
+    return hashlib.sha256(normalize_document(text).encode("utf-8")).hexdigest()
+
+
+def is_verdict(result: str) -> bool:
+    """A real YES/NO answer from the validator (errors are never memoized)."""
+    return result.startswith("YES") or result.upper().startswith("NO")
+
+
+def rejection_message(result: str) -> str:
+    """User-facing text for a rejected document, with the pre-screen's reason if it gave one."""
+    reason = result.split("|", 1)[1].strip() if result.startswith("NO |") else ""
+    return f"❌ Invalid document: {reason}." if reason else "❌ Invalid document."
+
+
+@dataclass
+class ValidationStats:
+    prescreen_rejects: int = 0
+    memo_hits: int = 0
+    inflight_shared: int = 0     # waited on an identical document already being validated
+    llm_calls: int = 0
+
+    def as_dict(self) -> dict:
+        avoided = self.prescreen_rejects + self.memo_hits + self.inflight_shared
+        total = avoided + self.llm_calls
+        return {
+            **asdict(self),
+            "llm_calls_avoided": avoided,
+            "avoided_share": round(avoided / total, 4) if total else 0.0,
+        }
+
+
+# ----------------------------
+# Pre-screen
+# ----------------------------
+class DocumentPrescreen:
+    """
+    Cheap local rejection of documents that cannot pass validation.
+    rules = {claim_type: [pattern, ...]}: a document must match at least one
+    pattern of its claim type. Unknown claim types are never rejected here.
+    requires = {claim_type: "what the patterns look for"} words the rejection.
+    """
+
+    def __init__(self, rules: dict[str, list[str]], min_chars: int = 0, requires: dict[str, str] | None = None):
+        self.rules = {t: [re.compile(p, re.IGNORECASE) for p in patterns] for t, patterns in rules.items()}
+        self.min_chars = min_chars
+        self.requires = requires or {}
+
+    def check(self, claim_type: str, text: str) -> str | None:
+        """Why the document is rejected, or None if it has to go to the validator."""
+        if len("".join((text or "").split())) < self.min_chars:
+            return "document is empty or too short"
+        patterns = self.rules.get(claim_type)
+        if patterns and not any(rx.search(text) for rx in patterns):
+            return f"no {self.requires.get(claim_type, claim_type)} details found"
+        return None
+
+
+# ----------------------------
+# Memo backends
+# ----------------------------
+class ValidationMemo(ABC):
+    """Validator verdicts keyed by (claim_type, normalized document hash)."""
+
+    @abstractmethod
+    def get(self, claim_type: str, doc_hash: str) -> str | None:
+        ...
+
+    @abstractmethod
+    def set(self, claim_type: str, doc_hash: str, result: str):
+        ...
+
+
+class MemoryValidationMemo(ValidationMemo):
+    def __init__(self, ttl: float = DOC_VALIDATION_TTL, max_entries: int = DOC_VALIDATION_MAX_ENTRIES):
+        self._lru = TTLLRUCache(max_size=max_entries, ttl=ttl)
+
+    def get(self, claim_type, doc_hash):
+        return self._lru.get((claim_type, doc_hash))
+
+    def set(self, claim_type, doc_hash, result):
+        self._lru.set((claim_type, doc_hash), result)
+
+
+class SQLiteValidationMemo(ValidationMemo):
+    """
+    Verdicts in the main database (document_validations), so a resubmitted
+    document is recognised by every worker and across restarts. Rows older
+    than `ttl` are ignored and removed every SWEEP_EVERY writes.
+    """
+
+    SWEEP_EVERY = 500
+
+    def __init__(self, ttl: float = DOC_VALIDATION_TTL):
+        self.ttl = ttl
+        self._writes = 0
+
+    def get(self, claim_type, doc_hash):
+        with connection() as conn:
+            row = conn.execute(
+                "SELECT result FROM document_validations WHERE claim_type=? AND doc_hash=? AND created_at>?",
+                (claim_type, doc_hash, time.time() - self.ttl),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, claim_type, doc_hash, result):
+        with transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO document_validations (claim_type, doc_hash, result, created_at) VALUES (?, ?, ?, ?)",
+                (claim_type, doc_hash, result, time.time()),
+            )
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            self.sweep()
+
+    def sweep(self) -> int:
+        with transaction() as conn:
+            return conn.execute(
+                "DELETE FROM document_validations WHERE created_at<=?", (time.time() - self.ttl,)
+            ).rowcount
+
+
+_validation_memo: ValidationMemo | None = None
+_validation_memo_lock = threading.Lock()
+
+
+def get_validation_memo() -> ValidationMemo | None:
+    """Process-wide memo selected by DOC_VALIDATION_MEMO (None when off)."""
+    global _validation_memo
+    if DOC_VALIDATION_MEMO == "off":
+        return None
+    if _validation_memo is None:
+        with _validation_memo_lock:
+            if _validation_memo is None:
+                if DOC_VALIDATION_MEMO == "memory":
+                    _validation_memo = MemoryValidationMemo()
+                else:
+                    init_db()
+                    _validation_memo = SQLiteValidationMemo()
+    return _validation_memo
+
+
+# ----------------------------
+# Validator
+# ----------------------------
+class DocumentValidator:
+    """
+    Front for the LLM document validator, cheapest answer first:
+    1. the local pre-screen rejects documents that cannot pass ("NO | reason")
+    2. the memo returns the earlier verdict for the same normalized document
+    3. identical documents already in flight share one LLM call
+    4. otherwise `fallback` (the LLM) is called and a YES/NO verdict memoized
+    The reply format is the validator's own, so callers need not change.
+    """
+
+    def __init__(self, name: str, prescreen: DocumentPrescreen | None = None,
+                 memo: ValidationMemo | None = None, use_prescreen: bool = DOC_PRESCREEN, use_memo: bool = True):
+        self.name = name
+        self.prescreen = prescreen if use_prescreen else None
+        self.use_memo = use_memo
+        self._memo = memo
+        self.stats = ValidationStats()
+        self._inflight: dict[tuple[str, str], asyncio.Future] = {}
+
+    @property
+    def memo(self) -> ValidationMemo | None:
+        if self._memo is None and self.use_memo:
+            self._memo = get_validation_memo()
+        return self._memo
+
+    async def validate(self, claim_type: str, text: str, fallback: Callable[[], Awaitable[str]]) -> str:
+        if self.prescreen is not None:
+            reason = self.prescreen.check(claim_type, text)
+            if reason:
+                self.stats.prescreen_rejects += 1
+                return f"NO | {reason}"
+
+        key = (claim_type, document_hash(text))
+        memo = self.memo
+        if memo is not None:
+            cached = await run_db(memo.get, *key)
+            if cached is not None:
+                self.stats.memo_hits += 1
+                return cached
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats.inflight_shared += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            self.stats.llm_calls += 1
+            result = await fallback()
+            if memo is not None and is_verdict(result):
+                await run_db(memo.set, *key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()   # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats_dict(self) -> dict:
+        memo = self.memo
+        return {
+            **self.stats.as_dict(),
+            "prescreen": self.prescreen is not None,
+            "memo": type(memo).__name__ if memo else None,
+        }
@@ -0,0 +1,243 @@
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from core.db import connection, transaction, init_db
+from core.email_transport import EmailTransport, ResendTransport, FakeTransport, PermanentEmailError
+
+# ----------------------------
+# Config
+# ----------------------------
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "resend")                # resend | fake
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "4"))
+EMAIL_CLAIM_SIZE = int(os.getenv("EMAIL_CLAIM_SIZE", "100"))             # messages a worker takes at once (at most one with attachments)
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+EMAIL_BACKOFF_BASE = float(os.getenv("EMAIL_BACKOFF_BASE", "2"))         # seconds, doubled per attempt
+EMAIL_BACKOFF_MAX = float(os.getenv("EMAIL_BACKOFF_MAX", "300"))
+EMAIL_LEASE_SECONDS = float(os.getenv("EMAIL_LEASE_SECONDS", "120"))     # 'sending' rows older than this are retried
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", "1.0"))
+EMAIL_DRAIN_TIMEOUT = float(os.getenv("EMAIL_DRAIN_TIMEOUT", "10"))      # wait for due mail at exit
+
+CLAIM_SQL = """
+    SELECT id, attachments IS NOT NULL
+    FROM email_outbox
+    WHERE (status='queued' AND next_attempt_at<=?) OR (status='sending' AND lease_until<=?)
+    ORDER BY next_attempt_at
+    LIMIT ?
+"""
+
+
+class EmailOutbox:
+    """
+    Durable outbound email queue in the main SQLite database.
+    enqueue() only inserts a row; a pool of worker threads claims due rows
+    (leased, so a crashed worker's mail is picked up again), sends messages
+    without attachments through the provider's batch API and the rest one by
+    one, and records the outcome. A claim holds at most one message with
+    attachments, so its sends fit in the lease and attachment mail is spread
+    over the workers. Failures are retried with exponential backoff and
+    jitter up to max_attempts, then marked 'failed'.
+    Delivery is at-least-once: a worker that dies after the provider accepted
+    a message but before recording it will send it again.
+    """
+
+    def __init__(self, transport: EmailTransport, workers: int = EMAIL_WORKERS,
+                 claim_size: int = EMAIL_CLAIM_SIZE, max_attempts: int = EMAIL_MAX_ATTEMPTS,
+                 backoff_base: float = EMAIL_BACKOFF_BASE, backoff_max: float = EMAIL_BACKOFF_MAX,
+                 lease_seconds: float = EMAIL_LEASE_SECONDS, poll_interval: float = EMAIL_POLL_INTERVAL):
+        self.transport = transport
+        self.workers = max(1, workers)
+        self.claim_size = max(1, claim_size)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    # ----------------------------
+    # Producer side
+    # ----------------------------
+    def enqueue(self, to_email: str, subject: str, html: str, attachments: list[dict] | None = None) -> int:
+        """Queue a message for delivery and return its outbox id."""
+        with transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO email_outbox (to_email, subject, html, attachments, next_attempt_at) VALUES (?, ?, ?, ?, ?)",
+                (to_email, subject, html, json.dumps(attachments) if attachments else None, time.time()),
+            )
+            outbox_id = cur.lastrowid
+        self._wake.set()
+        return outbox_id
+
+    def status(self, outbox_id: int) -> dict | None:
+        with connection() as conn:
+            row = conn.execute(
+                "SELECT id, to_email, status, attempts, provider_id, last_error, created_at, sent_at "
+                "FROM email_outbox WHERE id=?", (outbox_id,)
+            ).fetchone()
+        if not row:
+            return None
+        keys = ("id", "to_email", "status", "attempts", "provider_id", "last_error", "created_at", "sent_at")
+        return dict(zip(keys, row))
+
+    def stats(self) -> dict:
+        with connection() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM email_outbox GROUP BY status").fetchall())
+        return {s: counts.get(s, 0) for s in ("queued", "sending", "sent", "failed")}
+
+    # ----------------------------
+    # Workers
+    # ----------------------------
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"email-outbox-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for t in self._threads:
+                t.start()
+
+    def stop(self, drain_timeout: float = 0):
+        """Stop the workers, first waiting up to drain_timeout for due mail to go out."""
+        deadline = time.monotonic() + drain_timeout
+        while time.monotonic() < deadline and self._has_due():
+            time.sleep(0.05)
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            for t in self._threads:
+                t.join()
+            self._threads = []
+
+    def _has_due(self) -> bool:
+        now = time.time()
+        with connection() as conn:
+            return conn.execute(
+                "SELECT 1 FROM email_outbox WHERE (status='queued' AND next_attempt_at<=?) OR status='sending' LIMIT 1",
+                (now,),
+            ).fetchone() is not None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                rows = self._claim()
+            except Exception as e:
+                print(f"⚠️ Email outbox claim failed: {e}")
+                rows = []
+            if rows:
+                try:
+                    self._deliver(rows)
+                except Exception as e:   # rows left 'sending' are retried once their lease runs out
+                    print(f"⚠️ Email outbox delivery failed: {e}")
+                continue
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _claim(self) -> list[tuple]:
+        """Lease due rows: up to claim_size, of which at most one has attachments (sent on its own)."""
+        now = time.time()
+        with transaction(immediate=True) as conn:
+            due = conn.execute(CLAIM_SQL, (now, now, self.claim_size)).fetchall()
+            ids, with_files = [], False
+            for outbox_id, has_files in due:
+                if has_files:
+                    if with_files:
+                        continue   # left for the next claim, possibly another worker's
+                    with_files = True
+                ids.append(outbox_id)
+            if not ids:
+                return []
+            conn.executemany(
+                "UPDATE email_outbox SET status='sending', lease_until=?, attempts=attempts+1 WHERE id=?",
+                [(now + self.lease_seconds, outbox_id) for outbox_id in ids],
+            )
+            marks = ",".join("?" * len(ids))
+            return conn.execute(
+                f"SELECT id, to_email, subject, html, attachments, attempts FROM email_outbox WHERE id IN ({marks})",
+                ids,
+            ).fetchall()
+
+    def _deliver(self, rows: list[tuple]):
+        plain, with_files = [], []
+        for outbox_id, to_email, subject, html, attachments, attempts in rows:
+            message = {"to": [to_email], "subject": subject, "html": html}
+            if attachments:
+                message["attachments"] = json.loads(attachments)
+                with_files.append((outbox_id, attempts, message))
+            else:
+                plain.append((outbox_id, attempts, message))
+
+        step = max(1, self.transport.max_batch)
+        for i in range(0, len(plain), step):
+            chunk = plain[i:i + step]
+            self._attempt(chunk, lambda: (self.transport.send_batch([m for _, _, m in chunk]) if len(chunk) > 1
+                                          else [self.transport.send(chunk[0][2])]))
+        for item in with_files:
+            self._attempt([item], lambda: [self.transport.send(item[2])])
+
+    def _attempt(self, items: list[tuple], send):
+        """Send one message or batch and record the outcome. Never raises, so one bad send cannot stop a worker."""
+        try:
+            try:
+                provider_ids = send()
+            except Exception as e:
+                self._failed([(oid, n) for oid, n, _ in items], e)
+            else:
+                self._sent([(oid, pid) for (oid, _, _), pid in zip(items, provider_ids)])
+        except Exception as e:   # the outcome could not be recorded: the lease runs out and the rows are retried
+            print(f"⚠️ Email outbox could not record {len(items)} message(s): {e}")
+
+    def _sent(self, results: list[tuple[int, str]]):
+        with transaction() as conn:
+            conn.executemany(
+                "UPDATE email_outbox SET status='sent', provider_id=?, last_error=NULL, lease_until=NULL, "
+                "sent_at=CURRENT_TIMESTAMP WHERE id=?",
+                [(provider_id, oid) for oid, provider_id in results],
+            )
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _failed(self, items: list[tuple[int, int]], error: Exception):
+        now = time.time()
+        permanent = isinstance(error, PermanentEmailError)
+        updates = []
+        for oid, attempts in items:
+            if permanent or attempts >= self.max_attempts:
+                updates.append(("failed", now, str(error), oid))
+            else:
+                updates.append(("queued", now + self.backoff(attempts), str(error), oid))
+        with transaction() as conn:
+            conn.executemany(
+                "UPDATE email_outbox SET status=?, next_attempt_at=?, last_error=?, lease_until=NULL WHERE id=?",
+                updates,
+            )
+        print(f"⚠️ Email delivery failed for {len(items)} message(s): {error}")
+
+
+_email_outbox: EmailOutbox | None = None
+_email_outbox_lock = threading.Lock()
+
+
+def get_email_outbox() -> EmailOutbox:
+    """Process-wide outbox (transport chosen by EMAIL_TRANSPORT); workers start on first use."""
+    global _email_outbox
+    if _email_outbox is None:
+        with _email_outbox_lock:
+            if _email_outbox is None:
+                init_db()
+                transport = FakeTransport() if EMAIL_TRANSPORT == "fake" else ResendTransport()
+                outbox = EmailOutbox(transport)
+                outbox.start()
+                atexit.register(outbox.stop, EMAIL_DRAIN_TIMEOUT)
+                _email_outbox = outbox
+    return _email_outbox
@@ -1,61 +1,26 @@
-import os
-import resend
 import base64
-from fpdf import FPDF
-from dotenv import load_dotenv
-load_dotenv()
+from core.email_outbox import get_email_outbox
 
 
 
 # ---------------------------
-# PDF Generator
+# Policy Email (queued - delivered by the outbox workers)
 # ---------------------------
-def generate_policy_pdf(user_name, policy_name, premium, coverage, benefits, insurance_type, filename="policy.pdf"):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 16)
-
-    pdf.cell(200, 10, "InsurAI Insurance Policy Document", ln=True, align="C")
-    pdf.ln(10)
-
-    pdf.set_font("Arial", "", 12)
-    pdf.cell(200, 10, f"Policy Holder: {user_name}", ln=True)
-    pdf.cell(200, 10, f"Policy Type: {insurance_type.capitalize()}", ln=True)
-    pdf.cell(200, 10, f"Policy Name: {policy_name}", ln=True)
-    pdf.cell(200, 10, f"Premium: INR {premium}/year", ln=True)
-    pdf.cell(200, 10, f"Coverage: INR {coverage}", ln=True)
-    pdf.multi_cell(200, 10, f"Benefits: {benefits}", align="L")
-
-    pdf.ln(10)
-    pdf.cell(200, 10, "This is a system-generated insurance policy.", ln=True, align="C")
-
-    pdf.output(filename)
-    return filename
-
-
-# ---------------------------
-# Email Sender (Resend API)
-# ---------------------------
-def send_policy_email(to_email, subject, body, attachment_path):
-    resend.api_key = os.getenv("RESEND_API_KEY")
-
-    with open(attachment_path, "rb") as f:
-        file_data = f.read()
-        encoded_file = base64.b64encode(file_data).decode("utf-8")  # ✅ Encode to Base64
-
-    params = {
-        "from": os.getenv("EMAIL_SENDER"),
-        "to": [to_email],
-        "subject": subject,
-        "html": body.replace("\n", "<br>"),
-        "attachments": [
+def send_policy_email(to_email, subject, body, pdf_bytes, filename="policy.pdf") -> int:
+    """Queue the policy email with the in-memory PDF (see core.policy_pdf) attached; returns the outbox id."""
+    encoded_file = base64.b64encode(pdf_bytes).decode("utf-8")  # ✅ Encode to Base64
+
+    outbox_id = get_email_outbox().enqueue(
+        to_email,
+        subject,
+        body.replace("\n", "<br>"),
+        attachments=[
             {
-                "filename": os.path.basename(attachment_path),
+                "filename": filename,
                 "content": encoded_file,               # ✅ Base64 string
                 "type": "application/pdf"              # ✅ MIME type
             }
-        ]
-    }
-
-    email = resend.Emails.send(params)
-    print(f"📧 Email sent via Resend to {to_email}, ID={email['id']}")
+        ],
+    )
+    print(f"📧 Policy email queued for {to_email}, outbox ID={outbox_id}")
+    return outbox_id
@@ -0,0 +1,90 @@
+import os
+import random
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+
+class PermanentEmailError(Exception):
+    """The provider rejected the message itself - retrying will not help."""
+
+
+# ---------------------------
+# Transports
+# ---------------------------
+class EmailTransport(ABC):
+    """
+    Delivers outbox messages. A message is a Resend-style dict:
+    {"to": [...], "subject", "html", "attachments": [...] (optional)}.
+    send() returns the provider message id; send_batch() returns one id per
+    message and is only used for messages without attachments.
+    """
+    max_batch = 1
+
+    @abstractmethod
+    def send(self, message: dict) -> str:
+        ...
+
+    def send_batch(self, messages: list[dict]) -> list[str]:
+        return [self.send(m) for m in messages]
+
+
+class ResendTransport(EmailTransport):
+    # Resend's batch endpoint takes up to 100 emails, without attachments
+    max_batch = 100
+
+    def __init__(self, api_key: str | None = None, sender: str | None = None):
+        import resend   # only workers that actually send email pay for the SDK import
+        resend.api_key = api_key or os.getenv("RESEND_API_KEY")
+        self.resend = resend
+        self.sender = sender or os.getenv("EMAIL_SENDER")
+
+    def _params(self, message: dict) -> dict:
+        return {"from": self.sender, **message}
+
+    def _call(self, fn, *args):
+        try:
+            return fn(*args)
+        except (self.resend.exceptions.ValidationError,
+                self.resend.exceptions.MissingRequiredFieldsError,
+                self.resend.exceptions.InvalidApiKeyError) as e:
+            raise PermanentEmailError(str(e)) from e
+
+    def send(self, message: dict) -> str:
+        return self._call(self.resend.Emails.send, self._params(message))["id"]
+
+    def send_batch(self, messages: list[dict]) -> list[str]:
+        response = self._call(self.resend.Batch.send, [self._params(m) for m in messages])
+        return [item["id"] for item in response["data"]]
+
+
+class FakeTransport(EmailTransport):
+    """
+    Offline stand-in for load tests: sleeps `latency` per API call (one call
+    per batch) and fails a `failure_rate` fraction of calls.
+    """
+
+    def __init__(self, latency: float = 0.05, failure_rate: float = 0.0, max_batch: int = 100, seed: int | None = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.max_batch = max_batch
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.sent: list[dict] = []
+        self.calls = 0
+
+    def _api_call(self, messages: list[dict]) -> list[str]:
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            if self._random.random() < self.failure_rate:
+                raise RuntimeError("fake transport: simulated provider error")
+            self.sent.extend(messages)
+        return [uuid.uuid4().hex for _ in messages]
+
+    def send(self, message: dict) -> str:
+        return self._api_call([message])[0]
+
+    def send_batch(self, messages: list[dict]) -> list[str]:
+        return self._api_call(messages)
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+
+EMBED_CACHE_DIR = os.getenv(
+    "EMBED_CACHE_DIR", os.path.join(os.path.dirname(__file__), "embedding_cache")
+)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-hash keyed embedding store for one model.
+    - vectors live in a flat float32 file ({model}.f32), read through np.memmap
+    - a small SQLite index maps sha256(text) -> row number
+    Writers allocate rows inside an IMMEDIATE transaction, so several worker
+    processes can share the same directory.
+    """
+
+    def __init__(self, model: str, directory: str = EMBED_CACHE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        self.vectors_path = os.path.join(directory, f"{safe}.f32")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, f"{safe}.idx"), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        if not os.path.exists(self.vectors_path):
+            open(self.vectors_path, "ab").close()
+        self._map = None
+        self._mapped_rows = 0
+
+    # ----------------------------
+    # Internals
+    # ----------------------------
+    def _meta(self, key):
+        row = self._conn.execute("SELECT v FROM meta WHERE k=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _rows_for(self, hashes: list[str]) -> dict[str, int]:
+        found = {}
+        # stay well under SQLITE_MAX_VARIABLE_NUMBER
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            found.update(self._conn.execute(
+                f"SELECT hash, row FROM vectors WHERE hash IN ({marks})", chunk
+            ).fetchall())
+        return found
+
+    def _view(self, rows_needed: int, dim: int):
+        """Memory map covering at least rows_needed rows (remapped only when the file grew)."""
+        if self._map is None or self._mapped_rows < rows_needed:
+            rows = os.path.getsize(self.vectors_path) // (dim * 4)
+            self._map = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, dim))
+            self._mapped_rows = rows
+        return self._map
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    @property
+    def dim(self) -> int | None:
+        with self._lock:
+            return self._meta("dim")
+
+    def get_many(self, hashes: list[str]) -> dict[str, np.ndarray]:
+        """Return {hash: vector} for the hashes already on disk."""
+        if not hashes:
+            return {}
+        with self._lock:
+            dim = self._meta("dim")
+            if dim is None:
+                return {}
+            found = self._rows_for(hashes)
+            if not found:
+                return {}
+            view = self._view(max(found.values()) + 1, dim)
+            return {h: view[r] for h, r in found.items()}
+
+    def put_many(self, hashes: list[str], vectors: np.ndarray):
+        """Append vectors (one row per hash); hashes already stored are skipped."""
+        if not hashes:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                dim = self._meta("dim")
+                if dim is None:
+                    dim = vectors.shape[1]
+                    self._conn.execute("INSERT INTO meta (k, v) VALUES ('dim', ?)", (dim,))
+                elif dim != vectors.shape[1]:
+                    raise ValueError(f"Embedding dim {vectors.shape[1]} does not match cache dim {dim}")
+
+                existing = self._rows_for(hashes)
+                seen = set()
+                keep = []
+                for i, h in enumerate(hashes):
+                    if h not in existing and h not in seen:
+                        seen.add(h)
+                        keep.append(i)
+                if not keep:
+                    self._conn.execute("COMMIT")
+                    return
+
+                start = self._meta("rows") or 0
+                with open(self.vectors_path, "r+b") as f:
+                    f.seek(start * dim * 4)
+                    f.write(vectors[keep].tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO vectors (hash, row) VALUES (?, ?)",
+                    [(hashes[i], start + n) for n, i in enumerate(keep)],
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (k, v) VALUES ('rows', ?)", (start + len(keep),)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._meta("rows") or 0
@@ -0,0 +1,68 @@
+import os
+import re
+from typing import Awaitable, Callable
+
+# Local answers below this confidence fall through to the LLM
+FAST_CLASSIFIER_THRESHOLD = float(os.getenv("FAST_CLASSIFIER_THRESHOLD", "0.8"))
+
+
+class KeywordClassifier:
+    """
+    Tier one: weighted regex rules, microseconds per call.
+    rules = {label: [(pattern, weight), ...]} with weights in (0, 1].
+    Each label scores the sum of its matching weights; confidence is the top
+    score (capped at 1) times its share of all scores, so a lone strong match
+    is ~1.0 and two competing labels split it.
+    """
+
+    def __init__(self, rules: dict[str, list[tuple[str, float]]]):
+        self.rules = {
+            label: [(re.compile(p, re.IGNORECASE), w) for p, w in patterns]
+            for label, patterns in rules.items()
+        }
+
+    def scores(self, text: str) -> dict[str, float]:
+        text = text.strip()
+        out = {}
+        for label, patterns in self.rules.items():
+            score = sum(w for rx, w in patterns if rx.search(text))
+            if score:
+                out[label] = score
+        return out
+
+    def predict(self, text: str) -> tuple[str | None, float]:
+        scores = self.scores(text)
+        if not scores:
+            return None, 0.0
+        label, top = max(scores.items(), key=lambda kv: kv[1])
+        confidence = min(1.0, top) * top / sum(scores.values())
+        return label, confidence
+
+
+class TieredClassifier:
+    """
+    Local classifier first, LLM fallback only when the local answer is not
+    confident enough. `stats` counts how many calls each tier handled.
+    """
+
+    def __init__(self, name: str, local: KeywordClassifier, threshold: float = FAST_CLASSIFIER_THRESHOLD):
+        self.name = name
+        self.local = local
+        self.threshold = threshold
+        self.stats = {"local": 0, "llm": 0}
+
+    async def classify(self, text: str, fallback: Callable[[], Awaitable[str]]) -> str:
+        label, confidence = self.local.predict(text)
+        if label is not None and confidence >= self.threshold:
+            self.stats["local"] += 1
+            return label
+        self.stats["llm"] += 1
+        return await fallback()
+
+    def stats_dict(self) -> dict:
+        total = self.stats["local"] + self.stats["llm"]
+        return {
+            **self.stats,
+            "threshold": self.threshold,
+            "local_share": round(self.stats["local"] / total, 4) if total else 0.0,
+        }
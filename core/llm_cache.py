@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict
+from core.ttl_lru import TTLLRUCache
+
+# ----------------------------
+# Config
+# ----------------------------
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")   # memory | sqlite | off
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))       # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "llm_cache.db")
+)
+
+
+def make_cache_key(model: str, messages: list, temperature: float) -> str:
+    """Canonical hash of a chat request - key order and whitespace never change the key."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": float(temperature)},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "hit_rate": round(self.hit_rate, 4)}
+
+
+# ----------------------------
+# Backends
+# ----------------------------
+class ResponseCache(ABC):
+    """Interface for chat response caches. Backends implement _get/_set/clear."""
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> str | None:
+        value = self._get(key)
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        self._set(key, value)
+
+    @abstractmethod
+    def _get(self, key: str) -> str | None:
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, value: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU + TTL cache."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float | None = LLM_CACHE_TTL):
+        super().__init__()
+        self._lru = TTLLRUCache(max_size=max_entries, ttl=ttl)
+
+    def _get(self, key):
+        value = self._lru.get(key)
+        self.stats.evictions = self._lru.evictions
+        self.stats.expirations = self._lru.expirations
+        return value
+
+    def _set(self, key, value):
+        self._lru.set(key, value)
+        self.stats.evictions = self._lru.evictions
+
+    def clear(self):
+        self._lru.clear()
+
+
+class SQLiteResponseCache(ResponseCache):
+    """Persistent cache shared by every worker process pointing at the same file."""
+
+    TRIM_EVERY = 100
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 ttl: float | None = LLM_CACHE_TTL):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)")
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key=?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl is not None and created_at + self.ttl <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key=?", (key,))
+                self.stats.expirations += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access=? WHERE key=?", (now, key))
+            return value
+
+    def _set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._writes += 1
+            if self._writes % self.TRIM_EVERY == 0:
+                self._trim()
+
+    def _trim(self):
+        # Amortised size bound: COUNT(*) is a table scan, so only check every TRIM_EVERY writes
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                (overflow,),
+            )
+            self.stats.evictions += overflow
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+
+# ----------------------------
+# Shared instance
+# ----------------------------
+_response_cache: ResponseCache | None = None
+_response_cache_ready = False
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Process-wide cache selected by LLM_CACHE_BACKEND (None when caching is off)."""
+    global _response_cache, _response_cache_ready
+    if not _response_cache_ready:
+        if LLM_CACHE_BACKEND == "sqlite":
+            _response_cache = SQLiteResponseCache()
+        elif LLM_CACHE_BACKEND == "memory":
+            _response_cache = MemoryResponseCache()
+        else:
+            _response_cache = None
+        _response_cache_ready = True
+    return _response_cache
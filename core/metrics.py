@@ -0,0 +1,259 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+
+# ----------------------------
+# Config
+# ----------------------------
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# seconds; covers a cached SQLite read up to a slow LLM completion
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# ----------------------------
+# Metric types
+# ----------------------------
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _new_child(self):
+        ...
+
+    def labels(self, *values):
+        """The time series for these label values (created on first use). Hot paths keep the result."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _series(self):
+        """Series that have seen data (hot paths pre-create their children)."""
+        return [(values, child) for values, child in list(self._children.items())
+                if getattr(child, "count", getattr(child, "value", 0))]
+
+    @abstractmethod
+    def render(self) -> list[str]:
+        ...
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def render(self) -> list[str]:
+        return [f"{self.name}{_label_text(self.labelnames, values)} {child.value:g}"
+                for values, child in self._series()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def render(self) -> list[str]:
+        lines = []
+        for values, child in self._series():
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, values)} {total:.9g}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ----------------------------
+# InsurAI metrics
+# ----------------------------
+graph_node_seconds = REGISTRY.histogram(
+    "insurai_graph_node_seconds", "Time in a LangGraph node, per run (an ask() ends the run as 'interrupted').",
+    ("graph", "node", "outcome"),
+)
+llm_request_seconds = REGISTRY.histogram(
+    "insurai_llm_request_seconds", "DialClient calls to the LLM provider, start to last byte.",
+    ("operation", "model", "outcome"),
+)
+llm_first_token_seconds = REGISTRY.histogram(
+    "insurai_llm_first_token_seconds", "Streamed chat completions: time to the first content token.", ("model",),
+)
+llm_tokens = REGISTRY.counter(
+    "insurai_llm_tokens_total", "Tokens reported in LLM response usage.", ("operation", "model", "type"),
+)
+llm_cache_hits = REGISTRY.counter(
+    "insurai_llm_cache_hits_total", "DialClient chat calls answered from the response cache.", ("operation",),
+)
+db_seconds = REGISTRY.histogram(
+    "insurai_db_seconds", "Time a pooled SQLite connection is held, per connection() / transaction() block.",
+    ("kind", "outcome"),
+)
+db_lock_wait_seconds = REGISTRY.histogram(
+    "insurai_db_lock_wait_seconds", "Waiting for the SQLite write lock (BEGIN IMMEDIATE).",
+)
+db_call_seconds = REGISTRY.histogram(
+    "insurai_db_call_seconds", "run_db() calls from async code, including the wait for a worker thread.",
+    ("function",),
+)
+sms_send_seconds = REGISTRY.histogram(
+    "insurai_sms_send_seconds", "SMS provider send() calls on the dispatcher workers.", ("outcome",),
+)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# ----------------------------
+# Timers
+# ----------------------------
+def timed_node(graph: str, node: str, fn):
+    """
+    Wrap a graph node so each run lands in insurai_graph_node_seconds.
+    Sync nodes stay sync and async nodes async, so LangGraph runs them as before.
+    """
+    if not METRICS_ENABLED:
+        return fn
+    from langgraph.errors import GraphBubbleUp   # interrupts (ask) and other control flow
+
+    ok, interrupted, error = (graph_node_seconds.labels(graph, node, o) for o in ("ok", "interrupted", "error"))
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def run_async(state):
+            start = time.perf_counter()
+            try:
+                result = await fn(state)
+            except GraphBubbleUp:
+                interrupted.observe(time.perf_counter() - start)
+                raise
+            except BaseException:
+                error.observe(time.perf_counter() - start)
+                raise
+            ok.observe(time.perf_counter() - start)
+            return result
+        return run_async
+
+    @functools.wraps(fn)
+    def run(state):
+        start = time.perf_counter()
+        try:
+            result = fn(state)
+        except GraphBubbleUp:
+            interrupted.observe(time.perf_counter() - start)
+            raise
+        except BaseException:
+            error.observe(time.perf_counter() - start)
+            raise
+        ok.observe(time.perf_counter() - start)
+        return result
+    return run
+
+
+def observe_llm(operation: str, model: str, start: float, outcome: str = "ok", usage=None):
+    """Record one provider call; `usage` is the response's usage object (if any)."""
+    if not METRICS_ENABLED:
+        return
+    llm_request_seconds.labels(operation, model, outcome).observe(time.perf_counter() - start)
+    if usage is not None:
+        for kind in ("prompt_tokens", "completion_tokens"):
+            tokens = getattr(usage, kind, None)
+            if tokens:
+                llm_tokens.labels(operation, model, kind.split("_")[0]).inc(tokens)
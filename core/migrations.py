@@ -0,0 +1,269 @@
+import sqlite3
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: tuple[str, ...]
+
+
+# ----------------------------
+# Migrations (append only - never edit one that has shipped)
+# ----------------------------
+MIGRATIONS = [
+    Migration(1, "base schema", (
+        # Users
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            phone TEXT NOT NULL UNIQUE
+        )
+        """,
+        # Company Policies
+        """
+        CREATE TABLE IF NOT EXISTS policies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL,          -- 'health' or 'vehicle'
+            premium REAL NOT NULL,
+            benefits TEXT NOT NULL,
+            coverage_limit REAL NOT NULL,
+            is_custom INTEGER DEFAULT 0,
+            is_active INTEGER DEFAULT 1
+        )
+        """,
+        # User Health Insurance
+        """
+        CREATE TABLE IF NOT EXISTS user_health_insurance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            policy_id INTEGER NOT NULL,
+            start_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            end_date TEXT,
+            status TEXT DEFAULT 'active',
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(policy_id) REFERENCES policies(id)
+        )
+        """,
+        # User Vehicle Insurance
+        """
+        CREATE TABLE IF NOT EXISTS user_vehicle_insurance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            policy_id INTEGER NOT NULL,
+            number_plate TEXT NOT NULL,
+            vehicle_type TEXT NOT NULL,
+            brand_model TEXT,
+            age INTEGER,
+            kms_driven INTEGER,
+            wheels INTEGER,
+            start_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            end_date TEXT,
+            status TEXT DEFAULT 'active',
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(policy_id) REFERENCES policies(id)
+        )
+        """,
+        # Claims
+        """
+        CREATE TABLE IF NOT EXISTS claims (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            claim_number TEXT UNIQUE,
+            user_id INTEGER NOT NULL,
+            insurance_type TEXT NOT NULL,
+            insurance_ref_id INTEGER NOT NULL,
+            claim_reason TEXT,
+            document_text TEXT,
+            document_info TEXT,
+            claim_amount REAL,
+            reimbursement REAL,
+            status TEXT DEFAULT 'initiated',
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+        """,
+    )),
+    Migration(2, "claim lookup covering index", (
+        # show_existing_claims: WHERE insurance_type=? AND insurance_ref_id=?, answered from the index alone
+        """
+        CREATE INDEX IF NOT EXISTS idx_claims_insurance
+        ON claims(insurance_type, insurance_ref_id, claim_number, claim_amount, claim_reason, status)
+        """,
+    )),
+    Migration(3, "insurance join indexes", (
+        "CREATE INDEX IF NOT EXISTS idx_uhi_user ON user_health_insurance(user_id, policy_id, status)",
+        "CREATE INDEX IF NOT EXISTS idx_uhi_policy ON user_health_insurance(policy_id)",
+        "CREATE INDEX IF NOT EXISTS idx_uvi_user ON user_vehicle_insurance(user_id, policy_id, status)",
+        "CREATE INDEX IF NOT EXISTS idx_uvi_policy ON user_vehicle_insurance(policy_id)",
+        "CREATE INDEX IF NOT EXISTS idx_claims_user ON claims(user_id)",
+    )),
+    Migration(4, "status filter indexes", (
+        "CREATE INDEX IF NOT EXISTS idx_claims_status ON claims(status, insurance_type)",
+        "CREATE INDEX IF NOT EXISTS idx_uhi_status ON user_health_insurance(status)",
+        "CREATE INDEX IF NOT EXISTS idx_uvi_status ON user_vehicle_insurance(status)",
+        "CREATE INDEX IF NOT EXISTS idx_policies_type_active ON policies(type, is_active)",
+    )),
+    Migration(5, "per-year claim number sequences", (
+        """
+        CREATE TABLE IF NOT EXISTS claim_sequences (
+            year INTEGER PRIMARY KEY,
+            next_value INTEGER NOT NULL
+        )
+        """,
+        # continue after the numbers already issued (CLM-YYYY-NNNNN)
+        """
+        INSERT OR IGNORE INTO claim_sequences (year, next_value)
+        SELECT CAST(substr(claim_number, 5, 4) AS INTEGER), MAX(CAST(substr(claim_number, 10) AS INTEGER)) + 1
+        FROM claims
+        WHERE claim_number LIKE 'CLM-____-%'
+        GROUP BY 1
+        """,
+    )),
+    Migration(6, "email outbox", (
+        """
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_email TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            html TEXT NOT NULL,
+            attachments TEXT,                          -- JSON list of {filename, content (base64), type}
+            status TEXT NOT NULL DEFAULT 'queued',     -- queued | sending | sent | failed
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            lease_until REAL,
+            provider_id TEXT,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(status, next_attempt_at)",
+    )),
+    Migration(7, "shared otp store", (
+        """
+        CREATE TABLE IF NOT EXISTS otp_codes (
+            phone TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,                      -- sha256(phone:code), never the code itself
+            attempts INTEGER NOT NULL DEFAULT 0,
+            expires_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS otp_rate (
+            phone TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            window_ends REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_otp_codes_expiry ON otp_codes(expires_at)",
+        "CREATE INDEX IF NOT EXISTS idx_otp_rate_expiry ON otp_rate(window_ends)",
+    )),
+    Migration(8, "shared api sessions", (
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            namespace TEXT NOT NULL,                   -- support | onboarding
+            session_id TEXT NOT NULL,
+            data TEXT NOT NULL,                        -- JSON state
+            expires_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (namespace, session_id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sessions_expiry ON sessions(namespace, expires_at)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_lru ON sessions(namespace, updated_at)",
+    )),
+    Migration(9, "claim document validation memo", (
+        """
+        CREATE TABLE IF NOT EXISTS document_validations (
+            claim_type TEXT NOT NULL,
+            doc_hash TEXT NOT NULL,                    -- sha256 of the normalized document text
+            result TEXT NOT NULL,                      -- validator reply, 'YES | ...' or 'NO'
+            created_at REAL NOT NULL,
+            PRIMARY KEY (claim_type, doc_hash)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_document_validations_age ON document_validations(created_at)",
+    )),
+    Migration(10, "llm token usage ledger", (
+        """
+        CREATE TABLE IF NOT EXISTS llm_usage (
+            day TEXT NOT NULL,                         -- UTC date, YYYY-MM-DD
+            session_id TEXT NOT NULL,                  -- '' outside a conversation
+            agent TEXT NOT NULL,                       -- support | onboarding | claims | ''
+            endpoint TEXT NOT NULL,                    -- 'POST /claims/claims/next', ...
+            call_site TEXT NOT NULL,                   -- 'support.generate_response', ...
+            model TEXT NOT NULL,
+            calls INTEGER NOT NULL,
+            prompt_tokens INTEGER NOT NULL,
+            completion_tokens INTEGER NOT NULL,
+            estimated_calls INTEGER NOT NULL,          -- streams without usage: tokens estimated
+            cost_usd REAL NOT NULL,
+            PRIMARY KEY (day, session_id, agent, endpoint, call_site, model)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_llm_usage_session ON llm_usage(session_id)",
+    )),
+    Migration(11, "claim history keyset index", (
+        # claims_store.claim_history: WHERE insurance_type=? AND insurance_ref_id=?
+        # AND (created_at, id) > cursor ORDER BY created_at, id LIMIT n - a range
+        # seek plus n row lookups, however many claims the insurance has
+        """
+        CREATE INDEX IF NOT EXISTS idx_claims_history
+        ON claims(insurance_type, insurance_ref_id, created_at, id)
+        """,
+        # only the old fetch-all listing read the covering index
+        "DROP INDEX IF EXISTS idx_claims_insurance",
+    )),
+]
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+def _ensure_version_table(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    _ensure_version_table(conn)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: int | None = None) -> list[int]:
+    """
+    Apply pending migrations in order, each in its own IMMEDIATE transaction,
+    and record them in schema_version. Safe to run from several workers at
+    once: the version is re-checked after taking the write lock. A schema
+    that is already current costs one read and no write lock.
+    Returns the versions applied by this call.
+    """
+    wanted = [m for m in sorted(MIGRATIONS, key=lambda m: m.version) if target is None or m.version <= target]
+    if not wanted or current_version(conn) >= wanted[-1].version:
+        return []
+    applied = []
+    for m in wanted:
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute("SELECT 1 FROM schema_version WHERE version=?", (m.version,)).fetchone()
+            if not done:
+                for sql in m.statements:
+                    conn.execute(sql)
+                conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (m.version, m.name))
+                applied.append(m.version)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return applied
@@ -1,41 +1,16 @@
-import os
-import random
-from dotenv import load_dotenv
-from twilio.rest import Client
+from core.otp_store import get_otp_store, OtpRateLimited
+from core.sms_service import get_sms_dispatcher
 
-load_dotenv()
 
-# Load Twilio credentials
-TWILIO_SID = os.getenv("TWILIO_SID")
-TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
-TWILIO_PHONE = os.getenv("TWILIO_PHONE")  # Your Twilio phone number
-
-# In-memory OTP store (for demo, should use Redis in production)
-otp_store = {}
-
-def send_otp(phone: str) -> int:
-    """Generate OTP and send via SMS using Twilio."""
-    if not TWILIO_SID or not TWILIO_AUTH_TOKEN or not TWILIO_PHONE:
-        raise ValueError("Twilio credentials not set in .env")
-
-    otp = random.randint(100000, 999999)
-    otp_store[phone] = otp  # store OTP temporarily
-
-    client = Client(TWILIO_SID, TWILIO_AUTH_TOKEN)
-    message = client.messages.create(
-        body=f"Your Insurance Claim OTP is {otp}",
-        from_=TWILIO_PHONE,
-        to=phone
-    )
-    # print(f"[DEBUG] OTP {otp} sent to {phone}, SID={message.sid}")
-    return otp
+def send_otp(phone: str, on_status=None) -> str:
+    """
+    Generate and store an OTP, then queue the SMS (see core.sms_service) and
+    return at once. Returns the SMS job id for delivery status; raises
+    OtpRateLimited when the phone asked too often.
+    """
+    otp = get_otp_store().issue(phone)  # TTL-bound, rate limited (see core.otp_store)
+    return get_sms_dispatcher().dispatch(phone, f"Your Insurance Claim OTP is {otp}", on_status=on_status)
 
 def verify_otp(user_input: str, phone: str) -> bool:
-    """Verify OTP entered by user against stored OTP."""
-    try:
-        expected = otp_store.get(phone)
-        return expected is not None and str(expected) == str(user_input)
-    finally:
-        # Always delete OTP after check (one-time use)
-        if phone in otp_store:
-            del otp_store[phone]
+    """Verify OTP entered by user; a code works once and is dropped after too many wrong tries."""
+    return get_otp_store().verify(phone, user_input)
@@ -0,0 +1,331 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from core.db import transaction
+from core.ttl_lru import TTLLRUCache
+
+# ----------------------------
+# Config
+# ----------------------------
+OTP_BACKEND = os.getenv("OTP_BACKEND", "memory")          # memory | sqlite | redis
+OTP_REDIS_URL = os.getenv("OTP_REDIS_URL", "redis://localhost:6379/0")
+OTP_TTL = float(os.getenv("OTP_TTL", "300"))               # seconds an OTP stays valid
+OTP_MAX_ENTRIES = int(os.getenv("OTP_MAX_ENTRIES", "100000"))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))  # wrong guesses before the OTP is burnt
+OTP_RATE_LIMIT = int(os.getenv("OTP_RATE_LIMIT", "5"))      # OTPs per phone ...
+OTP_RATE_WINDOW = float(os.getenv("OTP_RATE_WINDOW", "600"))  # ... per this many seconds
+OTP_SWEEP_INTERVAL = float(os.getenv("OTP_SWEEP_INTERVAL", "60"))
+OTP_DIGITS = 6
+
+
+class OtpRateLimited(Exception):
+    """Too many OTPs requested for one phone inside OTP_RATE_WINDOW."""
+
+
+def generate_code(digits: int = OTP_DIGITS) -> str:
+    return str(secrets.randbelow(9 * 10 ** (digits - 1)) + 10 ** (digits - 1))
+
+
+def code_digest(phone: str, code: str) -> str:
+    # codes are never stored in clear text in the shared backends
+    return hashlib.sha256(f"{phone}:{code}".encode("utf-8")).hexdigest()
+
+
+class OtpStore(ABC):
+    """
+    One-time passwords keyed by phone number.
+    issue() enforces the per-phone rate limit and replaces any previous code;
+    verify() succeeds at most once per code, and a code is discarded after
+    max_attempts wrong guesses or when its TTL runs out.
+    """
+
+    def __init__(self, ttl: float = OTP_TTL, max_attempts: int = OTP_MAX_ATTEMPTS,
+                 rate_limit: int = OTP_RATE_LIMIT, rate_window: float = OTP_RATE_WINDOW):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+
+    @abstractmethod
+    def issue(self, phone: str) -> str:
+        ...
+
+    @abstractmethod
+    def verify(self, phone: str, code: str) -> bool:
+        ...
+
+    def close(self):
+        pass
+
+
+# ----------------------------
+# In-process backend
+# ----------------------------
+class MemoryOtpStore(OtpStore):
+    """Single-process store: bounded TTL/LRU maps plus a background sweeper thread."""
+
+    def __init__(self, max_entries: int = OTP_MAX_ENTRIES, sweep_interval: float = OTP_SWEEP_INTERVAL, **kwargs):
+        super().__init__(**kwargs)
+        self._codes = TTLLRUCache(max_size=max_entries, ttl=self.ttl)          # phone -> [digest, attempts]
+        self._issued = TTLLRUCache(max_size=max_entries, ttl=self.rate_window)  # phone -> [count]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = None
+        if sweep_interval:
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,),
+                                             name="otp-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            self.sweep()
+
+    def sweep(self) -> int:
+        return self._codes.sweep() + self._issued.sweep()
+
+    def issue(self, phone: str) -> str:
+        with self._lock:
+            window = self._issued.get(phone)
+            if window is None:
+                # the window starts at the first OTP and expires with its entry
+                self._issued.set(phone, [1])
+            elif window[0] >= self.rate_limit:
+                raise OtpRateLimited(phone)
+            else:
+                window[0] += 1
+            code = generate_code()
+            self._codes.set(phone, [code_digest(phone, code), 0])
+        return code
+
+    def verify(self, phone: str, code: str) -> bool:
+        with self._lock:
+            entry = self._codes.get(phone)
+            if entry is None:
+                return False
+            if hmac.compare_digest(entry[0], code_digest(phone, str(code).strip())):
+                self._codes.pop(phone)
+                return True
+            entry[1] += 1
+            if entry[1] >= self.max_attempts:
+                self._codes.pop(phone)
+            return False
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def close(self):
+        self._stop.set()
+
+
+# ----------------------------
+# Shared backends (verify across worker processes)
+# ----------------------------
+class SQLiteOtpStore(OtpStore):
+    """
+    OTPs in the main database (otp_codes / otp_rate tables), so any uvicorn
+    worker can verify a code another one issued. Expired rows are removed by
+    sweep(), which issue() runs every `sweep_every` calls.
+    """
+
+    def __init__(self, sweep_every: int = 500, **kwargs):
+        super().__init__(**kwargs)
+        self.sweep_every = sweep_every
+        self._issues = 0
+
+    def _write(self, fn):
+        with transaction(immediate=True) as conn:
+            return fn(conn, time.time())
+
+    def sweep(self) -> int:
+        def run(conn, now):
+            removed = conn.execute("DELETE FROM otp_codes WHERE expires_at<=?", (now,)).rowcount
+            removed += conn.execute("DELETE FROM otp_rate WHERE window_ends<=?", (now,)).rowcount
+            return removed
+        return self._write(run)
+
+    def issue(self, phone: str) -> str:
+        code = generate_code()
+
+        def run(conn, now):
+            row = conn.execute("SELECT count, window_ends FROM otp_rate WHERE phone=?", (phone,)).fetchone()
+            if row is None or row[1] <= now:
+                conn.execute("INSERT OR REPLACE INTO otp_rate (phone, count, window_ends) VALUES (?, 1, ?)",
+                             (phone, now + self.rate_window))
+            elif row[0] >= self.rate_limit:
+                raise OtpRateLimited(phone)
+            else:
+                conn.execute("UPDATE otp_rate SET count=count+1 WHERE phone=?", (phone,))
+            conn.execute("INSERT OR REPLACE INTO otp_codes (phone, digest, attempts, expires_at) VALUES (?, ?, 0, ?)",
+                         (phone, code_digest(phone, code), now + self.ttl))
+
+        self._write(run)
+        self._issues += 1
+        if self.sweep_every and self._issues % self.sweep_every == 0:
+            self.sweep()
+        return code
+
+    def verify(self, phone: str, code: str) -> bool:
+        def run(conn, now):
+            row = conn.execute("SELECT digest, attempts, expires_at FROM otp_codes WHERE phone=?", (phone,)).fetchone()
+            if row is None:
+                return False
+            digest, attempts, expires_at = row
+            if expires_at <= now:
+                conn.execute("DELETE FROM otp_codes WHERE phone=?", (phone,))
+                return False
+            if hmac.compare_digest(digest, code_digest(phone, str(code).strip())):
+                conn.execute("DELETE FROM otp_codes WHERE phone=?", (phone,))
+                return True
+            if attempts + 1 >= self.max_attempts:
+                conn.execute("DELETE FROM otp_codes WHERE phone=?", (phone,))
+            else:
+                conn.execute("UPDATE otp_codes SET attempts=attempts+1 WHERE phone=?", (phone,))
+            return False
+        return self._write(run)
+
+
+class RedisOtpStore(OtpStore):
+    """
+    OTPs in Redis (or anything speaking its protocol through a redis-py style
+    client). Keys carry their own TTL, so nothing needs sweeping. One-time use
+    across workers comes from DEL: only the caller that actually deletes the
+    key gets True. The rate and tries counters' INCR and EXPIRE NX go in one
+    MULTI, so a counter can never be left without a TTL (EXPIRE NX needs Redis 7).
+    """
+
+    def __init__(self, client, prefix: str = "otp", **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, kind: str, phone: str) -> str:
+        return f"{self.prefix}:{kind}:{phone}"
+
+    def issue(self, phone: str) -> str:
+        rate_key = self._key("rate", phone)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.incr(rate_key)
+        pipe.expire(rate_key, int(self.rate_window), nx=True)   # starts the window; a no-op inside it
+        count, _ = pipe.execute()
+        if count > self.rate_limit:
+            raise OtpRateLimited(phone)
+        code = generate_code()
+        ttl = int(self.ttl)
+        self.client.set(self._key("code", phone), code_digest(phone, code), ex=ttl)
+        self.client.set(self._key("tries", phone), 0, ex=ttl)
+        return code
+
+    def verify(self, phone: str, code: str) -> bool:
+        code_key, tries_key = self._key("code", phone), self._key("tries", phone)
+        digest = self.client.get(code_key)
+        if digest is None:
+            return False
+        if isinstance(digest, bytes):
+            digest = digest.decode("utf-8")
+        if hmac.compare_digest(digest, code_digest(phone, str(code).strip())):
+            return self.client.delete(code_key) == 1
+        pipe = self.client.pipeline(transaction=True)
+        pipe.incr(tries_key)
+        pipe.expire(tries_key, int(self.ttl), nx=True)   # in case the code (and its counter) expired just now
+        tries, _ = pipe.execute()
+        if tries >= self.max_attempts:
+            self.client.delete(code_key, tries_key)
+        return False
+
+    def close(self):
+        close = getattr(self.client, "close", None)
+        if close:
+            close()
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the handful of redis-py calls RedisOtpStore makes
+    (get / set ex / incr / expire nx / delete / pipeline), for offline runs and benchmarks.
+    """
+
+    def __init__(self):
+        self._data: dict = {}
+        self._lock = threading.RLock()
+
+    def pipeline(self, transaction: bool = True):
+        return LocalRedisPipeline(self)
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            return None if entry is None else str(entry[0]).encode("utf-8")
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def incr(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            value = int(entry[0]) + 1 if entry else 1
+            self._data[key] = (value, entry[1] if entry else None)
+            return value
+
+    def expire(self, key, seconds, nx: bool = False):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is None or (nx and entry[1] is not None):
+                return False
+            self._data[key] = (entry[0], time.monotonic() + seconds)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            now = time.monotonic()
+            return sum(1 for k in keys if self._live(k, now) is not None and self._data.pop(k, None) is not None)
+
+
+class LocalRedisPipeline:
+    """MULTI/EXEC for LocalRedis: queued commands run together under its lock."""
+
+    def __init__(self, redis: LocalRedis):
+        self._redis = redis
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._redis, name)
+        return lambda *args, **kwargs: self._commands.append((method, args, kwargs))
+
+    def execute(self) -> list:
+        with self._redis._lock:
+            results = [method(*args, **kwargs) for method, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+
+_otp_store: OtpStore | None = None
+_otp_store_lock = threading.Lock()
+
+
+def get_otp_store() -> OtpStore:
+    """Process-wide store selected by OTP_BACKEND."""
+    global _otp_store
+    if _otp_store is None:
+        with _otp_store_lock:
+            if _otp_store is None:
+                if OTP_BACKEND == "sqlite":
+                    _otp_store = SQLiteOtpStore()
+                elif OTP_BACKEND == "redis":
+                    import redis   # optional dependency, only needed for this backend
+                    _otp_store = RedisOtpStore(redis.Redis.from_url(OTP_REDIS_URL))
+                else:
+                    _otp_store = MemoryOtpStore()
+    return _otp_store
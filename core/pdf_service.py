@@ -0,0 +1,278 @@
+import atexit
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import AsyncIterator
+
+# ----------------------------
+# Config
+# ----------------------------
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(20 * 1024 * 1024)))   # upload size cap
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+PDF_MAX_TEXT_CHARS = int(os.getenv("PDF_MAX_TEXT_CHARS", "24000"))        # text handed to the validator
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+PDF_POOL_MIN_PAGES = int(os.getenv("PDF_POOL_MIN_PAGES", "8"))            # shorter documents extract in-process
+PDF_UPLOAD_DIR = os.getenv("PDF_UPLOAD_DIR") or None                      # temp dir for uploads (default: system tmp)
+
+MAX_PART_HEADER_BYTES = 16 * 1024
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class PdfTooLarge(Exception):
+    """The upload is over PDF_MAX_BYTES or the document over PDF_MAX_PAGES."""
+
+
+class InvalidPdf(Exception):
+    """The upload is not a readable (unencrypted) PDF."""
+
+
+@dataclass
+class PdfUpload:
+    path: str                 # temp file on disk; remove with discard()
+    filename: str | None
+    size: int
+    fields: dict              # other (small) form fields sent with the file
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+@dataclass
+class PdfText:
+    filename: str | None
+    pages: int
+    bytes: int
+    text: str
+    truncated: bool
+
+    def summary(self) -> dict:
+        info = asdict(self)
+        info["chars"] = len(info.pop("text"))
+        return info
+
+
+# ---------------------------
+# Streaming upload
+# ---------------------------
+def _header_params(value: str) -> dict:
+    """'form-data; name="file"; filename="bill.pdf"' -> {"name": "file", "filename": "bill.pdf"}"""
+    params = {}
+    for part in value.split(";")[1:]:
+        key, _, val = part.strip().partition("=")
+        params[key.lower()] = val.strip().strip('"')
+    return params
+
+
+class _MultipartReader:
+    """
+    Incremental multipart/form-data parser: feed() body chunks as they
+    arrive. The first file part is written to `sink` as it streams past;
+    other parts are kept as small text fields. Only the tail of the buffer
+    that could still hold a split boundary is carried between chunks.
+    """
+
+    def __init__(self, boundary: bytes, sink, max_bytes: int):
+        # the first boundary has no CRLF before it; feeding one makes every delimiter alike
+        self.delimiter = b"\r\n--" + boundary
+        self.sink = sink
+        self.max_bytes = max_bytes
+        self.buffer = bytearray(b"\r\n")
+        self.state = "preamble"
+        self.part = None          # "file" | field name | None (skipped)
+        self.field = bytearray()
+        self.fields: dict = {}
+        self.filename = None
+        self.file_bytes = 0
+        self.file_seen = False
+
+    def feed(self, chunk: bytes):
+        self.buffer += chunk
+        while self._step():
+            pass
+
+    def _step(self) -> bool:
+        if self.state == "preamble":
+            idx = self.buffer.find(self.delimiter)
+            if idx < 0:
+                del self.buffer[:max(0, len(self.buffer) - len(self.delimiter))]
+                return False
+            del self.buffer[:idx + len(self.delimiter)]
+            self.state = "after_boundary"
+            return True
+
+        if self.state == "after_boundary":
+            if len(self.buffer) < 2:
+                return False
+            if self.buffer[:2] == b"--":
+                self.state = "done"
+                return False
+            del self.buffer[:2]   # CRLF
+            self.state = "headers"
+            return True
+
+        if self.state == "headers":
+            idx = self.buffer.find(b"\r\n\r\n")
+            if idx < 0:
+                if len(self.buffer) > MAX_PART_HEADER_BYTES:
+                    raise InvalidPdf("multipart part headers too large")
+                return False
+            headers = {}
+            for line in bytes(self.buffer[:idx]).decode("utf-8", "replace").split("\r\n"):
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            del self.buffer[:idx + 4]
+            params = _header_params(headers.get("content-disposition", ""))
+            if "filename" in params and not self.file_seen:
+                self.part, self.filename, self.file_seen = "file", params["filename"] or None, True
+            elif "filename" in params:
+                self.part = None   # one document per upload
+            else:
+                self.part = params.get("name")
+                self.field = bytearray()
+            self.state = "body"
+            return True
+
+        if self.state == "body":
+            idx = self.buffer.find(self.delimiter)
+            end = idx if idx >= 0 else max(0, len(self.buffer) - len(self.delimiter) + 1)
+            if end:
+                self._consume(self.buffer[:end])
+                del self.buffer[:end]
+            if idx < 0:
+                return False
+            del self.buffer[:len(self.delimiter)]
+            if self.part not in (None, "file"):
+                self.fields[self.part] = self.field.decode("utf-8", "replace")
+            self.state = "after_boundary"
+            return True
+
+        return False
+
+    def _consume(self, data: bytes):
+        if self.part == "file":
+            self.file_bytes += len(data)
+            if self.file_bytes > self.max_bytes:
+                raise PdfTooLarge(f"upload exceeds {self.max_bytes} bytes")
+            self.sink.write(data)
+        elif self.part is not None:
+            if len(self.field) + len(data) > MAX_FIELD_BYTES:
+                raise InvalidPdf(f"form field {self.part!r} too large")
+            self.field += data
+
+
+async def receive_pdf_upload(chunks: AsyncIterator[bytes], content_type: str,
+                             max_bytes: int = PDF_MAX_BYTES) -> PdfUpload:
+    """
+    Stream a PDF upload to a temp file - either a multipart/form-data body
+    (first file part) or a raw application/pdf body. Never holds more than
+    one chunk in memory and stops reading as soon as max_bytes is passed.
+    """
+    sink = tempfile.NamedTemporaryFile(suffix=".pdf", dir=PDF_UPLOAD_DIR, delete=False)
+    upload = PdfUpload(path=sink.name, filename=None, size=0, fields={})
+    try:
+        with sink:
+            if content_type.startswith("multipart/form-data"):
+                boundary = _header_params(content_type).get("boundary")
+                if not boundary:
+                    raise InvalidPdf("multipart body without a boundary")
+                reader = _MultipartReader(boundary.encode("latin-1"), sink, max_bytes)
+                async for chunk in chunks:
+                    reader.feed(chunk)
+                if not reader.file_seen:
+                    raise InvalidPdf("no file part in the upload")
+                if reader.state != "done":
+                    raise InvalidPdf("truncated multipart body")
+                upload.filename, upload.size, upload.fields = reader.filename, reader.file_bytes, reader.fields
+            else:
+                async for chunk in chunks:
+                    upload.size += len(chunk)
+                    if upload.size > max_bytes:
+                        raise PdfTooLarge(f"upload exceeds {max_bytes} bytes")
+                    sink.write(chunk)
+        with open(upload.path, "rb") as f:
+            if f.read(5) != b"%PDF-":
+                raise InvalidPdf("not a PDF file")
+    except BaseException:
+        upload.discard()
+        raise
+    return upload
+
+
+# ---------------------------
+# Text extraction (process pool)
+# ---------------------------
+def _open(path: str):
+    from PyPDF2 import PdfReader   # deferred until the first document upload
+    from PyPDF2.errors import PdfReadError
+    try:
+        reader = PdfReader(path)
+        if reader.is_encrypted:
+            raise InvalidPdf("encrypted PDFs are not supported")
+        return reader
+    except PdfReadError as e:
+        raise InvalidPdf(f"unreadable PDF: {e}") from e
+
+
+def _extract_pages(path: str, start: int, stop: int) -> list[str]:
+    reader = _open(path)
+    texts = []
+    for i in range(start, stop):
+        try:
+            texts.append(reader.pages[i].extract_text() or "")
+        except Exception:
+            texts.append("")   # one broken page should not sink the document
+    return texts
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS)
+                atexit.register(shutdown_extract_pool)
+    return _pool
+
+
+def shutdown_extract_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def extract_pdf_text(path: str, filename: str | None = None, max_pages: int = PDF_MAX_PAGES,
+                     max_chars: int = PDF_MAX_TEXT_CHARS, workers: int | None = None) -> PdfText:
+    """
+    Text of a PDF on disk, page by page. Documents of PDF_POOL_MIN_PAGES or
+    more are split into page ranges across the process pool; each worker
+    opens the file itself, so no PDF bytes are pickled between processes.
+    """
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    pages = len(_open(path).pages)
+    if pages > max_pages:
+        raise PdfTooLarge(f"document has {pages} pages, the limit is {max_pages}")
+
+    if workers <= 1 or pages < PDF_POOL_MIN_PAGES:
+        texts = _extract_pages(path, 0, pages)
+    else:
+        step = -(-pages // workers)
+        ranges = [(start, min(pages, start + step)) for start in range(0, pages, step)]
+        pool = _get_pool()
+        futures = [pool.submit(_extract_pages, path, start, stop) for start, stop in ranges]
+        texts = [t for f in futures for t in f.result()]
+
+    text = "\n\n".join(t.strip() for t in texts if t.strip())
+    truncated = len(text) > max_chars
+    return PdfText(filename=filename, pages=pages, bytes=os.path.getsize(path),
+                   text=text[:max_chars] if truncated else text, truncated=truncated)
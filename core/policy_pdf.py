@@ -0,0 +1,101 @@
+import atexit
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# ----------------------------
+# Config
+# ----------------------------
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(os.cpu_count() or 2)))
+PDF_BATCH_MIN = int(os.getenv("PDF_BATCH_MIN", "32"))   # smaller batches render in-process
+
+POLICY_PDF_FIELDS = ("user_name", "policy_name", "premium", "coverage", "benefits", "insurance_type")
+
+
+# ---------------------------
+# Template
+# ---------------------------
+def _build_template():
+    """The static part of every policy document: page, fonts and title block."""
+    from fpdf import FPDF   # deferred until the first policy is rendered
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 16)
+
+    pdf.cell(200, 10, "InsurAI Insurance Policy Document", ln=True, align="C")
+    pdf.ln(10)
+    return pdf
+
+
+# Snapshot of the laid-out template, taken on first use; unpickling it is cheaper than
+# rebuilding the document (and, unlike a shared FPDF object, safe to use from any thread).
+_TEMPLATE: bytes | None = None
+
+
+def _template() -> bytes:
+    global _TEMPLATE
+    if _TEMPLATE is None:
+        _TEMPLATE = pickle.dumps(_build_template(), protocol=pickle.HIGHEST_PROTOCOL)
+    return _TEMPLATE
+
+
+def render_policy_pdf(user_name, policy_name, premium, coverage, benefits, insurance_type) -> bytes:
+    """Render one policy document in memory and return the PDF bytes."""
+    pdf = pickle.loads(_template())
+
+    pdf.set_font("Arial", "", 12)
+    pdf.cell(200, 10, f"Policy Holder: {user_name}", ln=True)
+    pdf.cell(200, 10, f"Policy Type: {insurance_type.capitalize()}", ln=True)
+    pdf.cell(200, 10, f"Policy Name: {policy_name}", ln=True)
+    pdf.cell(200, 10, f"Premium: INR {premium}/year", ln=True)
+    pdf.cell(200, 10, f"Coverage: INR {coverage}", ln=True)
+    pdf.multi_cell(200, 10, f"Benefits: {benefits}", align="L")
+
+    pdf.ln(10)
+    pdf.cell(200, 10, "This is a system-generated insurance policy.", ln=True, align="C")
+
+    # fpdf 1.x builds the document as a latin-1 str
+    out = pdf.output(dest="S")
+    return out.encode("latin-1") if isinstance(out, str) else bytes(out)
+
+
+def _render_one(doc: dict) -> bytes:
+    return render_policy_pdf(**{k: doc[k] for k in POLICY_PDF_FIELDS})
+
+
+# ---------------------------
+# Batch rendering (process pool)
+# ---------------------------
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=PDF_RENDER_WORKERS)
+                atexit.register(shutdown_render_pool)
+    return _pool
+
+
+def shutdown_render_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def render_policy_pdfs(docs: list[dict], workers: int | None = None) -> list[bytes]:
+    """
+    Render many policy documents (dicts keyed by POLICY_PDF_FIELDS), in input order.
+    Batches of PDF_BATCH_MIN or more are spread over a process pool.
+    """
+    workers = PDF_RENDER_WORKERS if workers is None else workers
+    if workers <= 1 or len(docs) < PDF_BATCH_MIN:
+        return [_render_one(d) for d in docs]
+    chunksize = max(1, len(docs) // (workers * 4))
+    return list(_get_pool().map(_render_one, docs, chunksize=chunksize))
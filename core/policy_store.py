@@ -0,0 +1,234 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+
+# ----------------------------
+# Config
+# ----------------------------
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+POLICY_STORE_PATH = os.getenv("POLICY_STORE_PATH", os.path.join(_DATA_DIR, "policies.jsonl"))
+# policies.json written by the old save_policy_json (relative to the repo root)
+LEGACY_POLICY_FILE = os.getenv(
+    "LEGACY_POLICY_FILE", os.path.join(os.path.dirname(_DATA_DIR), "policies.json")
+)
+POLICY_FSYNC_BATCH = int(os.getenv("POLICY_FSYNC_BATCH", "32"))            # records per fsync
+POLICY_FSYNC_INTERVAL = float(os.getenv("POLICY_FSYNC_INTERVAL", "1.0"))   # max seconds between fsyncs
+
+
+def normalize_phone(phone) -> str:
+    return "".join(ch for ch in str(phone or "") if ch.isdigit() or ch == "+")
+
+
+def normalize_email(email) -> str:
+    return str(email or "").strip().lower()
+
+
+class PolicyStore:
+    """
+    Append-only JSON Lines book of issued policies.
+    - every sale is one appended line (O_APPEND, single write), so cost stays
+      constant as the file grows and concurrent writers never lose records
+    - fsync is batched: after POLICY_FSYNC_BATCH records or POLICY_FSYNC_INTERVAL
+      seconds, whichever comes first (append(..., durable=True) forces one);
+      a flusher thread syncs the tail of a burst once the interval has passed
+    - phone and email lookups use in-memory byte-offset indexes; lines appended
+      by other processes are picked up by tailing the file before each lookup
+    """
+
+    def __init__(self, path: str = POLICY_STORE_PATH, fsync_batch: int = POLICY_FSYNC_BATCH,
+                 fsync_interval: float = POLICY_FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_batch = max(1, fsync_batch)
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._by_phone: dict[str, list[int]] = {}
+        self._by_email: dict[str, list[int]] = {}
+        self._indexed_upto = 0
+        self._count = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        with self._lock:
+            self._catch_up()
+        self._stop = threading.Event()
+        if fsync_interval > 0:
+            threading.Thread(target=self._flush_loop, name="policy-store-fsync", daemon=True).start()
+
+    # ----------------------------
+    # Internals
+    # ----------------------------
+    def _index(self, offset: int, record: dict):
+        phone = normalize_phone(record.get("phone"))
+        email = normalize_email(record.get("email"))
+        if phone:
+            self._by_phone.setdefault(phone, []).append(offset)
+        if email:
+            self._by_email.setdefault(email, []).append(offset)
+        self._count += 1
+
+    def _catch_up(self):
+        """Index complete lines written since the last scan (by us or another process)."""
+        size = os.fstat(self._fd).st_size
+        if size <= self._indexed_upto:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._indexed_upto)
+            offset = self._indexed_upto
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break   # another writer is mid-append; pick it up next time
+                if line.strip():
+                    try:
+                        self._index(offset, json.loads(line))
+                    except json.JSONDecodeError:
+                        pass
+                offset += len(line)
+            self._indexed_upto = offset
+
+    def _read_at(self, offsets: list[int]) -> list[dict]:
+        records = []
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                records.append(json.loads(f.readline()))
+        return records
+
+    def _sync(self):
+        os.fsync(self._fd)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _flush_loop(self):
+        # append() only checks the interval when the next record arrives; this
+        # covers the last records of a burst
+        while not self._stop.wait(self.fsync_interval / 2):
+            with self._lock:
+                if (self._fd is not None and self._unsynced
+                        and time.monotonic() - self._last_sync >= self.fsync_interval):
+                    try:
+                        self._sync()
+                    except OSError as e:
+                        print(f"⚠️ Policy store fsync failed: {e}")
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def append(self, record: dict, durable: bool = False) -> dict:
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            self._catch_up()
+            os.write(self._fd, line)
+            offset = os.fstat(self._fd).st_size - len(line)
+            if offset == self._indexed_upto:
+                self._index(offset, record)
+                self._indexed_upto = offset + len(line)
+            self._unsynced += 1
+            if (durable or self._unsynced >= self.fsync_batch
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+        return record
+
+    def extend(self, records: list[dict]):
+        """Append many records with one write and one fsync (used by the importer)."""
+        if not records:
+            return
+        data = b"".join(
+            (json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8") for r in records
+        )
+        with self._lock:
+            os.write(self._fd, data)
+            self._sync()
+            self._catch_up()
+
+    def find_by_phone(self, phone: str) -> list[dict]:
+        with self._lock:
+            self._catch_up()
+            offsets = list(self._by_phone.get(normalize_phone(phone), ()))
+        return self._read_at(offsets)
+
+    def find_by_email(self, email: str) -> list[dict]:
+        with self._lock:
+            self._catch_up()
+            offsets = list(self._by_email.get(normalize_email(email), ()))
+        return self._read_at(offsets)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._catch_up()
+            return self._count
+
+    def flush(self):
+        with self._lock:
+            if self._unsynced:
+                self._sync()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            if self._fd is not None:
+                if self._unsynced:
+                    self._sync()
+                os.close(self._fd)
+                self._fd = None
+
+
+@contextmanager
+def _exclusive(store: "PolicyStore"):
+    # serialise the import across worker processes (advisory lock, POSIX only)
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(store._fd, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(store._fd, fcntl.LOCK_UN)
+
+
+def import_legacy_policies(store: "PolicyStore", legacy_path: str = LEGACY_POLICY_FILE) -> int:
+    """
+    One-time import of the old policies.json array. Runs only while the store is
+    empty, so restarting never duplicates records; the legacy file is left as is.
+    """
+    if len(store) or not os.path.exists(legacy_path):
+        return 0
+    try:
+        with open(legacy_path, "r") as f:
+            records = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Skipping policy import from {legacy_path}: {e}")
+        return 0
+    if not isinstance(records, list) or not records:
+        return 0
+    with _exclusive(store):
+        if len(store):
+            return 0
+        store.extend(records)
+    print(f"✅ Imported {len(records)} policies from {legacy_path}")
+    return len(records)
+
+
+_policy_store: PolicyStore | None = None
+_policy_store_lock = threading.Lock()
+
+
+def get_policy_store() -> PolicyStore:
+    """Process-wide store at POLICY_STORE_PATH, importing policies.json on first use."""
+    global _policy_store
+    if _policy_store is None:
+        with _policy_store_lock:
+            if _policy_store is None:
+                store = PolicyStore()
+                import_legacy_policies(store)
+                atexit.register(store.close)
+                _policy_store = store
+    return _policy_store
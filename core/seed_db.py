@@ -1,18 +1,26 @@
 import os
-from core.db import DB_PATH, init_db, get_connection
+from core import db
+from core.db import init_db, pool, transaction
 
 def reset_db():
-    if os.path.exists(DB_PATH):
-        os.remove(DB_PATH)
+    pool.close_all()
+    if os.path.exists(db.DB_PATH):
+        # WAL mode keeps -wal/-shm side files next to the database
+        for path in [db.DB_PATH, db.DB_PATH + "-wal", db.DB_PATH + "-shm"]:
+            if os.path.exists(path):
+                os.remove(path)
         print("🗑️ Old database removed.")
     init_db()
     print("✅ Database schema initialized.")
 
 
 def seed_data():
-    conn = get_connection()
-    c = conn.cursor()
+    with transaction() as conn:
+        _seed(conn.cursor())
+    print("✅ Sample users, policies, and insurances seeded.")
+
 
+def _seed(c):
     # Users
     c.execute("INSERT INTO users (name, email, phone) VALUES (?, ?, ?)",
               ("Demo User", "demo@example.com", "+916301989290"))
@@ -36,10 +44,6 @@ def seed_data():
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (1, 4, "TS09AB1234", "car", "Hyundai Creta", 3, 35000, 4, "active"))
 
-    conn.commit()
-    conn.close()
-    print("✅ Sample users, policies, and insurances seeded.")
-
 
 if __name__ == "__main__":
     reset_db()
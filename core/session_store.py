@@ -0,0 +1,276 @@
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict
+from core.db import connection, transaction, init_db
+from core.ttl_lru import TTLLRUCache
+
+# ----------------------------
+# Config
+# ----------------------------
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")          # memory | sqlite
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))             # idle seconds before a session expires
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024)))   # serialized size cap per session (and its checkpointed conversation)
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))  # seconds between expired-session purges
+
+
+class SessionTooLarge(Exception):
+    """The session state is over SESSION_MAX_BYTES once serialized."""
+
+
+def encode_state(state: dict) -> str:
+    return json.dumps(state, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+@dataclass
+class SessionStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    oversize_rejections: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+# ----------------------------
+# Backends
+# ----------------------------
+class SessionStore(ABC):
+    """
+    Conversation state per session id. Every write is checked against
+    max_bytes; sessions expire `ttl` seconds after their last write and the
+    least recently used ones are evicted beyond max_sessions.
+    Callers must set() the state after changing it - backends may hand out copies.
+    Ids of expired and evicted sessions are collected for take_removed(), so
+    their conversation checkpoints can be deleted too (ConversationRunner.purge_removed).
+    """
+
+    def __init__(self, namespace: str, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX_SESSIONS,
+                 max_bytes: int = SESSION_MAX_BYTES):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.stats = SessionStats()
+        self._removed: set[str] = set()
+        self._removed_lock = threading.Lock()
+
+    def _note_removed(self, session_ids):
+        with self._removed_lock:
+            self._removed.update(session_ids)
+
+    def take_removed(self) -> list[str]:
+        """Ids expired or evicted since the last call (not ones pop()ed by the caller)."""
+        with self._removed_lock:
+            removed, self._removed = list(self._removed), set()
+        return removed
+
+    def _encode_checked(self, state: dict) -> str:
+        data = encode_state(state)
+        if len(data.encode("utf-8")) > self.max_bytes:
+            self.stats.oversize_rejections += 1
+            raise SessionTooLarge(f"session state exceeds {self.max_bytes} bytes")
+        return data
+
+    def get(self, session_id: str) -> dict | None:
+        state = self._get(session_id)
+        if state is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return state
+
+    def set(self, session_id: str, state: dict):
+        self._set(session_id, state, self._encode_checked(state))
+        self.stats.writes += 1
+
+    def create(self, session_id: str, state: dict) -> bool:
+        """Store a new session; False if a live one with this id already exists."""
+        created = self._create(session_id, state, self._encode_checked(state))
+        if created:
+            self.stats.writes += 1
+        return created
+
+    def __contains__(self, session_id: str) -> bool:
+        return self._get(session_id) is not None
+
+    def stats_dict(self) -> dict:
+        return {"backend": type(self).__name__, "namespace": self.namespace, **self.stats.as_dict()}
+
+    @abstractmethod
+    def _get(self, session_id):
+        ...
+
+    @abstractmethod
+    def _set(self, session_id, state, data):
+        ...
+
+    @abstractmethod
+    def _create(self, session_id, state, data) -> bool:
+        ...
+
+    @abstractmethod
+    def pop(self, session_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Drop expired (and over-limit) sessions; returns how many were removed."""
+
+
+class MemorySessionStore(SessionStore):
+    """Single-process LRU + TTL store; states are kept as live objects, no decoding on read."""
+
+    def __init__(self, namespace: str, **kwargs):
+        super().__init__(namespace, **kwargs)
+        self._lru = TTLLRUCache(max_size=self.max_sessions, ttl=self.ttl, on_remove=self._note_removed)
+        self._lock = threading.Lock()
+
+    def _sync_stats(self):
+        self.stats.evictions = self._lru.evictions
+        self.stats.expirations = self._lru.expirations
+
+    def _get(self, session_id):
+        state = self._lru.get(session_id)
+        self._sync_stats()
+        return state
+
+    def _set(self, session_id, state, data):
+        self._lru.set(session_id, state)
+        self._sync_stats()
+
+    def _create(self, session_id, state, data):
+        with self._lock:
+            if self._lru.get(session_id) is not None:
+                return False
+            self._lru.set(session_id, state)
+        self._sync_stats()
+        return True
+
+    def pop(self, session_id):
+        state = self._get(session_id)
+        self._lru.pop(session_id)
+        return state
+
+    def sweep(self) -> int:
+        removed = self._lru.sweep()
+        self._sync_stats()
+        return removed
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in the main database (sessions table), shared by every uvicorn
+    worker, so requests for one session may land on any process.
+    Expiry and the size bound are enforced every TRIM_EVERY writes.
+    """
+
+    TRIM_EVERY = 100
+
+    def __init__(self, namespace: str, **kwargs):
+        super().__init__(namespace, **kwargs)
+        self._writes = 0
+        init_db()   # the onboarding API can also run standalone, without main's startup hook
+
+    def _get(self, session_id):
+        with connection() as conn:
+            row = conn.execute(
+                "SELECT data, expires_at FROM sessions WHERE namespace=? AND session_id=?",
+                (self.namespace, session_id),
+            ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= time.time():
+            self.stats.expirations += 1
+            return None
+        return json.loads(row[0])
+
+    def _set(self, session_id, state, data):
+        now = time.time()
+        with transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (namespace, session_id, data, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, session_id, data, now + self.ttl, now),
+            )
+        self._after_write()
+
+    def _create(self, session_id, state, data):
+        now = time.time()
+        with transaction(immediate=True) as conn:
+            # an expired row with the same id does not block a new session
+            conn.execute(
+                "DELETE FROM sessions WHERE namespace=? AND session_id=? AND expires_at<=?",
+                (self.namespace, session_id, now),
+            )
+            created = conn.execute(
+                "INSERT OR IGNORE INTO sessions (namespace, session_id, data, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, session_id, data, now + self.ttl, now),
+            ).rowcount == 1
+        if created:
+            self._after_write()
+        return created
+
+    def pop(self, session_id):
+        with transaction(immediate=True) as conn:
+            row = conn.execute(
+                "SELECT data, expires_at FROM sessions WHERE namespace=? AND session_id=?",
+                (self.namespace, session_id),
+            ).fetchone()
+            conn.execute("DELETE FROM sessions WHERE namespace=? AND session_id=?", (self.namespace, session_id))
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0])
+
+    def _after_write(self):
+        self._writes += 1
+        if self._writes % self.TRIM_EVERY == 0:
+            self.sweep()
+
+    def sweep(self) -> int:
+        """Drop expired sessions, then the least recently written ones beyond max_sessions."""
+        with transaction(immediate=True) as conn:
+            expired = [row[0] for row in conn.execute(
+                "DELETE FROM sessions WHERE namespace=? AND expires_at<=? RETURNING session_id",
+                (self.namespace, time.time()),
+            ).fetchall()]
+            count = conn.execute("SELECT COUNT(*) FROM sessions WHERE namespace=?", (self.namespace,)).fetchone()[0]
+            evicted = []
+            if count > self.max_sessions:
+                evicted = [row[0] for row in conn.execute(
+                    "DELETE FROM sessions WHERE namespace=? AND session_id IN "
+                    "(SELECT session_id FROM sessions WHERE namespace=? ORDER BY updated_at LIMIT ?) "
+                    "RETURNING session_id",
+                    (self.namespace, self.namespace, count - self.max_sessions),
+                ).fetchall()]
+        self.stats.expirations += len(expired)
+        self.stats.evictions += len(evicted)
+        self._note_removed(expired + evicted)
+        return len(expired) + len(evicted)
+
+
+# ----------------------------
+# Shared instances
+# ----------------------------
+_session_stores: dict[str, SessionStore] = {}
+_session_stores_lock = threading.Lock()
+
+
+def get_session_store(namespace: str) -> SessionStore:
+    """Process-wide store for one API (e.g. "support", "onboarding"), backend from SESSION_BACKEND."""
+    with _session_stores_lock:
+        store = _session_stores.get(namespace)
+        if store is None:
+            cls = SQLiteSessionStore if SESSION_BACKEND == "sqlite" else MemorySessionStore
+            store = _session_stores[namespace] = cls(namespace)
+        return store
+
+
+def all_session_stats() -> dict:
+    with _session_stores_lock:
+        return {name: store.stats_dict() for name, store in _session_stores.items()}
@@ -0,0 +1,232 @@
+import base64
+import hashlib
+import hmac
+import os
+import random
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from core.ttl_lru import TTLLRUCache
+from core.metrics import sms_send_seconds
+
+# ----------------------------
+# Config
+# ----------------------------
+SMS_TRANSPORT = os.getenv("SMS_TRANSPORT", "twilio")              # twilio | fake
+SMS_WORKERS = int(os.getenv("SMS_WORKERS", "8"))                  # concurrent provider calls
+SMS_STATUS_CALLBACK_URL = os.getenv("SMS_STATUS_CALLBACK_URL")    # e.g. https://host/sms/status (Twilio webhook)
+SMS_JOB_TTL = float(os.getenv("SMS_JOB_TTL", "3600"))             # how long delivery status is kept
+SMS_MAX_JOBS = int(os.getenv("SMS_MAX_JOBS", "100000"))
+
+# provider statuses after which nothing changes any more
+FINAL_STATUSES = {"delivered", "undelivered", "failed", "canceled", "error"}
+
+
+def twilio_signature(url: str, params: dict, auth_token: str) -> str:
+    """
+    X-Twilio-Signature for a webhook: base64(HMAC-SHA1(auth token, url + each
+    POST parameter name followed by its values, names in sorted order)).
+    `params` maps names to lists of values (as parse_qs returns them).
+    """
+    payload = url + "".join(name + value for name in sorted(params) for value in sorted(params[name]))
+    digest = hmac.new(auth_token.encode("utf-8"), payload.encode("utf-8"), hashlib.sha1).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def valid_twilio_signature(url: str, params: dict, signature: str | None, auth_token: str | None) -> bool:
+    """True only if a token is configured and the request was signed with it."""
+    if not signature or not auth_token:
+        return False
+    return hmac.compare_digest(twilio_signature(url, params, auth_token), signature)
+
+
+def mask_phone(phone: str | None) -> str | None:
+    """'+919876543210' -> '+91******3210': enough to recognise a number, not to text it."""
+    if not phone:
+        return phone
+    if len(phone) <= 7:
+        return "*" * len(phone)
+    return phone[:3] + "*" * (len(phone) - 7) + phone[-4:]
+
+
+# ---------------------------
+# Transports
+# ---------------------------
+class SmsTransport(ABC):
+    """send() hands one SMS to the provider and returns its message id (sid)."""
+
+    @abstractmethod
+    def send(self, to: str, body: str, status_callback: str | None = None) -> str:
+        ...
+
+    @abstractmethod
+    def fetch_status(self, sid: str) -> str:
+        ...
+
+
+class TwilioTransport(SmsTransport):
+    """One Twilio client per process; its HTTP session keeps connections alive between messages."""
+
+    def __init__(self, sid: str | None = None, token: str | None = None, from_phone: str | None = None):
+        sid = sid or os.getenv("TWILIO_SID")
+        token = token or os.getenv("TWILIO_AUTH_TOKEN")
+        self.from_phone = from_phone or os.getenv("TWILIO_PHONE")
+        if not sid or not token or not self.from_phone:
+            raise ValueError("Twilio credentials not set in .env")
+        from twilio.http.http_client import TwilioHttpClient   # deferred: the fake transport never needs the SDK
+        from twilio.rest import Client
+        self.client = Client(sid, token, http_client=TwilioHttpClient(pool_connections=True, timeout=10, max_retries=2))
+
+    def send(self, to: str, body: str, status_callback: str | None = None) -> str:
+        params = {"body": body, "from_": self.from_phone, "to": to}
+        if status_callback:
+            params["status_callback"] = status_callback
+        return self.client.messages.create(**params).sid
+
+    def fetch_status(self, sid: str) -> str:
+        return self.client.messages(sid).fetch().status
+
+
+class FakeSmsGateway(SmsTransport):
+    """
+    Offline gateway: send() sleeps `latency` and fails a `failure_rate` share
+    of messages; accepted messages report 'sent' and then 'delivered' after
+    `delivery_delay` seconds when polled.
+    """
+
+    def __init__(self, latency: float = 0.2, failure_rate: float = 0.0, delivery_delay: float = 0.5,
+                 seed: int | None = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.delivery_delay = delivery_delay
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._accepted: dict[str, float] = {}
+        self.outbox: list[tuple[str, str]] = []
+
+    def send(self, to: str, body: str, status_callback: str | None = None) -> str:
+        time.sleep(self.latency)
+        with self._lock:
+            if self._random.random() < self.failure_rate:
+                raise RuntimeError("fake gateway: simulated provider error")
+            sid = "SM" + uuid.uuid4().hex
+            self._accepted[sid] = time.monotonic()
+            self.outbox.append((to, body))
+        return sid
+
+    def fetch_status(self, sid: str) -> str:
+        with self._lock:
+            accepted = self._accepted.get(sid)
+        if accepted is None:
+            return "failed"
+        return "delivered" if time.monotonic() - accepted >= self.delivery_delay else "sent"
+
+
+# ---------------------------
+# Background dispatch
+# ---------------------------
+class SmsDispatcher:
+    """
+    Sends SMS on a worker pool so callers return as soon as the job is queued.
+    Every job gets an id; its status moves queued -> sending -> sent (or error)
+    and then follows the provider (delivered / undelivered / failed), reported
+    either by the provider webhook (record_status) or by polling (refresh).
+    on_status callbacks run on the worker thread for every change.
+    """
+
+    def __init__(self, transport: SmsTransport, workers: int = SMS_WORKERS,
+                 status_callback_url: str | None = SMS_STATUS_CALLBACK_URL):
+        self.transport = transport
+        self.status_callback_url = status_callback_url
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sms")
+        self._jobs = TTLLRUCache(max_size=SMS_MAX_JOBS, ttl=SMS_JOB_TTL)   # job_id -> job dict
+        self._by_sid = TTLLRUCache(max_size=SMS_MAX_JOBS, ttl=SMS_JOB_TTL)  # provider sid -> job_id
+        # job_id -> on_status; expires with its job if the provider never reports a final status
+        self._callbacks = TTLLRUCache(max_size=SMS_MAX_JOBS, ttl=SMS_JOB_TTL)
+        self._lock = threading.Lock()
+
+    def dispatch(self, to: str, body: str, on_status: Callable[[dict], None] | None = None) -> str:
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "to": to, "status": "queued", "sid": None, "error": None, "updated_at": time.time()}
+        self._jobs.set(job_id, job)
+        if on_status:
+            self._callbacks.set(job_id, on_status)
+        self._pool.submit(self._send, job_id, to, body)
+        return job_id
+
+    def _update(self, job_id: str, **changes):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] in FINAL_STATUSES:
+                return
+            job.update(changes, updated_at=time.time())
+            snapshot = dict(job)
+            callback = (self._callbacks.pop(job_id) if job["status"] in FINAL_STATUSES
+                        else self._callbacks.get(job_id))
+        if callback:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"⚠️ SMS status callback failed: {e}")
+
+    def _send(self, job_id: str, to: str, body: str):
+        self._update(job_id, status="sending")
+        start = time.perf_counter()
+        try:
+            sid = self.transport.send(to, body, self.status_callback_url)
+        except Exception as e:
+            sms_send_seconds.labels("error").observe(time.perf_counter() - start)
+            print(f"❌ SMS to {mask_phone(to)} failed: {e}")
+            self._update(job_id, status="error", error=str(e))
+            return
+        sms_send_seconds.labels("ok").observe(time.perf_counter() - start)
+        self._by_sid.set(sid, job_id)
+        self._update(job_id, status="sent", sid=sid)
+
+    def status(self, job_id: str) -> dict | None:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def public_status(self, job_id: str, refresh: bool = False) -> dict | None:
+        """status() (or refresh()) for API responses: the recipient's number is masked."""
+        job = self.refresh(job_id) if refresh else self.status(job_id)
+        if job:
+            job["to"] = mask_phone(job["to"])
+        return job
+
+    def record_status(self, sid: str, status: str) -> bool:
+        """Apply a provider delivery report (Twilio status callback). False if the sid is unknown."""
+        job_id = self._by_sid.get(sid)
+        if job_id is None:
+            return False
+        self._update(job_id, status=status)
+        return True
+
+    def refresh(self, job_id: str) -> dict | None:
+        """Poll the provider for a job that has been handed over but is not final yet."""
+        job = self.status(job_id)
+        if job and job["sid"] and job["status"] not in FINAL_STATUSES:
+            self._update(job_id, status=self.transport.fetch_status(job["sid"]))
+            job = self.status(job_id)
+        return job
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+_sms_dispatcher: SmsDispatcher | None = None
+_sms_dispatcher_lock = threading.Lock()
+
+
+def get_sms_dispatcher() -> SmsDispatcher:
+    """Process-wide dispatcher; the transport (and its Twilio client) is created once."""
+    global _sms_dispatcher
+    if _sms_dispatcher is None:
+        with _sms_dispatcher_lock:
+            if _sms_dispatcher is None:
+                transport = FakeSmsGateway() if SMS_TRANSPORT == "fake" else TwilioTransport()
+                _sms_dispatcher = SmsDispatcher(transport)
+    return _sms_dispatcher
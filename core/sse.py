@@ -0,0 +1,34 @@
+import json
+from typing import AsyncIterator
+from fastapi.responses import StreamingResponse
+from core.dial_client import DialError
+from core.session_store import SessionTooLarge
+
+
+def sse_event(data: dict, event: str | None = None) -> str:
+    """One Server-Sent Events frame; data is JSON so newlines in tokens stay intact."""
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_token_stream(tokens: AsyncIterator[str]) -> StreamingResponse:
+    """
+    Forward tokens as `data: {"token": ...}` frames, then a final
+    `event: done` frame carrying the full text (or `event: error`).
+    """
+    async def frames():
+        parts = []
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield sse_event({"token": token})
+        except (DialError, SessionTooLarge) as e:
+            yield sse_event({"detail": str(e)}, event="error")
+            return
+        yield sse_event({"response": "".join(parts)}, event="done")
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
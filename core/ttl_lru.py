@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLLRUCache:
+    """
+    Thread-safe LRU map with optional per-entry TTL.
+    - max_size: entries kept before the least recently used one is evicted
+    - ttl: default time-to-live in seconds (None = never expires)
+    - on_remove: called with the keys evicted or expired (not popped), outside the lock
+    Counts evictions (size pressure) and expirations (TTL) separately.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float | None = None, on_remove=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_remove = on_remove
+        self.evictions = 0
+        self.expirations = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, expires_at, now) -> bool:
+        return expires_at is not None and expires_at <= now
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if not self._expired(expires_at, now):
+                self._data.move_to_end(key)
+                return value
+            del self._data[key]
+            self.expirations += 1
+        if self.on_remove is not None:
+            self.on_remove([key])
+        return default
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        evicted = []
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                evicted.append(self._data.popitem(last=False)[0])
+                self.evictions += 1
+        if evicted and self.on_remove is not None:
+            self.on_remove(evicted)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def sweep(self) -> int:
+        """Drop every expired entry; returns how many were removed."""
+        now = time.monotonic()
+        with self._lock:
+            dead = [k for k, (exp, _) in self._data.items() if self._expired(exp, now)]
+            for k in dead:
+                del self._data[k]
+            self.expirations += len(dead)
+        if dead and self.on_remove is not None:
+            self.on_remove(dead)
+        return len(dead)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
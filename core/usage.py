@@ -0,0 +1,301 @@
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from core.db import connection, transaction, init_db, run_db
+from core.ttl_lru import TTLLRUCache
+
+# ----------------------------
+# Config
+# ----------------------------
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "10"))          # seconds between SQLite flushes
+USAGE_FLUSH_MAX_ROWS = int(os.getenv("USAGE_FLUSH_MAX_ROWS", "5000"))          # flush early past this many pending rows
+USAGE_SESSION_TOKEN_BUDGET = int(os.getenv("USAGE_SESSION_TOKEN_BUDGET", "0"))  # tokens per session, 0 = no budget
+USAGE_FALLBACK_MODEL = os.getenv("USAGE_FALLBACK_MODEL", "gpt-4o-mini")         # deployment used over budget
+USAGE_SESSION_TTL = float(os.getenv("USAGE_SESSION_TTL", "86400"))             # how long session totals stay in memory
+USAGE_MAX_SESSIONS = int(os.getenv("USAGE_MAX_SESSIONS", "100000"))
+
+# USD per 1M tokens (prompt, completion); extend or override with USAGE_PRICES='{"model": [in, out]}'
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+MODEL_PRICES.update({model: tuple(price) for model, price in json.loads(os.getenv("USAGE_PRICES", "{}")).items()})
+
+REPORT_DIMENSIONS = ("session_id", "agent", "endpoint", "call_site", "model")
+
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Price of one call; models without a price count tokens only."""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+# ----------------------------
+# Attribution
+# ----------------------------
+# Who an LLM call is for: the HTTP route (UsageScopeMiddleware), the session
+# and agent (ConversationRunner.turn). DialClient callers name the call site.
+_usage_scope: contextvars.ContextVar[dict] = contextvars.ContextVar("llm_usage_scope", default={})
+
+
+@contextmanager
+def usage_scope(**fields):
+    """Attribute LLM calls made inside the block; unset fields are inherited from the outer scope."""
+    scope = {**_usage_scope.get(), **{k: v for k, v in fields.items() if v is not None}}
+    token = _usage_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _usage_scope.reset(token)
+
+
+def current_session() -> str | None:
+    return _usage_scope.get().get("session_id")
+
+
+def _route_template(asgi_scope: dict) -> str:
+    """'POST /claims/claims/{session_id}/document' rather than the concrete path (one row per route, not per id)."""
+    path = asgi_scope.get("path", "")
+    params = {str(v): k for k, v in (asgi_scope.get("path_params") or {}).items()}
+    if params:
+        path = "/".join("{" + params[part] + "}" if part in params else part for part in path.split("/"))
+    return f"{asgi_scope.get('method', '')} {path}"
+
+
+def _endpoint(scope: dict) -> str:
+    """The route of the current request, worked out on the first LLM call it makes."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None and "asgi" in scope:
+        endpoint = scope["endpoint"] = _route_template(scope["asgi"])
+    return endpoint or ""
+
+
+class UsageScopeMiddleware:
+    """
+    ASGI middleware: LLM calls made while serving a request (including
+    streamed responses) are attributed to its route. The route is only
+    worked out if the request actually calls the LLM.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with usage_scope(asgi=scope):   # routing adds path_params to this same dict
+            await self.app(scope, receive, send)
+
+
+# ----------------------------
+# Ledger
+# ----------------------------
+@dataclass
+class UsageStats:
+    calls: int = 0
+    estimated_calls: int = 0
+    budget_fallbacks: int = 0    # calls switched to USAGE_FALLBACK_MODEL
+    flushes: int = 0
+    rows_flushed: int = 0
+    flush_errors: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class UsageLedger:
+    """
+    Token usage aggregated in memory per (day, session, agent, endpoint,
+    call site, model) and flushed to llm_usage every `flush_interval`
+    seconds (or once `max_rows` keys are pending) as additive upserts, so
+    several workers can share one database. Also keeps a running total per
+    session for token budgets (seeded from the table when a worker first
+    sees a session, so budgets hold across workers up to the last flush).
+    """
+
+    def __init__(self, flush_interval: float = USAGE_FLUSH_INTERVAL, max_rows: int = USAGE_FLUSH_MAX_ROWS,
+                 session_budget: int = USAGE_SESSION_TOKEN_BUDGET, fallback_model: str = USAGE_FALLBACK_MODEL):
+        self.max_rows = max_rows
+        self.session_budget = session_budget
+        self.fallback_model = fallback_model
+        self.stats = UsageStats()
+        self._pending: dict[tuple, list] = {}     # key -> [calls, prompt, completion, estimated, cost]
+        self._day = (None, "")                    # (UTC day number, "YYYY-MM-DD")
+        self._sessions = TTLLRUCache(max_size=USAGE_MAX_SESSIONS, ttl=USAGE_SESSION_TTL)   # session -> [tokens]
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_loop, args=(flush_interval,),
+                                             name="usage-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self, interval: float):
+        while not self._stop.is_set():
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.stats.flush_errors += 1
+                print(f"⚠️ Token usage flush failed: {e}")
+
+    def _today(self) -> str:
+        day = int(time.time() // 86400)
+        if day != self._day[0]:
+            self._day = (day, time.strftime("%Y-%m-%d", time.gmtime(day * 86400)))
+        return self._day[1]
+
+    def record(self, call_site: str, model: str, prompt_tokens: int, completion_tokens: int, estimated: bool = False):
+        scope = _usage_scope.get()
+        session_id = scope.get("session_id") or ""
+        key = (self._today(), session_id, scope.get("agent") or "", _endpoint(scope), call_site, model)
+        cost = cost_usd(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            row = self._pending.get(key)
+            if row is None:
+                row = self._pending[key] = [0, 0, 0, 0, 0.0]
+            row[0] += 1
+            row[1] += prompt_tokens
+            row[2] += completion_tokens
+            row[3] += int(estimated)
+            row[4] += cost
+            self.stats.calls += 1
+            self.stats.estimated_calls += int(estimated)
+            total = self._sessions.get(session_id) if session_id else None
+            if total is not None:   # sessions are loaded on their first budget check
+                total[0] += prompt_tokens + completion_tokens
+            pending = len(self._pending)
+        if pending >= self.max_rows:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write pending usage to llm_usage; returns the rows upserted."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            try:
+                with transaction() as conn:
+                    conn.executemany("""
+                        INSERT INTO llm_usage (day, session_id, agent, endpoint, call_site, model,
+                                               calls, prompt_tokens, completion_tokens, estimated_calls, cost_usd)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (day, session_id, agent, endpoint, call_site, model) DO UPDATE SET
+                            calls = calls + excluded.calls,
+                            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                            completion_tokens = completion_tokens + excluded.completion_tokens,
+                            estimated_calls = estimated_calls + excluded.estimated_calls,
+                            cost_usd = cost_usd + excluded.cost_usd
+                    """, [key + tuple(row) for key, row in pending.items()])
+            except Exception:
+                with self._lock:   # put the usage back for the next flush
+                    for key, row in pending.items():
+                        merged = self._pending.setdefault(key, [0, 0, 0, 0, 0.0])
+                        for i, value in enumerate(row):
+                            merged[i] += value
+                raise
+            self.stats.flushes += 1
+            self.stats.rows_flushed += len(pending)
+            return len(pending)
+
+    # ----------------------------
+    # Budgets
+    # ----------------------------
+    def _load_session(self, session_id: str) -> int:
+        """Tokens this session already used (flushed by any worker), plus what is pending here."""
+        with connection() as conn:
+            flushed = conn.execute(
+                "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM llm_usage WHERE session_id=?",
+                (session_id,),
+            ).fetchone()[0]
+        with self._lock:
+            total = self._sessions.get(session_id)
+            if total is None:
+                pending = sum(r[1] + r[2] for k, r in self._pending.items() if k[1] == session_id)
+                total = [flushed + pending]
+                self._sessions.set(session_id, total)
+        return total[0]
+
+    def session_tokens(self, session_id: str) -> int:
+        total = self._sessions.get(session_id)
+        return total[0] if total is not None else self._load_session(session_id)
+
+    async def model_for(self, model: str) -> str:
+        """`model`, or the cheaper fallback once the current session has used its token budget."""
+        session_id = current_session()
+        if not self.session_budget or not session_id or model == self.fallback_model:
+            return model
+        total = self._sessions.get(session_id)
+        used = total[0] if total is not None else await run_db(self._load_session, session_id)
+        if used < self.session_budget:
+            return model
+        self.stats.budget_fallbacks += 1
+        return self.fallback_model
+
+    # ----------------------------
+    # Reports
+    # ----------------------------
+    def top(self, by: str = "session_id", limit: int = 20, days: int = 7, **filters) -> list[dict]:
+        """Top token consumers grouped by one of REPORT_DIMENSIONS, optionally filtered on others."""
+        if by not in REPORT_DIMENSIONS:
+            raise ValueError(f"by must be one of {REPORT_DIMENSIONS}")
+        self.flush()
+        where, params = ["day >= ?"], [time.strftime("%Y-%m-%d", time.gmtime(time.time() - days * 86400))]
+        for column, value in filters.items():
+            if column not in REPORT_DIMENSIONS:
+                raise ValueError(f"cannot filter on {column!r}")
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        with connection() as conn:
+            rows = conn.execute(f"""
+                SELECT {by}, SUM(calls), SUM(prompt_tokens), SUM(completion_tokens), SUM(estimated_calls),
+                       SUM(cost_usd), SUM(prompt_tokens + completion_tokens) AS tokens
+                FROM llm_usage WHERE {" AND ".join(where)}
+                GROUP BY {by} ORDER BY tokens DESC LIMIT ?
+            """, params + [limit]).fetchall()
+        return [{by: r[0], "calls": r[1], "prompt_tokens": r[2], "completion_tokens": r[3],
+                 "total_tokens": r[6], "estimated_calls": r[4], "cost_usd": round(r[5], 6)} for r in rows]
+
+    def stats_dict(self) -> dict:
+        return {
+            **self.stats.as_dict(),
+            "pending_rows": len(self._pending),
+            "session_budget": self.session_budget,
+            "fallback_model": self.fallback_model,
+        }
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ Token usage flush failed: {e}")
+
+
+_usage_ledger: UsageLedger | None = None
+_usage_ledger_lock = threading.Lock()
+
+
+def get_usage_ledger() -> UsageLedger:
+    """Process-wide ledger; flushed in the background and once more at exit."""
+    global _usage_ledger
+    if _usage_ledger is None:
+        with _usage_ledger_lock:
+            if _usage_ledger is None:
+                init_db()
+                _usage_ledger = UsageLedger()
+                atexit.register(_usage_ledger.close)
+    return _usage_ledger
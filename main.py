@@ -1,18 +1,80 @@
 # main.py
-from fastapi import FastAPI
-import uvicorn
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs
+from fastapi import FastAPI, HTTPException, Request, Response
+
+from core.dial_client import close_http_client, get_dial_client
+from core.db import init_db, run_db
+from core.llm_cache import get_response_cache
+from core.email_outbox import get_email_outbox, EMAIL_DRAIN_TIMEOUT
+from core.sms_service import get_sms_dispatcher, valid_twilio_signature, SMS_STATUS_CALLBACK_URL
+from core.session_store import all_session_stats, SESSION_SWEEP_INTERVAL
+from core.conversation import get_checkpointer, close_checkpointer
+from core.metrics import render_metrics, PROMETHEUS_CONTENT_TYPE
+from core.usage import get_usage_ledger, UsageScopeMiddleware, REPORT_DIMENSIONS
 
 # Import routers
-from agents.support_agent.support_api import router as support_router
-from agents.claims_agent.claims_api import router as claims_router
-from agents.onboarding_agent.onboarding_api import app as onboarding_app  # already a FastAPI app
+from agents.support_agent.support_api import router as support_router, user_sessions
+from agents.claims_agent.claims_api import router as claims_router, claim_sessions
+from agents.onboarding_agent.onboarding_api import app as onboarding_app, sessions as onboarding_sessions  # already a FastAPI app
+from agents.support_agent.support_graph import query_classifier, support_runner
+from agents.onboarding_agent.onboarding_graph import intent_classifier, onboarding_runner
+from agents.claims_agent.claims_graph import document_validator, claims_runner
+
+# Importing this module stays cheap: the LLM SDK, LangGraph and the agent graphs
+# load on first use. STARTUP_WARMUP=1 loads them in the lifespan instead, so the
+# first conversation on a new worker does not pay for it.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0") == "1"
+
+
+async def purge_sessions(interval: float = SESSION_SWEEP_INTERVAL):
+    """Delete the checkpointed conversations of expired / evicted sessions, every `interval` seconds."""
+    pairs = ((support_runner, user_sessions), (onboarding_runner, onboarding_sessions), (claims_runner, claim_sessions))
+    while True:
+        await asyncio.sleep(interval)
+        for runner, store in pairs:
+            try:
+                await runner.purge_removed(store)
+            except Exception as e:
+                print(f"⚠️ Session purge failed ({store.namespace}): {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring the schema up to date before serving
+    await run_db(init_db)
+    # Start the email workers (also sends anything left queued by a previous run)
+    outbox = await run_db(get_email_outbox)
+    # Create the token ledger here rather than on the event loop at the first LLM call
+    await run_db(get_usage_ledger)
+    # Open the conversation checkpointer before the first turn needs it
+    await get_checkpointer()
+    if STARTUP_WARMUP:
+        get_dial_client().client
+        for runner in (support_runner, onboarding_runner, claims_runner):
+            await runner.warm_up()
+    # Expired sessions take their conversation checkpoints with them
+    purger = asyncio.create_task(purge_sessions())
+    yield
+    purger.cancel()
+    # Release pooled LLM connections on shutdown
+    await close_http_client()
+    await close_checkpointer()
+    await asyncio.to_thread(outbox.stop, EMAIL_DRAIN_TIMEOUT)
+    await run_db(get_usage_ledger().flush)
+
 
 # Main app
 app = FastAPI(
     title="Insurance Agents API",
     version="1.0",
-    description="Unified API for Support, Onboarding, and Claims agents"
+    description="Unified API for Support, Onboarding, and Claims agents",
+    lifespan=lifespan,
 )
+# Charge LLM token usage to the route that caused it (see /usage/top)
+app.add_middleware(UsageScopeMiddleware)
 
 # Register routers
 app.include_router(support_router, prefix="/support", tags=["Support"])
@@ -26,5 +88,88 @@ def root():
     return {"message": "Insurance Agents API is running 🚀. Endpoints: /support, /claims, /onboarding"}
 
 
+@app.get("/llm-cache/stats")
+def llm_cache_stats():
+    cache = get_response_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "backend": type(cache).__name__, **cache.stats.as_dict()}
+
+
+@app.get("/email-outbox/stats")
+def email_outbox_stats():
+    return get_email_outbox().stats()
+
+
+@app.get("/email-outbox/{outbox_id}")
+def email_outbox_status(outbox_id: int):
+    status = get_email_outbox().status(outbox_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Email not found")
+    return status
+
+
+@app.post("/sms/status")
+async def sms_status_callback(request: Request):
+    # Twilio delivery webhook (application/x-www-form-urlencoded). Only Twilio
+    # may report delivery: the body is signed with the account's auth token over
+    # the URL Twilio called (SMS_STATUS_CALLBACK_URL, as proxies may rewrite ours).
+    form = parse_qs((await request.body()).decode("utf-8"), keep_blank_values=True)
+    url = SMS_STATUS_CALLBACK_URL or str(request.url)
+    if not valid_twilio_signature(url, form, request.headers.get("X-Twilio-Signature"),
+                                  os.getenv("TWILIO_AUTH_TOKEN")):
+        raise HTTPException(status_code=403, detail="Invalid Twilio signature")
+    sid = form.get("MessageSid", [None])[0]
+    status = form.get("MessageStatus", [None])[0]
+    if not sid or not status:
+        raise HTTPException(status_code=400, detail="MessageSid and MessageStatus are required")
+    return {"known": get_sms_dispatcher().record_status(sid, status)}
+
+
+@app.get("/sms/{job_id}")
+async def sms_status(job_id: str, refresh: bool = False):
+    # may poll Twilio for a fresh status: a thread, but not a DB call
+    job = await asyncio.to_thread(get_sms_dispatcher().public_status, job_id, refresh)
+    if job is None:
+        raise HTTPException(status_code=404, detail="SMS job not found")
+    return job
+
+
+@app.get("/sessions/stats")
+def session_stats():
+    return all_session_stats()
+
+
+@app.get("/classifier/stats")
+def classifier_stats():
+    return {c.name: c.stats_dict() for c in (query_classifier, intent_classifier)}
+
+
+@app.get("/document-validation/stats")
+def document_validation_stats():
+    return document_validator.stats_dict()
+
+
+@app.get("/usage/top")
+async def usage_top(by: str = "session_id", limit: int = 20, days: int = 7,
+                    agent: str | None = None, session_id: str | None = None):
+    """
+    Top LLM token consumers over the last `days`, grouped by session_id,
+    agent, endpoint, call_site or model (optionally within one agent/session).
+    """
+    if by not in REPORT_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"by must be one of: {', '.join(REPORT_DIMENSIONS)}")
+    ledger = get_usage_ledger()
+    rows = await run_db(ledger.top, by, min(max(limit, 1), 500), max(days, 1), agent=agent, session_id=session_id)
+    return {"by": by, "days": days, "top": rows, "ledger": ledger.stats_dict()}
+
+
+@app.get("/metrics")
+def metrics():
+    """Node, LLM, DB and SMS latency histograms and token counters in Prometheus text format."""
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,6 +1,8 @@
 # run_onboarding.py
-from agents.onboarding_agent.onboarding_graph import onboarding_app
+import asyncio
+from agents.onboarding_agent.onboarding_graph import build_workflow
+from core.conversation import run_in_terminal
 
 if __name__ == "__main__":
     print("🚀 Starting Onboarding Agent Demo...\n")
-    onboarding_app.invoke({})
+    asyncio.run(run_in_terminal(build_workflow()))